@@ -1,24 +1,69 @@
+from django import forms
 from django.contrib import admin
 
 from django_admin_json_editor.admin import JSONEditorWidget
 
+from action.changelist import EstimatedCountPaginator, KeysetChangeList
 from action.models import ActionWebhook
+from action.schemas import thaw
+
+
+class ActionWebhookChangeList(KeysetChangeList):
+    # The list shows none of these, and data can be large.
+    deferred = ('data', 'zip__notes')
+
+
+class ActionWebhookForm(forms.ModelForm):
+
+    def clean_depends_on(self):
+        depends_on = self.cleaned_data['depends_on']
+        self.instance.check_dependencies(
+            [action.pk for action in depends_on])
+        return depends_on
 
 
 class ActionWebhookAdmin(admin.ModelAdmin):
     list_display = ('title', 'hook_type', 'zip')
+    list_filter = ('hook_type', 'paused', 'zip__active')
+    list_select_related = ('zip',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     model = ActionWebhook
+    form = ActionWebhookForm
+    actions = ('pause', 'resume')
+
+    def pause(self, request, queryset):
+        self.message_user(request, '{0} actions paused.'.format(
+            queryset.pause()))
+    pause.short_description = 'Pause selected actions'
+
+    def resume(self, request, queryset):
+        self.message_user(request, '{0} actions resumed.'.format(
+            queryset.resume()))
+    resume.short_description = 'Resume selected actions'
+
+    def get_changelist(self, request, **kwargs):
+        return ActionWebhookChangeList
 
     def get_form(self, request, obj=None, **kwargs):
-        self.fields = ('zip', 'title', 'hook_type', 'data')
+        self.fields = ('zip', 'title', 'hook_type', 'data', 'depends_on')
 
         if obj and obj.hook_type:
-            widget = JSONEditorWidget(obj.get_schema(obj.hook_type), False)
+            # The widget writes into the schema it is given, so it gets its
+            # own copy of the shared one.
+            widget = JSONEditorWidget(thaw(obj.get_schema(obj.hook_type)),
+                                      False)
             form = super().get_form(request, obj, widgets={'data': widget},
                                     **kwargs)
         else:
-            self.fields = tuple(x for x in self.fields if x != 'data')
+            self.fields = tuple(x for x in self.fields
+                                if x not in ('data', 'depends_on'))
             form = super().get_form(request, obj, **kwargs)
+        if obj is not None and 'depends_on' in form.base_fields:
+            # Only other actions of the same Zip.
+            form.base_fields['depends_on'].queryset = (
+                ActionWebhook.objects.filter(zip=obj.zip_id)
+                .exclude(pk=obj.pk))
         return form
 
 admin.site.register(ActionWebhook, ActionWebhookAdmin)
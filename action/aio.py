@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+from django.conf import settings
+
+import action.http as http
+import action.httpcache as httpcache
+import action.metrics as metrics
+import action.ratelimit as ratelimit
+import action.responses as responses
+import action.utils as utils
+from action.executor import ActionResult, ExecutionReport
+
+logger = logging.getLogger(__name__)
+
+
+class Response(object):
+    """
+    What `utils.handle_response` needs from a response, read off an aiohttp
+    one so both runners share the same response handling.
+    """
+
+    def __init__(self, status_code, body, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    @property
+    def content(self):
+        return self.body.content
+
+    def json(self):
+        return self.body.json()
+
+
+def new_session(limit=None, limit_per_host=None):
+    connector = aiohttp.TCPConnector(
+        limit=limit or settings.ACTION_ASYNC_LIMIT,
+        limit_per_host=(settings.ACTION_ASYNC_LIMIT_PER_HOST
+                        if limit_per_host is None else limit_per_host))
+    trace_configs = [connect_timer()] if metrics.enabled() else []
+    # Same as the blocking sessions: hooks never share cookies.
+    return aiohttp.ClientSession(connector=connector,
+                                 cookie_jar=aiohttp.DummyCookieJar(),
+                                 trace_configs=trace_configs)
+
+
+def connect_timer():
+    # Times new connections, like the blocking runner's pools do.
+    async def on_request_start(session, context, params):
+        context.host = http.get_host(str(params.url))
+
+    async def on_connection_start(session, context, params):
+        context.connect_started = time.monotonic()
+
+    async def on_connection_end(session, context, params):
+        metrics.connects.observe(
+            (context.host,), time.monotonic() - context.connect_started)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_start.append(on_connection_start)
+    trace_config.on_connection_create_end.append(on_connection_end)
+    return trace_config
+
+
+async def send(session, method, url, headers=None, payload=None,
+               timeout=None):
+    timeout = aiohttp.ClientTimeout(total=timeout)
+    async with session.request(method, url, data=payload, headers=headers,
+                               timeout=timeout) as response:
+        body = await responses.aread(response)
+    return Response(response.status, body, response.headers)
+
+
+async def fire(hook, session=None, plan=None):
+    if httpcache.enabled(hook):
+        return await fire_cached(hook, session, plan)
+
+    await ratelimit.athrottle(hook)
+    started = metrics.start()
+    method, url, headers, payload = plan or hook.get_request()
+    started = metrics.observe('plan', hook, started)
+
+    # Reading the body happens in `send`, so "request" covers it here.
+    if session is None:
+        async with new_session() as session:
+            response = await send(session, method, url, headers, payload,
+                                  hook.TIMEOUT)
+    else:
+        response = await send(session, method, url, headers, payload,
+                              hook.TIMEOUT)
+    started = metrics.observe('request', hook, started)
+
+    result = utils.handle_response(response, response.body)
+    metrics.observe('response', hook, started)
+    return result
+
+
+async def fire_cached(hook, session=None, plan=None):
+    started = metrics.start()
+    method, url, headers, _ = plan or hook.get_request()
+    metrics.observe('plan', hook, started)
+
+    async def send_request(headers):
+        await ratelimit.athrottle(hook)
+        started = metrics.start()
+        if session is None:
+            async with new_session() as new:
+                response = await send(new, method, url, headers,
+                                      timeout=hook.TIMEOUT)
+        else:
+            response = await send(session, method, url, headers,
+                                  timeout=hook.TIMEOUT)
+        metrics.observe('request', hook, started)
+        return response, response.body
+
+    return await httpcache.get_cache().afetch(url, headers, send_request)
+
+
+async def gather(hooks, limit=None, session=None):
+    hooks = list(hooks)
+    limit = limit or settings.ACTION_ASYNC_LIMIT
+    semaphore = asyncio.Semaphore(limit)
+    start = time.monotonic()
+
+    async def run(hook, session):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                result = await hook.make_it_so_async(session=session)
+            except Exception as e:
+                logger.exception('Action %s failed', hook.pk)
+                return ActionResult(hook, None, e, time.monotonic() - started)
+            return ActionResult(hook, result, None,
+                                time.monotonic() - started)
+
+    if session is None:
+        async with new_session(limit=limit) as session:
+            results = await asyncio.gather(
+                *[run(hook, session) for hook in hooks])
+    else:
+        results = await asyncio.gather(*[run(hook, session) for hook in hooks])
+
+    return ExecutionReport(list(results), time.monotonic() - start)
+
+
+def run(hooks, limit=None):
+    # Blocking entry point for code that is not already on an event loop.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(gather(hooks, limit=limit))
+    finally:
+        loop.close()
@@ -0,0 +1,139 @@
+"""
+Coalesces fires of the same hook into one request.
+
+A hook opts in with `"batch": {"size": 100, "wait": 50}` in its data (or
+`"batch": true` for the `ACTION_BATCH_*` defaults). Its fires are held for
+up to `wait` milliseconds or until `size` of them are waiting, then their
+data goes out as one JSON array, or XML list, body. A response that is a
+JSON array with one entry per fire is split back out, one entry each;
+anything else goes to every fire of the batch, each with a `share()` of
+its own to close.
+"""
+import threading
+from concurrent.futures import Future
+
+from django.db import connection
+
+import action.retry as retry
+from action.responses import DecodedBody
+
+
+class Batch(object):
+
+    def __init__(self, hook):
+        # The first hook in, the others are the same revision of it.
+        self.hook = hook
+        self.items = []
+        self.futures = []
+        self.timer = None
+
+
+def fan_out(body, count):
+    try:
+        values = body.json()
+    except ValueError:
+        values = None
+    if isinstance(values, list) and len(values) == count:
+        return [DecodedBody(value) for value in values]
+    return [body] + [body.share() for _ in range(count - 1)]
+
+
+class Batcher(object):
+
+    def __init__(self):
+        # (pk, modified) -> Batch being filled.
+        self._batches = {}
+        self._lock = threading.Lock()
+        self.batches_sent = 0
+        self.items_sent = 0
+
+    def submit(self, hook, size, wait, blocking=True, input=None):
+        """
+        Add a fire of `hook` to its batch, returns a `Future` of its result.
+
+        A fire filling its batch sends it right away, on its own thread when
+        `blocking` or on a new one otherwise (say, from an event loop).
+        """
+        future = Future()
+        key = (hook.pk, hook.modified)
+        item = hook.get_batch_item(input)
+
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = Batch(hook)
+                batch.timer = threading.Timer(wait, self._expire,
+                                              args=(key, batch))
+                batch.timer.daemon = True
+                batch.timer.start()
+            batch.items.append(item)
+            batch.futures.append(future)
+
+            full = len(batch.items) >= size
+            if full:
+                del self._batches[key]
+                batch.timer.cancel()
+
+        # Whoever fills the batch sends it, they'd be waiting anyway.
+        if full and blocking:
+            self.send(batch)
+        elif full:
+            threading.Thread(target=self._send_detached, args=(batch,),
+                             daemon=True).start()
+        return future
+
+    def flush(self, key, batch):
+        with self._lock:
+            if self._batches.get(key) is not batch:
+                return
+            del self._batches[key]
+        self.send(batch)
+
+    def _expire(self, key, batch):
+        try:
+            self.flush(key, batch)
+        finally:
+            # One-off threads, don't leave their connection open.
+            connection.close()
+
+    def _send_detached(self, batch):
+        try:
+            self.send(batch)
+        finally:
+            connection.close()
+
+    def flush_all(self):
+        with self._lock:
+            batches = list(self._batches.values())
+            self._batches.clear()
+        for batch in batches:
+            batch.timer.cancel()
+            self.send(batch)
+
+    def send(self, batch):
+        hook = batch.hook
+        try:
+            body = retry.call(hook, lambda: hook.run_batch(batch.items))
+            results = fan_out(body, len(batch.futures))
+        except Exception as e:
+            for future in batch.futures:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches_sent += 1
+            self.items_sent += len(batch.items)
+        for future, result in zip(batch.futures, results):
+            future.set_result(result)
+
+    def stats(self):
+        return {'batches': self.batches_sent, 'items': self.items_sent,
+                'pending': sum(len(batch.items)
+                               for batch in list(self._batches.values()))}
+
+
+batcher = Batcher()
+
+
+def submit(hook, size, wait, blocking=True, input=None):
+    return batcher.submit(hook, size, wait, blocking=blocking, input=input)
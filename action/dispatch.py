@@ -0,0 +1,127 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+import action.metrics as metrics
+import action.responses as responses
+from action.models import ActionWebhook, DispatchJob
+
+logger = logging.getLogger(__name__)
+
+
+def claim(batch_size, worker):
+    """
+    Hand the oldest `batch_size` pending jobs to `worker`.
+
+    Rows locked by another worker are skipped rather than waited on, so any
+    number of workers on any number of nodes can claim at the same time
+    with Postgres as the only coordination point.
+    """
+    started = metrics.start()
+    with transaction.atomic():
+        jobs = list(
+            DispatchJob.objects.select_for_update(skip_locked=True)
+            .filter(status=DispatchJob.STATUS_PENDING)
+            # A subquery rather than a join, which would lock the actions.
+            # Jobs of paused actions wait for them to be resumed.
+            .exclude(action__in=ActionWebhook.objects.filter(paused=True)
+                     .values('pk'))
+            .order_by('pk')[:batch_size])
+
+        if not jobs:
+            return []
+
+        now = timezone.now()
+        DispatchJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=DispatchJob.STATUS_RUNNING, worker=worker,
+            claimed_at=now, attempts=F('attempts') + 1)
+
+    # Loaded outside of the locking query: joining them in would lock the
+    # action rows too and make workers skip each other's jobs.
+    actions = ActionWebhook.objects.select_related('zip').in_bulk(
+        set(job.action_id for job in jobs))
+    claimed = []
+    gone = []
+    for job in jobs:
+        if job.action_id not in actions:
+            gone.append(job.pk)
+            continue
+        job.action = actions[job.action_id]
+        job.status = DispatchJob.STATUS_RUNNING
+        job.worker = worker
+        job.claimed_at = now
+        job.attempts += 1
+        claimed.append(job)
+
+    if gone:
+        # Deleted since they were queued, there is nothing left to run.
+        DispatchJob.objects.filter(pk__in=gone).update(
+            status=DispatchJob.STATUS_FAILED, error='Action deleted',
+            finished_at=now)
+
+    if started is not None:
+        metrics.claims.observe((), time.monotonic() - started)
+    return claimed
+
+
+def to_result(result):
+    if isinstance(result, responses.Body):
+        with result:
+            result = result.value()
+    # Non-json responses come back as raw bytes.
+    if isinstance(result, bytes):
+        return result.decode('utf-8', 'replace')
+    return result
+
+
+def start(job):
+    """
+    Stamp `job` as started now, unless it went back to the queue while it
+    waited for the rest of its batch. Returns whether it is still ours.
+    """
+    now = timezone.now()
+    started = DispatchJob.objects.filter(
+        pk=job.pk, status=DispatchJob.STATUS_RUNNING,
+        worker=job.worker).update(claimed_at=now)
+    job.claimed_at = now
+    return bool(started)
+
+
+def run_job(job):
+    """Run a claimed `job`. Returns it, or None if it was requeued."""
+    if not start(job):
+        return None
+
+    start_time = time.monotonic()
+    try:
+        result = job.action.make_it_so()
+    except Exception as e:
+        logger.exception('Dispatch job %s failed', job.pk)
+        job.status = DispatchJob.STATUS_FAILED
+        job.result = None
+        job.error = str(e)
+    else:
+        job.status = DispatchJob.STATUS_DONE
+        job.result = to_result(result)
+        job.error = None
+    job.duration = time.monotonic() - start_time
+    job.finished_at = timezone.now()
+
+    DispatchJob.objects.filter(pk=job.pk).update(
+        status=job.status, result=job.result, error=job.error,
+        duration=job.duration, finished_at=job.finished_at)
+    return job
+
+
+def requeue_stale(older_than):
+    # Jobs whose worker died halfway through go back to the queue. Jobs are
+    # stamped when they start, not when their batch was claimed, so a live
+    # worker's job is only requeued if it runs longer than `older_than`.
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return DispatchJob.objects.filter(
+        status=DispatchJob.STATUS_RUNNING, claimed_at__lt=cutoff).update(
+            status=DispatchJob.STATUS_PENDING, worker=None)
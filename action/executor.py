@@ -0,0 +1,239 @@
+import logging
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connection
+
+import action.mappings as mappings
+
+logger = logging.getLogger(__name__)
+
+ActionResult = namedtuple('ActionResult',
+                          ['action', 'result', 'error', 'duration'])
+
+
+class ExecutionReport(object):
+    def __init__(self, results, wall_time):
+        self.results = results
+        self.wall_time = wall_time
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.error is None]
+
+    @property
+    def failed(self):
+        return [result for result in self.results if result.error is not None]
+
+    def __repr__(self):
+        return '<ExecutionReport: {0} ok, {1} failed in {2:.3f}s>'.format(
+            len(self.succeeded), len(self.failed), self.wall_time)
+
+
+class PipelineReport(ExecutionReport):
+    """
+    An `ExecutionReport` of a run along dependencies, with its critical
+    path: the chain of steps with the longest total duration, which bounds
+    the wall time however many workers there are.
+    """
+
+    def __init__(self, results, wall_time, critical_path):
+        super().__init__(results, wall_time)
+        self.critical_path = critical_path
+
+    @property
+    def critical_path_duration(self):
+        return sum(result.duration for result in self.critical_path)
+
+    def __repr__(self):
+        return ('<PipelineReport: {0} ok, {1} failed in {2:.3f}s, critical '
+                'path {3:.3f}s>').format(
+                    len(self.succeeded), len(self.failed), self.wall_time,
+                    self.critical_path_duration)
+
+
+class CycleError(ValueError):
+    pass
+
+
+class DependencyFailed(Exception):
+    """The error of steps not run because a step they depend on failed."""
+
+
+def run_action(action, input=None):
+    start = time.monotonic()
+    try:
+        if input is None:
+            result = action.make_it_so()
+        else:
+            result = action.make_it_so(input=input)
+    except Exception as e:
+        # One bad hook must not take the rest of the fan-out down with it.
+        logger.exception('Action %s failed', action.pk)
+        return ActionResult(action, None, e, time.monotonic() - start)
+    return ActionResult(action, result, None, time.monotonic() - start)
+
+
+def run_threaded(function, *args):
+    # Pool threads open connections of their own (rate limit buckets, lazy
+    # `hook.zip` loads, the run log); don't leave them open.
+    try:
+        return function(*args)
+    finally:
+        connection.close()
+
+
+def run_actions(actions, max_workers=None):
+    actions = list(actions)
+    start = time.monotonic()
+
+    if not actions:
+        return ExecutionReport([], time.monotonic() - start)
+
+    max_workers = min(max_workers or settings.ACTION_MAX_WORKERS,
+                      len(actions))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            lambda action: run_threaded(run_action, action), actions))
+
+    return ExecutionReport(results, time.monotonic() - start)
+
+
+def get_dependencies(actions):
+    """
+    pk -> pks of the actions each of `actions` depends on, in `actions` or
+    not.
+    """
+    dependencies = dict((action.pk, []) for action in actions)
+    if not actions:
+        return dependencies
+    through = type(actions[0]).depends_on.through
+    for pk, dependency in through.objects.filter(
+            from_actionwebhook__in=dependencies).values_list(
+                'from_actionwebhook', 'to_actionwebhook'):
+        dependencies[pk].append(dependency)
+    return dependencies
+
+
+def sort_steps(dependencies):
+    """The pks in an order where every step comes after its dependencies."""
+    # Dependencies outside of the run are not steps of it.
+    steps = set(dependencies)
+    remaining = dict((pk, set(pks) & steps)
+                     for pk, pks in dependencies.items())
+    ordered = []
+    ready = [pk for pk, pks in remaining.items() if not pks]
+    dependents = defaultdict(list)
+    for pk, pks in remaining.items():
+        for dependency in pks:
+            dependents[dependency].append(pk)
+    while ready:
+        pk = ready.pop()
+        ordered.append(pk)
+        for dependent in dependents[pk]:
+            remaining[dependent].discard(pk)
+            if not remaining[dependent]:
+                ready.append(dependent)
+    if len(ordered) < len(remaining):
+        raise CycleError('Actions {0} depend on each other.'.format(
+            sorted(set(remaining) - set(ordered))))
+    return ordered
+
+
+def step_input(input, dependencies, results):
+    # What a step is fired with: the run's input for the first steps, the
+    # output of the step it depends on, or those of all of them by pk.
+    if not dependencies:
+        return input
+    if len(dependencies) == 1:
+        return mappings.as_input(results[dependencies[0]].result)
+    return dict((str(pk), mappings.as_input(results[pk].result))
+                for pk in dependencies)
+
+
+def critical_path(order, dependencies, results):
+    longest = {}
+    for pk in order:
+        before = max((longest[dependency] for dependency in dependencies[pk]
+                      if dependency in longest),
+                     key=lambda path: path[0], default=(0, []))
+        longest[pk] = (before[0] + results[pk].duration,
+                       before[1] + [results[pk]])
+    return max(longest.values(), key=lambda path: path[0],
+               default=(0, []))[1]
+
+
+def run_pipeline(actions, max_workers=None, input=None, dependencies=None):
+    """
+    Run `actions` along their `depends_on`: each step starts once the steps
+    it depends on are done, with their output as its input, and steps that
+    don't wait on each other run concurrently. Steps depending on a failed
+    one, or on an action that is not part of the run (paused, or of another
+    Zip), are not run. Raises `CycleError` before running anything when the
+    dependencies loop.
+    """
+    actions = list(actions)
+    start = time.monotonic()
+    if dependencies is None:
+        dependencies = get_dependencies(actions)
+    order = sort_steps(dependencies)
+
+    if not actions:
+        return PipelineReport([], time.monotonic() - start, [])
+
+    by_pk = dict((action.pk, action) for action in actions)
+    waiting = dict((pk, set(pks) & by_pk.keys())
+                   for pk, pks in dependencies.items())
+    dependents = defaultdict(list)
+    for pk, pks in dependencies.items():
+        for dependency in pks:
+            dependents[dependency].append(pk)
+
+    results = {}
+    max_workers = min(max_workers or settings.ACTION_MAX_WORKERS,
+                      len(actions))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        def ready(pk):
+            missing = [dependency for dependency in dependencies[pk]
+                       if dependency not in by_pk]
+            failed = [dependency for dependency in dependencies[pk]
+                      if dependency in by_pk and
+                      results[dependency].error is not None]
+            if missing or failed:
+                reason = ('failed {0}'.format(failed) if failed else
+                          '{0}, not part of this run'.format(missing))
+                done(pk, ActionResult(by_pk[pk], None, DependencyFailed(
+                    'Action {0} depends on {1}.'.format(pk, reason)), 0))
+                return
+            running[executor.submit(
+                run_threaded, run_action, by_pk[pk],
+                step_input(input, dependencies[pk], results))] = pk
+
+        def done(pk, result):
+            results[pk] = result
+            for dependent in dependents[pk]:
+                waiting[dependent].discard(pk)
+                if not waiting[dependent]:
+                    ready(dependent)
+
+        for pk in order:
+            if not waiting[pk]:
+                ready(pk)
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done(running.pop(future), future.result())
+
+    return PipelineReport([results[action.pk] for action in actions],
+                          time.monotonic() - start,
+                          critical_path(order, dependencies, results))
@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def get_host(url):
+    # Pools are per scheme + host + port. Anything else in the URL is noise.
+    parts = urlsplit(url or '')
+    return '{0}://{1}'.format(parts.scheme, parts.netloc).lower()
+
+
+class TimedConnection(object):
+    """Mixed into urllib3's connections to time how long opening one takes."""
+    scheme = None
+
+    def connect(self):
+        # Only new connections get here, cheap enough to import late.
+        import action.metrics as metrics
+
+        started = metrics.start()
+        super().connect()
+        if started is not None:
+            netloc = (self.host if self.port in (None, self.default_port)
+                      else '{0}:{1}'.format(self.host, self.port))
+            metrics.connects.observe(
+                ('{0}://{1}'.format(self.scheme, netloc).lower(),),
+                time.monotonic() - started)
+
+
+class TimedHTTPConnection(TimedConnection, HTTPConnection):
+    scheme = 'http'
+
+
+class TimedHTTPSConnection(TimedConnection, HTTPSConnection):
+    scheme = 'https'
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """Adapter whose pools time the connections they open."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class SessionManager(object):
+    """
+    Keeps one keep-alive `requests.Session` per destination host so repeated
+    fires to the same host reuse pooled connections instead of paying the
+    TCP (and TLS) handshake every time.
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None,
+                 pool_block=None, idle_timeout=None, max_hosts=None):
+        self.pool_connections = (
+            pool_connections or settings.ACTION_HTTP_POOL_CONNECTIONS)
+        self.pool_maxsize = pool_maxsize or settings.ACTION_HTTP_POOL_MAXSIZE
+        self.pool_block = (settings.ACTION_HTTP_POOL_BLOCK
+                           if pool_block is None else pool_block)
+        self.idle_timeout = (settings.ACTION_HTTP_IDLE_TIMEOUT
+                             if idle_timeout is None else idle_timeout)
+        self.max_hosts = max_hosts or settings.ACTION_HTTP_MAX_HOSTS
+
+        # host -> [session, last_used]. Ordered by last use, oldest first.
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.sessions_created = 0
+        self.sessions_evicted = 0
+        # Requests and connections of sessions that are already gone, so the
+        # hit/miss counters survive evictions.
+        self._closed_requests = 0
+        self._closed_connections = 0
+
+    def new_session(self):
+        session = requests.Session()
+        # Sessions are shared by every hook pointing at the same host, so
+        # don't let one hook's cookies leak into another hook's requests.
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = TimedHTTPAdapter(pool_connections=self.pool_connections,
+                                   pool_maxsize=self.pool_maxsize,
+                                   pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get_session(self, url):
+        host = get_host(url)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._sessions.get(host)
+            if entry:
+                entry[1] = now
+                self._sessions.move_to_end(host)
+                return entry[0]
+
+            session = self.new_session()
+            self._sessions[host] = [session, now]
+            self.sessions_created += 1
+
+            while len(self._sessions) > self.max_hosts:
+                _, (oldest, _) = self._sessions.popitem(last=False)
+                self._close(oldest)
+        return session
+
+    def request(self, method, url, **kwargs):
+        return self.get_session(url).request(method, url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            while self._sessions:
+                _, (session, _) = self._sessions.popitem(last=False)
+                self._close(session)
+
+    def stats(self):
+        requests_sent = self._closed_requests
+        connections = self._closed_connections
+        with self._lock:
+            hosts = len(self._sessions)
+            for session, _ in self._sessions.values():
+                session_requests, session_connections = self._count(session)
+                requests_sent += session_requests
+                connections += session_connections
+
+        # Every request that did not need a new connection was served by a
+        # connection already sitting in the pool.
+        return {
+            'hosts': hosts,
+            'sessions_created': self.sessions_created,
+            'sessions_evicted': self.sessions_evicted,
+            'requests': requests_sent,
+            'pool_hits': max(requests_sent - connections, 0),
+            'pool_misses': connections,
+        }
+
+    def _evict_idle(self, now):
+        while self._sessions:
+            host, (session, last_used) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            del self._sessions[host]
+            self._close(session)
+
+    def _close(self, session):
+        session_requests, session_connections = self._count(session)
+        self._closed_requests += session_requests
+        self._closed_connections += session_connections
+        self.sessions_evicted += 1
+        session.close()
+
+    def _count(self, session):
+        session_requests = 0
+        session_connections = 0
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                session_requests += pool.num_requests
+                session_connections += pool.num_connections
+        return session_requests, session_connections
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = SessionManager()
+    return _manager
+
+
+def request(method, url, **kwargs):
+    return get_manager().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('get', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('post', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('put', url, **kwargs)
+
+
+def stats():
+    return get_manager().stats()
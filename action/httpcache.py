@@ -0,0 +1,366 @@
+"""
+Response cache for GET hooks that opt in with `"cache": true` in their data.
+
+Responses are kept as long as their `Cache-Control: max-age` or `Expires`
+says, then revalidated with `If-None-Match` / `If-Modified-Since`: a 304
+keeps serving the stored body without downloading it again. Entries are
+keyed by the URL and the request headers, so a `Vary` on any of those is
+honoured by construction.
+
+The memory tier is an LRU of at most `ACTION_HTTP_CACHE_SIZE` bytes of
+bodies. Set `ACTION_HTTP_CACHE_DIR` to add a disk tier of at most
+`ACTION_HTTP_CACHE_DISK_SIZE` bytes, shared by the processes of a node and
+surviving restarts.
+"""
+import email.utils
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+import action.jsoncodec as jsoncodec
+import action.responses as responses
+import action.utils as utils
+
+logger = logging.getLogger(__name__)
+
+
+def enabled(hook):
+    return (hook.hook_type == hook.HOOK_GET and
+            bool((hook.data or {}).get('cache')))
+
+
+def make_key(url, headers):
+    parts = [url] + sorted('{0}:{1}'.format(name.lower(), value)
+                           for name, value in (headers or {}).items())
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def parse_cache_control(value):
+    directives = {}
+    for directive in (value or '').split(','):
+        name, _, argument = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip().strip('"')
+    return directives
+
+
+def parse_date(value):
+    # Seconds since the epoch, None for missing or invalid dates.
+    if not value:
+        return None
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    return parsed.timestamp() if parsed else None
+
+
+def freshness(headers, now):
+    """
+    Unix time until which a response with `headers` is fresh, or None if it
+    must not be stored.
+    """
+    cache_control = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return now
+
+    try:
+        age = max(int(headers.get('Age') or 0), 0)
+    except ValueError:
+        age = 0
+    if 'max-age' in cache_control:
+        try:
+            return now + int(cache_control['max-age']) - age
+        except ValueError:
+            return now
+
+    if 'Expires' in headers:
+        expires = parse_date(headers.get('Expires'))
+        if expires is None:
+            # "Expires: 0" and friends mean already expired.
+            return now
+        date = parse_date(headers.get('Date'))
+        # Relative to the server's clock, when it says what that is.
+        return now + expires - date if date is not None else expires
+    return now
+
+
+class Entry(object):
+
+    def __init__(self, content, fresh_until, etag=None, last_modified=None):
+        self.content = content
+        self.fresh_until = fresh_until
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def __len__(self):
+        return len(self.content)
+
+    def is_fresh(self, now=None):
+        return (time.time() if now is None else now) < self.fresh_until
+
+    @property
+    def has_validators(self):
+        return bool(self.etag or self.last_modified)
+
+    def body(self):
+        return responses.Body(self.content, status_code=200)
+
+    def conditional(self, headers):
+        """`headers` plus the validators to revalidate this entry."""
+        headers = dict(headers or {})
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def meta(self):
+        return {'fresh_until': self.fresh_until, 'etag': self.etag,
+                'last_modified': self.last_modified}
+
+
+class DiskTier(object):
+    """Entries as files under `directory`, oldest dropped past `max_size`."""
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as cached:
+                meta = jsoncodec.loads(cached.readline())
+                content = cached.read()
+        except (OSError, ValueError):
+            return None
+        return Entry(content, meta['fresh_until'], meta.get('etag'),
+                     meta.get('last_modified'))
+
+    def put(self, key, entry):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(handle, 'wb') as cached:
+            cached.write(jsoncodec.dumps(entry.meta()).encode('utf-8'))
+            cached.write(b'\n')
+            cached.write(entry.content)
+        os.replace(temporary, path)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self.files())
+            else:
+                self._size += len(entry)
+            if self._size > self.max_size:
+                self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        files = sorted(self.files())
+        self._size = sum(size for _, size, _ in files)
+        # Down to 90%, so the next few writes don't walk the tree again.
+        for _, size, path in files:
+            if self._size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+
+class HTTPCache(object):
+
+    def __init__(self, max_size=None, directory=None, disk_size=None):
+        self.max_size = (settings.ACTION_HTTP_CACHE_SIZE
+                         if max_size is None else max_size)
+        directory = directory or settings.ACTION_HTTP_CACHE_DIR
+        self.disk = (DiskTier(directory, disk_size or
+                              settings.ACTION_HTTP_CACHE_DISK_SIZE)
+                     if directory else None)
+        self.size = 0
+        self.counts = dict.fromkeys(
+            ('hits', 'misses', 'revalidated', 'refreshed', 'stored',
+             'evicted', 'disk_hits', 'uncacheable'), 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if self.disk is None:
+            return None
+        entry = self.disk.get(key)
+        if entry is not None:
+            self.count('disk_hits')
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        self._remember(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, entry)
+            except OSError as e:
+                logger.warning(e)
+
+    def _remember(self, key, entry):
+        if len(entry) > self.max_size:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = entry
+            self.size += len(entry)
+            while self.size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.counts['evicted'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= len(entry)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            for name in self.counts:
+                self.counts[name] = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counts, entries=len(self._entries),
+                         bytes=self.size)
+        return stats
+
+    def before(self, url, headers):
+        """
+        `(key, entry, headers to send)`, or `(key, entry, None)` when the
+        entry is fresh and nothing needs to be sent.
+        """
+        key = make_key(url, headers)
+        entry = self.get(key)
+        if entry is None:
+            self.count('misses')
+            return key, None, headers
+        if entry.is_fresh():
+            self.count('hits')
+            return key, entry, None
+        if entry.has_validators:
+            return key, entry, entry.conditional(headers)
+        self.count('misses')
+        return key, None, headers
+
+    def after(self, key, entry, response, body):
+        """The `Body` of a fire, given the response to `before`'s request."""
+        now = time.time()
+        if response.status_code == 304 and entry is not None:
+            body.close()
+            self.count('revalidated')
+            fresh_until = freshness(response.headers, now)
+            entry = Entry(entry.content,
+                          entry.fresh_until if fresh_until is None
+                          else fresh_until,
+                          response.headers.get('ETag') or entry.etag,
+                          (response.headers.get('Last-Modified') or
+                           entry.last_modified))
+            self.put(key, entry)
+            return entry.body()
+
+        result = utils.handle_response(response, body)
+        if entry is not None:
+            self.count('refreshed')
+        fresh_until = freshness(response.headers, now)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if (response.status_code != 200 or fresh_until is None or
+                result.spilled or result.truncated or
+                response.headers.get('Vary', '').strip() == '*' or
+                (fresh_until <= now and not (etag or last_modified))):
+            self.count('uncacheable')
+            if entry is not None:
+                self.delete(key)
+            return result
+
+        self.put(key, Entry(result.content, fresh_until, etag,
+                            last_modified))
+        self.count('stored')
+        return result
+
+    def fetch(self, url, headers, send):
+        """
+        Fire through the cache. `send(headers)` makes the request and
+        returns `(response, body)`.
+        """
+        key, entry, request_headers = self.before(url, headers)
+        if request_headers is None:
+            return entry.body()
+        response, body = send(request_headers)
+        return self.after(key, entry, response, body)
+
+    async def afetch(self, url, headers, send):
+        """Same as `fetch`, with a coroutine `send`."""
+        key, entry, request_headers = self.before(url, headers)
+        if request_headers is None:
+            return entry.body()
+        response, body = await send(request_headers)
+        return self.after(key, entry, response, body)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    # Built on first use, so its size comes from the settings of the day.
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HTTPCache()
+    return _cache
+
+
+def stats():
+    return get_cache().stats()
@@ -0,0 +1,196 @@
+"""
+Idempotency keys, and suppression of duplicate fires.
+
+With `ACTION_IDEMPOTENCY_ENABLED`, every request plan gets a key hashed
+over the hook id, method, URL, headers and body, sent as the
+`ACTION_IDEMPOTENCY_HEADER` header. Retries of a fire send the same key.
+
+A fire whose key was fired less than `ACTION_IDEMPOTENCY_WINDOW` seconds
+ago (or the hook's `"dedupeWindow"`) is not sent: it shares the result of
+the fire still in flight, or gets the result of the one that completed.
+Failed fires are forgotten right away so they can be fired again. Keys are
+kept in a TTL map of at most `ACTION_IDEMPOTENCY_MAX_KEYS` entries. Every
+caller gets its own `share()` of a response body, so one closing it doesn't
+empty it for the others.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from django.conf import settings
+
+import action.responses as responses
+
+
+def fingerprint(hook, plan):
+    header = settings.ACTION_IDEMPOTENCY_HEADER.lower()
+    digest = hashlib.sha256()
+    for part in ([str(hook.pk), plan.method.upper(), plan.url or ''] +
+                 sorted('{0}:{1}'.format(name.lower(), value)
+                        for name, value in (plan.headers or {}).items()
+                        if name.lower() != header)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+
+    body = plan.body
+    if isinstance(body, bytes):
+        digest.update(body)
+    elif body is not None:
+        # Streamed bodies are hashed chunk by chunk, like they are sent.
+        for chunk in body:
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stamp(hook, plan):
+    """`plan` with its idempotency key header, when keys are on."""
+    if not settings.ACTION_IDEMPOTENCY_ENABLED:
+        return plan
+    headers = dict(plan.headers or {})
+    headers[settings.ACTION_IDEMPOTENCY_HEADER] = fingerprint(hook, plan)
+    return plan._replace(headers=headers)
+
+
+def stamp_batch(hook, headers, body):
+    """The headers of a batch request, keyed on the batch's own body."""
+    name = settings.ACTION_IDEMPOTENCY_HEADER
+    if not settings.ACTION_IDEMPOTENCY_ENABLED or name not in headers:
+        return headers
+    headers = dict(headers)
+    headers[name] = hashlib.sha256(
+        str(hook.pk).encode('utf-8') + b'\0' + body).hexdigest()
+    return headers
+
+
+def get_key(plan):
+    if not settings.ACTION_IDEMPOTENCY_ENABLED:
+        return None
+    return (plan.headers or {}).get(settings.ACTION_IDEMPOTENCY_HEADER)
+
+
+def get_window(hook):
+    return float((hook.data or {}).get(
+        'dedupeWindow', settings.ACTION_IDEMPOTENCY_WINDOW))
+
+
+class Suppressor(object):
+    """
+    Keys of fires in flight, and of those completed in the last window,
+    with the future of their result.
+    """
+
+    def __init__(self, max_keys=None):
+        self.max_keys = max_keys or settings.ACTION_IDEMPOTENCY_MAX_KEYS
+        # key -> [expiry, or None while in flight, future]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.fired = 0
+        self.shared = 0
+        self.suppressed = 0
+
+    def claim(self, key):
+        """`(future, fire)`: whether the caller fires or waits on `future`."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, future = entry
+                if expires is None:
+                    self.shared += 1
+                    return future, False
+                if expires > now:
+                    self.suppressed += 1
+                    return future, False
+                del self._entries[key]
+
+            future = Future()
+            self._entries[key] = [None, future]
+            self.fired += 1
+            while len(self._entries) > self.max_keys:
+                # In-flight fires dropped here just stop being shared.
+                self._entries.popitem(last=False)
+            return future, True
+
+    def done(self, key, future, window, result=None, error=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is future:
+                if error is None:
+                    entry[0] = time.monotonic() + window
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def _expire(self, now):
+        # Completed entries are moved to the end, so the front holds the
+        # oldest ones. Hooks with longer windows can hold a few short lived
+        # keys behind them, the size bound takes care of those.
+        while self._entries:
+            expires, _ = next(iter(self._entries.values()))
+            if expires is None or expires > now:
+                break
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {'keys': len(self), 'fired': self.fired,
+                'shared': self.shared, 'suppressed': self.suppressed}
+
+
+suppressor = Suppressor()
+
+
+def call(hook, plan, fire):
+    """
+    `fire()`, sending `plan`, unless the same fire is in flight or was just
+    sent.
+    """
+    key = get_key(plan)
+    window = get_window(hook)
+    if key is None or window <= 0:
+        return fire()
+
+    future, owner = suppressor.claim(key)
+    if not owner:
+        return responses.share(future.result())
+    try:
+        result = fire()
+    except Exception as e:
+        suppressor.done(key, future, window, error=e)
+        raise
+    # The window keeps a share of its own, the others are made from it.
+    suppressor.done(key, future, window, responses.share(result))
+    return result
+
+
+async def acall(hook, plan, fire):
+    """Same as `call`, for a coroutine function `fire`."""
+    key = get_key(plan)
+    window = get_window(hook)
+    if key is None or window <= 0:
+        return await fire()
+
+    future, owner = suppressor.claim(key)
+    if not owner:
+        return responses.share(await asyncio.wrap_future(future))
+    try:
+        result = await fire()
+    except Exception as e:
+        suppressor.done(key, future, window, error=e)
+        raise
+    suppressor.done(key, future, window, responses.share(result))
+    return result
@@ -0,0 +1,80 @@
+"""
+JSON encoders/decoders behind one name, picked with `ACTION_JSON_CODEC`.
+
+The stdlib codec is always there. Faster ones are registered when their
+package can be imported, so switching the whole fleet is a settings change.
+"""
+import json
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# dumps(obj) -> str, loads(str, bytes or a memoryview) -> obj. Decoding
+# errors must be ValueErrors, which is what callers catch.
+Codec = namedtuple('Codec', ['name', 'dumps', 'loads'])
+
+_codecs = OrderedDict()
+
+
+def register(name, dumps, loads):
+    _codecs[name] = Codec(name, dumps, loads)
+
+
+def available():
+    return list(_codecs)
+
+
+def get_codec(name=None):
+    name = name or settings.ACTION_JSON_CODEC
+    try:
+        return _codecs[name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            'Unknown JSON codec "{0}", pick one of: {1}'.format(
+                name, ', '.join(available())))
+
+
+def dumps(obj):
+    return get_codec().dumps(obj)
+
+
+def loads(data):
+    return get_codec().loads(data)
+
+
+def _text(data):
+    # Decoded straight from a memoryview, with no bytes copy in between.
+    return data if isinstance(data, str) else str(data, 'utf-8')
+
+
+def _str_or_bytes(data):
+    return data if isinstance(data, (str, bytes)) else _text(data)
+
+
+register('json', json.dumps, lambda data: json.loads(_text(data)))
+
+try:
+    import simplejson
+except ImportError:
+    pass
+else:
+    register('simplejson', simplejson.dumps,
+             lambda data: simplejson.loads(_str_or_bytes(data)))
+
+try:
+    import ujson
+except ImportError:
+    pass
+else:
+    register('ujson',
+             lambda obj: ujson.dumps(obj, escape_forward_slashes=False),
+             lambda data: ujson.loads(_str_or_bytes(data)))
+
+try:
+    import orjson
+except ImportError:
+    pass
+else:
+    register('orjson', lambda obj: orjson.dumps(obj).decode('utf-8'),
+             orjson.loads)
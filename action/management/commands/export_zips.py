@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+import action.transfer as transfer
+
+
+class Command(BaseCommand):
+    help = ('Write Zips and their actions as JSON Lines, for import_zips to '
+            'load elsewhere.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--zip', type=int, nargs='+', dest='zips',
+            help='Only these Zips (pks) and their actions.')
+        parser.add_argument(
+            '--output', help='File to write, standard output by default.')
+
+    def handle(self, *args, **options):
+        progress = transfer.Progress(self.progress)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                transfer.export(output, options['zips'], progress)
+        else:
+            transfer.export(self.stdout, options['zips'], progress)
+        self.report(progress)
+
+    def progress(self, progress):
+        # The rows may be going to stdout, so progress goes to stderr.
+        self.stderr.write('{0} rows, {1:.0f} rows/s'.format(
+            progress.total, progress.rate))
+
+    def report(self, progress):
+        self.stderr.write('Exported {0}'.format(progress.summary()))
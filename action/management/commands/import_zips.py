@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+import action.transfer as transfer
+
+
+class Command(BaseCommand):
+    help = ('Create the Zips and actions of an export_zips file, keeping '
+            'their primary keys.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?',
+            help='File to read, standard input by default.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows created per query.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        progress = transfer.Progress(self.progress)
+        if options['input']:
+            with open(options['input'], encoding='utf-8') as lines:
+                self.load(lines, progress, options)
+        else:
+            self.load(sys.stdin, progress, options)
+
+        self.stdout.write('Imported {0}'.format(progress.summary()))
+
+    def load(self, lines, progress, options):
+        transfer.load(lines, batch_size=options['batch_size'],
+                      using=options['database'], progress=progress)
+
+    def progress(self, progress):
+        self.stdout.write('{0} rows, {1:.0f} rows/s'.format(
+            progress.total, progress.rate))
@@ -0,0 +1,17 @@
+from django.core.management.base import CommandError
+
+from action.models import ActionWebhook
+from action.profiling import ProfileCommand
+
+
+class Command(ProfileCommand):
+    help = ('Fire an action a number of times and write cProfile stats, '
+            'top allocations and collapsed stacks of those fires.')
+    name = 'action'
+
+    def get_fire(self, pk):
+        try:
+            hook = ActionWebhook.objects.select_related('zip').get(pk=pk)
+        except ActionWebhook.DoesNotExist:
+            raise CommandError('Action {0} does not exist'.format(pk))
+        return hook.make_it_so, [hook]
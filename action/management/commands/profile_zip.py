@@ -0,0 +1,41 @@
+from django.core.management.base import CommandError
+
+from action.executor import get_dependencies, run_pipeline
+from action.profiling import ProfileCommand
+from zip.models import Zip
+
+
+class Command(ProfileCommand):
+    help = ('Fire the actions of a Zip a number of times and write cProfile '
+            'stats, top allocations and collapsed stacks of those fires.')
+    name = 'zip'
+    max_workers = None
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--max-workers', type=int, default=None,
+            help='Threads firing the Zip\'s actions.')
+
+    def get_fire(self, pk):
+        try:
+            zipp = Zip.objects.get(pk=pk)
+        except Zip.DoesNotExist:
+            raise CommandError('Zip {0} does not exist'.format(pk))
+        if not zipp.active:
+            raise CommandError('Zip {0} is not active'.format(pk))
+
+        hooks = list(zipp.actionwebhook_set.filter(paused=False)
+                     .select_related('zip'))
+        dependencies = get_dependencies(hooks)
+        max_workers = self.max_workers
+
+        # What Zip.make_it_so does, on hooks loaded once.
+        def fire():
+            return run_pipeline(hooks, max_workers=max_workers,
+                                dependencies=dependencies)
+        return fire, hooks
+
+    def handle(self, *args, **options):
+        self.max_workers = options['max_workers']
+        super().handle(*args, **options)
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import action.runlog as runlog
+
+
+class Command(BaseCommand):
+    help = ('Drop execution log rows past the retention period and, on '
+            'PostgreSQL, create the partitions of the coming days.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Days of runs to keep, ACTION_RUN_LOG_RETENTION_DAYS by '
+                 'default.')
+        parser.add_argument(
+            '--ahead', type=int, default=7,
+            help='Days of partitions to create in advance.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = settings.ACTION_RUN_LOG_RETENTION_DAYS
+
+        dropped, deleted, created = runlog.prune(
+            days, ahead=options['ahead'], using=options['database'])
+
+        for day in dropped:
+            self.stdout.write('Dropped {0}'.format(runlog.partition_name(day)))
+        self.stdout.write('Deleted {0} rows'.format(deleted))
+        for day in created:
+            self.stdout.write('Created {0}'.format(runlog.partition_name(day)))
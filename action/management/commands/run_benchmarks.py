@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+import benchmarks.suite as suite
+
+
+class Command(BaseCommand):
+    help = ('Fire synthetic hooks of every type at a local stand-in server '
+            'and report throughput, latency percentiles, CPU and memory.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fires', type=int, default=200,
+            help='Fires per hook and concurrency level.')
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 10, 50])
+        parser.add_argument(
+            '--latency', type=float, default=0.01,
+            help='Seconds the stand-in server takes to answer.')
+        parser.add_argument(
+            '--items', type=int, default=10,
+            help='Key, value pairs in each hook\'s data.')
+        parser.add_argument(
+            '--no-memory', action='store_true', default=False,
+            help='Skip the traced memory runs.')
+        parser.add_argument(
+            '--output', help='Write the JSON report to this file.')
+        parser.add_argument(
+            '--compare', help='JSON report of an earlier run to diff with.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            '{0:>5} {1:>5} {2:>5} {3:>9} {4:>8} {5:>8} {6:>8} {7:>6} '
+            '{8:>9}'.format('hook', 'type', 'conc', 'fires/s', 'p50 ms',
+                            'p95 ms', 'p99 ms', 'cpu %', 'peak KB'))
+
+        report = suite.run(
+            fires=options['fires'], concurrency=options['concurrency'],
+            latency=options['latency'], items=options['items'],
+            trace_memory=not options['no_memory'], progress=self.progress)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+            self.stdout.write('Report written to {0}'.format(
+                options['output']))
+
+        if options['compare']:
+            with open(options['compare']) as previous:
+                self.write_comparison(json.load(previous), report)
+
+    def progress(self, result):
+        latency = result['latency']
+        self.stdout.write(
+            '{0:>5} {1:>5} {2:>5} {3:>9.1f} {4:>8.2f} {5:>8.2f} {6:>8.2f} '
+            '{7:>6.1f} {8:>9}'.format(
+                result['hook_type'], result['payload_type'] or '-',
+                result['concurrency'], result['throughput'],
+                latency['p50'] * 1000, latency['p95'] * 1000,
+                latency['p99'] * 1000, result['cpu_percent'],
+                result['peak_traced_kb'] or '-'))
+
+    def write_comparison(self, old, new):
+        self.stdout.write('Compared with {0}:'.format(old['meta']['started']))
+        for (hook_type, payload_type, level), before, after in suite.compare(
+                old, new):
+            self.stdout.write(
+                '{0:>5} {1:>5} {2:>5} fires/s {3:+7.1%} p99 {4:+7.1%}'.format(
+                    hook_type, payload_type or '-', level,
+                    after['throughput'] / before['throughput'] - 1,
+                    after['latency']['p99'] / before['latency']['p99'] - 1))
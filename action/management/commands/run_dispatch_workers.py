@@ -0,0 +1,113 @@
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+import action.dispatch as dispatch
+from action.models import DispatchJob
+
+
+class Command(BaseCommand):
+    help = ('Claim queued dispatch jobs in batches and run them on a pool '
+            'of worker threads. Start it on as many nodes as needed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.ACTION_DISPATCH_WORKERS)
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.ACTION_DISPATCH_BATCH_SIZE,
+            help='Jobs claimed by a worker at a time.')
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.ACTION_DISPATCH_POLL_INTERVAL,
+            help='Seconds to wait when the queue is empty.')
+        parser.add_argument(
+            '--stale-after', type=float,
+            default=settings.ACTION_DISPATCH_STALE_AFTER,
+            help='Requeue running jobs started this many seconds ago.')
+        parser.add_argument(
+            '--report-interval', type=float, default=10,
+            help='Seconds between throughput reports.')
+        parser.add_argument(
+            '--max-jobs', type=int, default=0,
+            help='Stop after about this many jobs. 0 runs forever.')
+        parser.add_argument(
+            '--burst', action='store_true', default=False,
+            help='Stop once the queue is empty.')
+
+    def handle(self, *args, **options):
+        requeued = dispatch.requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write('Requeued {0} stale jobs'.format(requeued))
+
+        self.options = options
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+
+        prefix = '{0}:{1}'.format(socket.gethostname(), os.getpid())
+        threads = [
+            threading.Thread(target=self.work,
+                             args=('{0}:{1}'.format(prefix, n),),
+                             daemon=True)
+            for n in range(options['workers'])
+        ]
+
+        start = last_report = time.monotonic()
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.1)
+                if time.monotonic() - last_report >= (
+                        options['report_interval']):
+                    last_report = time.monotonic()
+                    self.report(start)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.report(start)
+
+    def work(self, worker):
+        options = self.options
+        try:
+            while not self.stop.is_set():
+                jobs = dispatch.claim(options['batch_size'], worker)
+
+                if not jobs:
+                    if options['burst']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+                    continue
+
+                for job in jobs:
+                    if dispatch.run_job(job) is not None:
+                        self.count(job)
+
+                if options['max_jobs'] and self.done >= options['max_jobs']:
+                    self.stop.set()
+        finally:
+            # Every thread gets its own connection, don't leave them around.
+            connection.close()
+
+    def count(self, job):
+        with self.lock:
+            self.done += 1
+            if job.status == DispatchJob.STATUS_FAILED:
+                self.failed += 1
+
+    def report(self, start):
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            'Ran {0} jobs ({1} failed) in {2:.2f}s, {3:.1f} jobs/sec'.format(
+                self.done, self.failed, elapsed,
+                self.done / elapsed if elapsed else 0))
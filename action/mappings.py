@@ -0,0 +1,132 @@
+"""
+Field mappings from the previous step's data into a hook's payload.
+
+`data` values can reference the input of a fire, `make_it_so(input=...)`:
+`{{trigger.user.email}}` is the `email` of the input's `user`, and list
+items are numbers, `{{trigger.items.0.id}}`. A value that is a reference
+and nothing else keeps the referenced value's type; references inside
+text are rendered as text, missing values as nothing. Hooks with no
+`data` at all send the input itself. A fire without input renders against
+an empty one, so its references are all missing.
+
+Templates are parsed once per hook revision into accessor functions, so
+rendering the payload of an event is only lookups.
+"""
+import re
+from collections import OrderedDict
+
+import action.plans as plans
+import action.responses as responses
+import action.utils as utils
+
+ROOT = 'trigger'
+REFERENCE = re.compile(r'{{\s*' + ROOT + r'((?:\.[^.{}\s]+)*)\s*}}')
+
+
+def compile_path(path):
+    """An accessor for the `.`-separated `path` below the input."""
+    # Numbers index lists, and are keys like any other name in dicts: the
+    # outputs of several dependencies are keyed by their pk, as text.
+    steps = tuple((name, int(name) if name.isdigit() else None)
+                  for name in path.split('.') if name)
+
+    if not steps:
+        return lambda value: value
+    if len(steps) == 1:
+        (name, index), = steps
+
+        def access(value):
+            try:
+                if index is not None and isinstance(value, list):
+                    return value[index]
+                return value[name]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return access
+
+    def access(value):
+        try:
+            for name, index in steps:
+                if index is not None and isinstance(value, list):
+                    value = value[index]
+                else:
+                    value = value[name]
+        except (KeyError, IndexError, TypeError):
+            return None
+        return value
+    return access
+
+
+def compile_value(value):
+    """A function rendering `value` for an input, None if it is constant."""
+    if not isinstance(value, str) or '{{' not in value:
+        return None
+
+    whole = REFERENCE.fullmatch(value.strip())
+    if whole:
+        return compile_path(whole.group(1))
+
+    parts = []
+    position = 0
+    for match in REFERENCE.finditer(value):
+        if match.start() > position:
+            parts.append(value[position:match.start()])
+        parts.append(compile_path(match.group(1)))
+        position = match.end()
+    if not parts:
+        # Braces, but nothing of ours.
+        return None
+    if position < len(value):
+        parts.append(value[position:])
+
+    def render(input):
+        return ''.join(text(part(input)) if callable(part) else part
+                       for part in parts)
+    return render
+
+
+def text(value):
+    return '' if value is None else str(value)
+
+
+def as_input(value):
+    """The data of a previous step's result, for `render`."""
+    if isinstance(value, responses.Body):
+        try:
+            return value.json()
+        except ValueError:
+            with value.view() as view:
+                return str(view, 'utf-8', 'replace')
+    return value
+
+
+class Mapping(object):
+
+    def __init__(self, items):
+        # (key, constant value, renderer or None)
+        self.fields = [(key, value, compile_value(value))
+                       for key, value in (utils.build_dict(items) or
+                                          {}).items()]
+        self.uses_input = (not self.fields or
+                           any(render for _, _, render in self.fields))
+
+    def render(self, input):
+        if not self.fields:
+            return input if isinstance(input, dict) else {'data': input}
+        return OrderedDict(
+            (key, value if render is None else render(input))
+            for key, value, render in self.fields)
+
+
+# Keyed like the request plans, `(pk, modified)`.
+cache = plans.PlanCache()
+
+
+def get_mapping(hook):
+    if hook.pk is None or hook._state.adding:
+        return Mapping(hook.data.get('data'))
+    mapping = cache.get(hook.pk, hook.modified)
+    if mapping is None:
+        mapping = Mapping(hook.data.get('data'))
+        cache.set(hook.pk, hook.modified, mapping)
+    return mapping
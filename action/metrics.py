@@ -0,0 +1,216 @@
+"""
+Per-phase timings of fires, rendered in the Prometheus text format.
+
+Turned on with `ACTION_METRICS_ENABLED`. When off, instrumented code pays
+for one settings lookup per fire and phase and nothing is recorded.
+
+Phases of a fire: `throttle` (rate limit wait), `plan` (getting the
+compiled request), `headers` and `data` (compiling it, on plan cache
+misses), `request` (connecting, sending and waiting for the response
+headers), `response` (reading the body) and `total`.
+"""
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+import action.http as http
+
+BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10,
+           30, 60)
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def format_labels(names, values, extra=''):
+    labels = ','.join('{0}="{1}"'.format(name, escape(value))
+                      for name, value in zip(names, values))
+    if extra:
+        labels = '{0},{1}'.format(labels, extra) if labels else extra
+    return '{{{0}}}'.format(labels) if labels else ''
+
+
+class Metric(object):
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        yield '# HELP {0} {1}'.format(self.name, self.documentation)
+        yield '# TYPE {0} {1}'.format(self.name, self.kind)
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield from self.render_value(labels, value)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render_value(self, labels, value):
+        yield '{0}{1} {2}'.format(
+            self.name, format_labels(self.labels, labels), value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Count per bucket (the last one is +Inf), sum.
+                entry = self._values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def get(self, labels=()):
+        entry = self._values.get(labels)
+        return (sum(entry[0]), entry[1]) if entry else (0, 0.0)
+
+    def render_value(self, labels, value):
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            yield '{0}_bucket{1} {2}'.format(
+                self.name, format_labels(
+                    self.labels, labels, 'le="{0}"'.format(bound)),
+                cumulative)
+        yield '{0}_sum{1} {2}'.format(
+            self.name, format_labels(self.labels, labels), total)
+        yield '{0}_count{1} {2}'.format(
+            self.name, format_labels(self.labels, labels), cumulative)
+
+
+FIRE_LABELS = ('hook_type', 'payload_type', 'host')
+
+phases = Histogram(
+    'action_phase_seconds', 'Time spent in each phase of a fire.',
+    ('phase',) + FIRE_LABELS)
+fires = Counter(
+    'action_fires_total', 'Fires by outcome.', FIRE_LABELS + ('outcome',))
+connects = Histogram(
+    'action_connect_seconds', 'Time to open a new connection to a host.',
+    ('host',))
+claims = Histogram(
+    'action_dispatch_claim_seconds',
+    'Time to claim a batch of dispatch jobs and load their rows.')
+
+METRICS = [phases, fires, connects, claims]
+
+
+def enabled():
+    return settings.ACTION_METRICS_ENABLED
+
+
+def start():
+    """A start time to hand to `observe`, None when metrics are off."""
+    return time.monotonic() if settings.ACTION_METRICS_ENABLED else None
+
+
+def fire_labels(hook):
+    data = hook.data or {}
+    payload_type = ('' if hook.hook_type == 'get'
+                    else data.get('payloadType', 'form'))
+    return (hook.hook_type, payload_type, http.get_host(data.get('url')))
+
+
+def observe(phase, hook, started):
+    """
+    Record the time since `started` for `phase` of `hook`'s fire. Returns
+    the time now, the start of the next phase.
+    """
+    if started is None:
+        return None
+    now = time.monotonic()
+    phases.observe((phase,) + fire_labels(hook), now - started)
+    return now
+
+
+def observe_seconds(phase, hook, seconds):
+    if settings.ACTION_METRICS_ENABLED:
+        phases.observe((phase,) + fire_labels(hook), seconds)
+
+
+def fired(hook, started, error=None):
+    """Count a whole fire of `hook`, started at `started`."""
+    if started is None:
+        return
+    labels = fire_labels(hook)
+    phases.observe(('total',) + labels, time.monotonic() - started)
+    fires.inc(labels + ('error' if error else 'ok',))
+
+
+def render_stats(name, documentation, kind, stats):
+    # Counters kept by the other modules, read at scrape time.
+    yield '# HELP {0} {1}'.format(name, documentation)
+    yield '# TYPE {0} {1}'.format(name, kind)
+    for key, value in sorted(stats.items()):
+        yield '{0}{1} {2}'.format(name, format_labels(('stat',), (key,)),
+                                  value)
+
+
+def render():
+    import action.batching as batching
+    import action.httpcache as httpcache
+    import action.idempotency as idempotency
+    import action.plans as plans
+    import action.ratelimit as ratelimit
+    import action.retry as retry
+    import action.runlog as runlog
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, documentation, stats in (
+            ('action_http_pool', 'Connection pools, see action.http.',
+             http.stats()),
+            ('action_plan_cache', 'Compiled request plans cache.',
+             plans.cache.stats()),
+            ('action_http_cache', 'GET response cache.',
+             httpcache.stats()),
+            ('action_rate_limit', 'Rate limiter reservations and waits.',
+             ratelimit.limiter.stats()),
+            ('action_circuit_breaker', 'Hosts failing and rejected fires.',
+             retry.breaker.stats()),
+            ('action_batching', 'Batched fires.',
+             batching.batcher.stats()),
+            ('action_idempotency', 'Fires sent, shared and suppressed.',
+             idempotency.suppressor.stats()),
+            ('action_run_log', 'Execution log rows buffered and written.',
+             runlog.log.stats())):
+        lines.extend(render_stats(name, documentation, 'gauge', stats))
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    for metric in METRICS:
+        metric.clear()
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('action', '0004_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='actionwebhook',
+            name='hook_type',
+            field=models.CharField(choices=[('get', 'Get'), ('post', 'Post'), ('put', 'Put')], db_index=True, max_length=256),
+        ),
+    ]
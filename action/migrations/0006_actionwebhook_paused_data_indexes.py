@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# GIN for data @> '{...}' lookups, and the URL host expression that
+# ActionWebhookQuerySet.for_host() filters on. PostgreSQL only.
+INDEXES = (
+    ('action_actionwebhook_data_gin',
+     'USING gin (data jsonb_path_ops)'),
+    ('action_actionwebhook_url_host',
+     "(lower(substring((data ->> 'url') "
+     "from '^[^:]+://(?:[^@/]*@)?([^/:?#]+)')))"),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX {0} ON action_actionwebhook {1}'.format(
+                name, definition))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {0}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('action', '0005_actionwebhook_hook_type_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actionwebhook',
+            name='paused',
+            field=models.BooleanField(db_index=True, default=False, help_text='Paused hooks are skipped when their Zip fires.'),
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# On PostgreSQL the table is partitioned by day, which Django can't create:
+# the primary key has to include the partition key. Rows that match no day
+# land in the default partition, so inserts never fail; prune_action_runs
+# creates the days ahead.
+POSTGRESQL_TABLE = """
+CREATE TABLE action_actionrun (
+    id bigserial NOT NULL,
+    action_id integer NOT NULL,
+    zip_id integer NOT NULL,
+    started timestamp with time zone NOT NULL,
+    duration double precision NOT NULL,
+    status_code smallint NULL CHECK (status_code >= 0),
+    request_bytes bigint NULL,
+    response_bytes bigint NULL,
+    error text NULL,
+    PRIMARY KEY (id, started)
+) PARTITION BY RANGE (started);
+CREATE TABLE action_actionrun_default PARTITION OF action_actionrun DEFAULT;
+CREATE INDEX action_actionrun_started ON action_actionrun (started);
+CREATE INDEX action_actionrun_action_started
+    ON action_actionrun (action_id, started);
+"""
+
+
+def create_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_TABLE)
+    else:
+        schema_editor.create_model(apps.get_model('action', 'ActionRun'))
+
+
+def drop_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE action_actionrun CASCADE')
+    else:
+        schema_editor.delete_model(apps.get_model('action', 'ActionRun'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zip', '0003_zip_active_index'),
+        ('action', '0006_actionwebhook_paused_data_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ActionRun',
+                    fields=[
+                        ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                        ('started', models.DateTimeField(db_index=True)),
+                        ('duration', models.FloatField()),
+                        ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                        ('request_bytes', models.BigIntegerField(blank=True, null=True)),
+                        ('response_bytes', models.BigIntegerField(blank=True, null=True)),
+                        ('error', models.TextField(blank=True, null=True)),
+                        ('action', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='runs', to='action.ActionWebhook')),
+                        ('zip', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='zip.Zip')),
+                    ],
+                    options={
+                        'index_together': {('action', 'started')},
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_table, drop_table),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('action', '0007_actionrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actionwebhook',
+            name='depends_on',
+            field=models.ManyToManyField(blank=True, help_text="Actions of the same Zip to run first, their output is this one's input.", related_name='dependents', to='action.ActionWebhook'),
+        ),
+    ]
@@ -1,14 +1,36 @@
-import json
+import asyncio
+import functools
 import logging
-import requests
-
-from django.db import models
+import re
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.postgres.fields import JSONField
+from django.utils import timezone
 
-from dicttoxml import dicttoxml
 from model_utils.models import TimeStampedModel
 
+import action.aio as aio
+import action.batching as batching
+import action.http as http
+import action.httpcache as httpcache
+import action.idempotency as idempotency
+import action.jsoncodec as jsoncodec
+import action.mappings as mappings
+import action.metrics as metrics
+import action.plans as plans
+import action.ratelimit as ratelimit
+import action.responses as responses
+import action.retry as retry
+import action.runlog as runlog
+import action.schemas as schemas
+import action.streaming as streaming
 import action.utils as utils
+import action.xmlstream as xmlstream
 from zip.models import Zip
 
 logger = logging.getLogger(__name__)
@@ -23,6 +45,55 @@ class Action(TimeStampedModel):
         abstract = True
 
 
+# Host of data->>'url', lower-cased. Must match the expression index of
+# migration 0006 for PostgreSQL to use it.
+URL_HOST_SQL = ("lower(substring(({data} ->> 'url') "
+                "from '^[^:]+://(?:[^@/]*@)?([^/:?#]+)'))")
+
+
+class ActionWebhookQuerySet(models.QuerySet):
+
+    def is_postgresql(self):
+        return connections[self.db].vendor == 'postgresql'
+
+    def for_host(self, host):
+        """Hooks whose URL points at `host`."""
+        host = host.lower()
+        if self.is_postgresql():
+            connection = connections[self.db]
+            data = '{0}.{1}'.format(
+                connection.ops.quote_name(self.model._meta.db_table),
+                connection.ops.quote_name('data'))
+            return self.extra(where=[
+                URL_HOST_SQL.format(data=data) + ' = %s'], params=[host])
+        return self.filter(data__url__iregex=(
+            r'^[^:]+://([^@/]*@)?{0}([:/?#]|$)'.format(re.escape(host))))
+
+    def with_payload_type(self, payload_type):
+        """POST/PUT hooks sending `payload_type`, form when not set."""
+        if self.is_postgresql():
+            # data @> '{...}' is what the GIN index answers.
+            match = models.Q(data__contains={'payloadType': payload_type})
+            unset = ~models.Q(data__has_key='payloadType')
+        else:
+            match = models.Q(data__payloadType=payload_type)
+            unset = models.Q(data__payloadType__isnull=True)
+        if payload_type == 'form':
+            match |= unset
+        return self.exclude(hook_type=ActionWebhook.HOOK_GET).filter(match)
+
+    def running(self):
+        """Hooks that fire with their Zip: not paused, on active Zips."""
+        return self.filter(paused=False, zip__active=True)
+
+    def pause(self):
+        """Stop firing these hooks with their Zip. Returns how many."""
+        return self.update(paused=True, modified=timezone.now())
+
+    def resume(self):
+        return self.update(paused=False, modified=timezone.now())
+
+
 class ActionWebhook(Action):
     HOOK_GET = 'get'
     HOOK_POST = 'post'
@@ -32,8 +103,19 @@ class ActionWebhook(Action):
         (HOOK_POST, 'Post'),
         (HOOK_PUT, 'Put'),
     )
-    hook_type = models.CharField(max_length=256, choices=HOOK_CHOICES)
-    BASE_SCHEMA = {
+    hook_type = models.CharField(max_length=256, choices=HOOK_CHOICES,
+                                 db_index=True)
+    paused = models.BooleanField(
+        default=False, db_index=True,
+        help_text='Paused hooks are skipped when their Zip fires.')
+    depends_on = models.ManyToManyField(
+        'self', symmetrical=False, blank=True, related_name='dependents',
+        help_text=('Actions of the same Zip to run first, their output is '
+                   'this one\'s input.'))
+
+    objects = ActionWebhookQuerySet.as_manager()
+    TIMEOUT = 30
+    BASE_SCHEMA = schemas.freeze({
         "title": "Webhook",
         "description": "Set up Webhooks by Zipier",
         "type": "object",
@@ -80,7 +162,9 @@ class ActionWebhook(Action):
                 "description": ("""If you leave this empty, it will """
                                 """default to including the raw data from """
                                 """the previous step. Key, value pairs """
-                                """sent as data."""),
+                                """sent as data, values can use the """
+                                """previous step's fields like """
+                                """{{trigger.user.email}}."""),
                 "items": {
                     "$ref": "#/definitions/data"
                 }
@@ -93,20 +177,106 @@ class ActionWebhook(Action):
                 "items": {
                     "$ref": "#/definitions/data"
                 }
+            },
+            "batch": {
+                "type": "object",
+                "title": "Batch",
+                "description": ("""Send fires together, as one Json array """
+                                """or Xml list of their data. Not for """
+                                """Form payloads."""),
+                "properties": {
+                    "size": {
+                        "type": "integer",
+                        "title": "Max Fires per Request",
+                        "minimum": 1
+                    },
+                    "wait": {
+                        "type": "integer",
+                        "title": "Max Wait (milliseconds)",
+                        "minimum": 0
+                    }
+                }
+            },
+            "retry": {
+                "type": "object",
+                "title": "Retry",
+                "description": ("""Retry failed requests, waiting """
+                                """exponentially longer between attempts."""),
+                "properties": {
+                    "attempts": {
+                        "type": "integer",
+                        "title": "Attempts",
+                        "minimum": 1
+                    },
+                    "backoff": {
+                        "type": "number",
+                        "title": "Backoff (seconds)"
+                    },
+                    "maxBackoff": {
+                        "type": "number",
+                        "title": "Max Backoff (seconds)"
+                    },
+                    "statuses": {
+                        "type": "array",
+                        "title": "Retry On",
+                        "description": ("""Statuses like "503" or classes """
+                                        """like "5xx"."""),
+                        "items": {
+                            "type": "string"
+                        }
+                    }
+                }
+            },
+            "dedupeWindow": {
+                "type": "number",
+                "title": "Duplicate Window (seconds)",
+                "description": ("""Identical fires within this many """
+                                """seconds are sent once and share its """
+                                """result. 0 sends every fire."""),
+                "minimum": 0
+            },
+            "cache": {
+                "type": "boolean",
+                "title": "Cache Responses",
+                "description": ("""Reuse responses for as long as their """
+                                """Cache-Control or Expires headers allow, """
+                                """then revalidate them.""")
+            },
+            "streaming": {
+                "type": "boolean",
+                "title": "Stream Data",
+                "description": ("""Send the data in chunks as it is """
+                                """encoded. Left unset, only large data is """
+                                """streamed.""")
             }
         }
-    }
+    })
 
     def __str__(self):
         return self.title
 
-    def get_schema(self, schema_type):
-        schema = self.BASE_SCHEMA
-        if schema_type == self.HOOK_GET:
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        plans.cache.invalidate(self.pk)
+        mappings.cache.invalidate(self.pk)
+
+    def delete(self, *args, **kwargs):
+        plans.cache.invalidate(self.pk)
+        mappings.cache.invalidate(self.pk)
+        return super().delete(*args, **kwargs)
+
+    @classmethod
+    def build_schema(cls, schema_type, base=None):
+        schema = schemas.thaw(cls.BASE_SCHEMA if base is None else base)
+        if schema_type == cls.HOOK_GET:
             schema['title'] = "Webhook GET"
             schema['description'] = "Set up Webhooks by Zipier GET"
             if 'payloadType' in schema['properties'].keys():
                 del schema['properties']['payloadType']
+            if 'streaming' in schema['properties'].keys():
+                del schema['properties']['streaming']
+            if 'batch' in schema['properties'].keys():
+                del schema['properties']['batch']
             if 'data' in schema['properties'].keys():
                 schema['properties']['data']['title'] = "Query String Params"
                 schema['properties']['data']['description'] = (
@@ -116,17 +286,26 @@ class ActionWebhook(Action):
                     """and include every field from the previous step in """
                     """the query string. If you don't want this, use the """
                     """\"Custom Request\" action.""")
-        elif schema_type == self.HOOK_POST:
-            schema = self.BASE_SCHEMA
+        elif schema_type == cls.HOOK_POST:
             schema['title'] = "Webhook POST"
             schema['description'] = "Set up Webhooks by Zipier POST"
-        elif schema_type == self.HOOK_PUT:
-            schema = self.BASE_SCHEMA
+            if 'cache' in schema['properties'].keys():
+                del schema['properties']['cache']
+        elif schema_type == cls.HOOK_PUT:
             schema['title'] = "Webhook PUT"
             schema['description'] = "Set up Webhooks by Zipier PUT"
-        return schema
+            if 'cache' in schema['properties'].keys():
+                del schema['properties']['cache']
+        return schemas.freeze(schema)
+
+    def get_schema(self, schema_type):
+        return SCHEMAS.get(schema_type, SCHEMAS[None])
 
-    def make_it_so(self):
+    @classmethod
+    def get_schema_document(cls, schema_type):
+        return SCHEMA_DOCUMENTS.get(schema_type)
+
+    def make_it_so(self, input=None):
         to_run = {
             self.HOOK_POST: self.run_post,
             self.HOOK_GET: self.run_get,
@@ -136,11 +315,201 @@ class ActionWebhook(Action):
         runner = to_run.get(self.hook_type)
 
         if runner:
-            return runner()
+            started = metrics.start()
+            logged = runlog.start()
+            plan = None
+            try:
+                # Rendered once, the idempotency key and every attempt use
+                # this very plan.
+                plan = self.get_request(input)
+                runner = functools.partial(runner, plan)
+                result = idempotency.call(
+                    self, plan, lambda: self.fire(runner, input))
+            except Exception as e:
+                metrics.fired(self, started, e)
+                runlog.record(self, logged, error=e, plan=plan)
+                raise
+            metrics.fired(self, started)
+            runlog.record(self, logged, result, plan=plan)
+            return result
         else:
             return 'Nope'
 
-    def run_post(self):
+    def enqueue(self):
+        return DispatchJob.objects.create(action=self)
+
+    async def make_it_so_async(self, session=None, input=None):
+        if self.hook_type not in dict(self.HOOK_CHOICES):
+            return 'Nope'
+
+        started = metrics.start()
+        logged = runlog.start()
+        plan = None
+        try:
+            plan = self.get_request(input)
+            result = await idempotency.acall(
+                self, plan, lambda: self.fire_async(session, input, plan))
+        except Exception as e:
+            metrics.fired(self, started, e)
+            runlog.record(self, logged, error=e, plan=plan)
+            raise
+        metrics.fired(self, started)
+        runlog.record(self, logged, result, plan=plan)
+        return result
+
+    def fire(self, runner, input=None):
+        # Retries go inside the duplicate suppression of make_it_so, so
+        # they are never suppressed themselves.
+        batch_options = self.get_batch_options()
+        if batch_options:
+            return batching.submit(self, *batch_options, input=input).result()
+        return retry.call(self, runner)
+
+    async def fire_async(self, session=None, input=None, plan=None):
+        batch_options = self.get_batch_options()
+        if batch_options:
+            return await asyncio.wrap_future(batching.submit(
+                self, *batch_options, blocking=False, input=input))
+        return await retry.acall(
+            self, lambda: aio.fire(self, session=session, plan=plan))
+
+    @classmethod
+    def dependencies_of(cls, pks):
+        """Pks of every action `pks` depend on, directly or not."""
+        through = cls.depends_on.through
+        found = set()
+        frontier = set(pks)
+        while frontier:
+            frontier = set(through.objects.filter(
+                from_actionwebhook__in=frontier).values_list(
+                    'to_actionwebhook', flat=True)) - found
+            found |= frontier
+        return found
+
+    def check_dependencies(self, pks, reverse=False):
+        """
+        Raise `ValidationError` if this action depending on `pks` (or, with
+        `reverse`, `pks` depending on it) would make a cycle.
+        """
+        pks = set(pks)
+        if self.pk is None:
+            # Nothing depends on it yet.
+            return
+        if reverse:
+            cycle = pks & (self.dependencies_of([self.pk]) | {self.pk})
+        else:
+            cycle = self.pk in pks or self.pk in self.dependencies_of(pks)
+        if cycle:
+            raise ValidationError(
+                'Actions cannot depend on each other in a cycle.',
+                code='cycle')
+
+    def get_batch_options(self):
+        # (size, wait in seconds) when this hook's fires are batched.
+        options = (self.data or {}).get('batch')
+        if (not options or self.hook_type == self.HOOK_GET or
+                self.data.get('payloadType', 'form') == 'form' or
+                self.pk is None or self._state.adding):
+            return None
+        if options is True:
+            options = {}
+        return (int(options.get('size', settings.ACTION_BATCH_SIZE)),
+                float(options.get('wait', settings.ACTION_BATCH_WAIT)) / 1000)
+
+    def get_batch_item(self, input=None):
+        return self.build_data(input) or {}
+
+    def run_post(self, plan=None):
+        ratelimit.throttle(self)
+        started = metrics.start()
+        _, url, headers, payload = plan or self.get_request()
+        started = metrics.observe('plan', self, started)
+
+        response = http.post(url, data=payload, headers=headers,
+                             timeout=self.TIMEOUT, stream=True)
+        started = metrics.observe('request', self, started)
+
+        result = utils.handle_response(response)
+        metrics.observe('response', self, started)
+        return result
+
+    def run_get(self, plan=None):
+        if httpcache.enabled(self):
+            return self.run_cached_get(plan)
+
+        ratelimit.throttle(self)
+        started = metrics.start()
+        _, url, headers, _ = plan or self.get_request()
+        started = metrics.observe('plan', self, started)
+
+        response = http.get(url, headers=headers, timeout=self.TIMEOUT,
+                            stream=True)
+        started = metrics.observe('request', self, started)
+
+        result = utils.handle_response(response)
+        metrics.observe('response', self, started)
+        return result
+
+    def run_cached_get(self, plan=None):
+        # Fresh cache hits don't wait for the rate limit, nothing is sent.
+        started = metrics.start()
+        _, url, headers, _ = plan or self.get_request()
+        metrics.observe('plan', self, started)
+
+        def send(headers):
+            ratelimit.throttle(self)
+            started = metrics.start()
+            response = http.get(url, headers=headers, timeout=self.TIMEOUT,
+                                stream=True)
+            started = metrics.observe('request', self, started)
+            body = responses.read(response)
+            metrics.observe('response', self, started)
+            return response, body
+
+        return httpcache.get_cache().fetch(url, headers, send)
+
+    def run_put(self, plan=None):
+        ratelimit.throttle(self)
+        started = metrics.start()
+        _, url, headers, payload = plan or self.get_request()
+        started = metrics.observe('plan', self, started)
+
+        response = http.put(url, data=payload, headers=headers,
+                            timeout=self.TIMEOUT, stream=True)
+        started = metrics.observe('request', self, started)
+
+        result = utils.handle_response(response)
+        metrics.observe('response', self, started)
+        return result
+
+    def run_batch(self, items):
+        ratelimit.throttle(self)
+        method, url, headers, _ = self.get_request()
+
+        if self.data.get('payloadType') == 'xml':
+            payload = xmlstream.to_xml(items)
+        else:
+            payload = jsoncodec.dumps(items).encode('utf-8')
+        headers = idempotency.stamp_batch(self, headers, payload)
+
+        response = http.request(method, url, data=payload, headers=headers,
+                                timeout=self.TIMEOUT, stream=True)
+
+        return utils.handle_response(response)
+
+    def get_request(self, input=None):
+        return plans.get_plan(self, input)
+
+    def compile_request(self):
+        # Everything but the I/O, so the blocking and the asyncio runners
+        # send exactly the same thing.
+        if self.hook_type == self.HOOK_GET:
+            headers = self.get_headers()
+            payload = self.get_data() or ''
+            url = '{0}{1}'.format(self.data.get('url'), payload)
+            return idempotency.stamp(
+                self, plans.RequestPlan(self.hook_type, url, headers, None))
+
         payload_type = self.data.get('payloadType', 'form')
         headers = {}
         if payload_type == 'json':
@@ -153,43 +522,63 @@ class ActionWebhook(Action):
         # Yes I'm letting the user overwrite the content-type
         # If they want to mess things up ¯\_(ツ)_/¯
 
+        started = metrics.start()
         headers = self.get_headers(headers)
-        payload = self.get_data()
+        started = metrics.observe('headers', self, started)
+        if self.is_streaming():
+            payload = self.get_stream()
+        else:
+            payload = plans.encode_body(self.get_data())
+        metrics.observe('data', self, started)
 
-        response = requests.post(self.data.get('url'), data=payload,
-                                 headers=headers, timeout=30)
+        return idempotency.stamp(self, plans.RequestPlan(
+            self.hook_type, self.data.get('url'), headers, payload))
 
-        return utils.handle_response(response)
+    def render_request(self, plan, input):
+        # `plan` with its data mapped from `input`. Only the body (or the
+        # query string) changes, the rest is the revision's plan.
+        if not mappings.get_mapping(self).uses_input:
+            return plan
+        if self.hook_type == self.HOOK_GET:
+            url = '{0}{1}'.format(self.data.get('url'),
+                                  self.get_data(input) or '')
+            return idempotency.stamp(self, plan._replace(url=url))
+        if self.is_streaming():
+            payload = self.get_stream(input)
+        else:
+            payload = plans.encode_body(self.get_data(input))
+        return idempotency.stamp(self, plan._replace(body=payload))
 
-    def run_get(self):
-        headers = self.get_headers()
-        payload = self.get_data() or ''
+    def is_streaming(self):
+        streaming_mode = self.data.get('streaming')
+        if streaming_mode is not None:
+            return bool(streaming_mode)
 
-        response = requests.get('{0}{1}'.format(self.data.get('url'), payload),
-                                headers=headers, timeout=30)
+        items = self.data.get('data')
+        return (isinstance(items, list) and
+                len(items) >= settings.ACTION_STREAM_THRESHOLD)
 
-        return utils.handle_response(response)
+    def get_stream(self, input=None):
+        data = self.build_data(input)
+
+        if not data or len(data) <= 0:
+            return None
 
-    def run_put(self):
         payload_type = self.data.get('payloadType', 'form')
-        headers = {}
         if payload_type == 'json':
-            headers['Content-Type'] = 'application/json'
+            return streaming.StreamingBody(streaming.iter_json, data)
         elif payload_type == 'xml':
-            headers['Content-Type'] = 'application/xml'
-        else:
-            headers['Content-Type'] = 'multipart/form-data'
+            return streaming.StreamingBody(xmlstream.iter_xml, data)
+        return streaming.StreamingBody(streaming.iter_form, data)
 
-        headers = self.get_headers(headers)
-        payload = self.get_data()
+    def build_data(self, input=None):
+        # Without input, references render as missing values rather than
+        # sending their template text.
+        return mappings.get_mapping(self).render(
+            mappings.as_input({} if input is None else input))
 
-        response = requests.put(self.data.get('url'), data=payload,
-                                headers=headers, timeout=30)
-
-        return utils.handle_response(response)
-
-    def get_data(self):
-        data = utils.build_dict(self.data.get('data'))
+    def get_data(self, input=None):
+        data = self.build_data(input)
 
         if not data or len(data) <= 0:
             # I can follow any coding style needed. Even having returns
@@ -197,28 +586,125 @@ class ActionWebhook(Action):
             return None
 
         if self.hook_type == self.HOOK_GET:
-            get_data = '?'
-            for key, value in data.items():
-                get_data += '{0}={1}&'.format(key, value)
+            # Encoded, a value mapped from a previous step can hold any of
+            # & = # and must not add parameters of its own.
+            get_data = '?' + urlencode(
+                [(key, '' if value is None else value)
+                 for key, value in data.items()])
             # Oh hi return, almost didnt see you there.
-            return get_data[:-1]
+            return get_data
 
         payload_type = self.data.get('payloadType', 'form')
         if payload_type == 'json':
             # ┬─┬﻿ ノ( ゜-゜ノ)
-            return json.dumps(data)
+            return jsoncodec.dumps(data)
         elif payload_type == 'xml':
             # (╯°□°)╯︵ ┻━┻
-            return dicttoxml(data)
+            return xmlstream.to_xml(data)
 
         # (ノ^_^)ノ┻━┻ ┬─┬ ノ( ^_^ノ)
         return data
 
-    def get_headers(self, headers={}):
-        results = list(utils.search_dict('headers', self.data))
-        # import ipdb; ipdb.set_trace()
-        if results and len(results) > 0:
-            _, list_headers = results[0]
-            if len(list_headers) > 0:
+    def get_headers(self, headers=None):
+        headers = {} if headers is None else headers
+        result = utils.find_first('headers', self.data)
+        if result:
+            _, list_headers = result
+            if list_headers and len(list_headers) > 0:
                 headers.update(utils.build_dict(list_headers))
         return headers
+
+
+@receiver(m2m_changed, sender=ActionWebhook.depends_on.through)
+def check_dependency_cycles(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    # However they are added, dependencies never loop.
+    if action == 'pre_add' and pk_set:
+        instance.check_dependencies(pk_set, reverse=reverse)
+
+
+@receiver(post_save, sender=Zip)
+@receiver(post_delete, sender=Zip)
+def reset_zip_rate_limits(sender, **kwargs):
+    # Other processes see the change once their copy expires.
+    ratelimit.limiter.clear_zip_limits()
+
+
+# Built once at import, shared by every admin form render and schema request.
+SCHEMAS = {
+    schema_type: ActionWebhook.build_schema(schema_type)
+    for schema_type in (None,) + tuple(dict(ActionWebhook.HOOK_CHOICES))
+}
+SCHEMA_DOCUMENTS = {
+    schema_type: schemas.to_document(schema)
+    for schema_type, schema in SCHEMAS.items() if schema_type
+}
+
+
+class DispatchJob(TimeStampedModel):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+    action = models.ForeignKey(ActionWebhook, on_delete=models.CASCADE,
+                               related_name='jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES,
+                              default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=200, blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    duration = models.FloatField(blank=True, null=True)
+    result = JSONField(blank=True, null=True, default=None)
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        # Workers claim the oldest pending jobs first.
+        index_together = (('status', 'id'),)
+
+    def __str__(self):
+        return '{0} ({1})'.format(self.action_id, self.status)
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket shared by every worker, see `action.ratelimit`."""
+    key = models.CharField(max_length=512, primary_key=True)
+    tokens = models.FloatField()
+    # Unix time of the last refill.
+    updated = models.FloatField()
+
+    def __str__(self):
+        return self.key
+
+
+class ActionRun(models.Model):
+    """
+    One fire, written in batches by action.runlog. Rows outlive their
+    action, so there are no foreign key constraints, and on PostgreSQL the
+    table is partitioned by day of `started`.
+    """
+    id = models.BigAutoField(primary_key=True)
+    action = models.ForeignKey(ActionWebhook, on_delete=models.DO_NOTHING,
+                               db_constraint=False, db_index=False,
+                               related_name='runs')
+    zip = models.ForeignKey(Zip, on_delete=models.DO_NOTHING,
+                            db_constraint=False, db_index=False,
+                            related_name='+')
+    started = models.DateTimeField(db_index=True)
+    duration = models.FloatField()
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    request_bytes = models.BigIntegerField(blank=True, null=True)
+    response_bytes = models.BigIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        index_together = (('action', 'started'),)
+
+    def __str__(self):
+        return '{0} at {1}'.format(self.action_id, self.started)
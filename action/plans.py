@@ -0,0 +1,88 @@
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from requests.models import RequestEncodingMixin
+
+logger = logging.getLogger(__name__)
+
+# Everything needed to send a hook's request: no more walking `data`,
+# building header dicts or serialising payloads on every fire. Treat the
+# headers as read-only, they are shared by every fire of the revision.
+RequestPlan = namedtuple('RequestPlan', ['method', 'url', 'headers', 'body'])
+
+
+def encode_body(payload):
+    if payload is None or isinstance(payload, bytes):
+        return payload
+    if isinstance(payload, str):
+        return payload.encode('utf-8')
+    # Form payloads: exactly what requests would have sent for the dict.
+    return RequestEncodingMixin._encode_params(payload).encode('utf-8')
+
+
+class PlanCache(object):
+    """
+    Bounded LRU of compiled request plans keyed by `(pk, modified)`.
+
+    Saving a hook bumps `modified`, so a fresh row loaded anywhere never
+    matches a plan compiled from an older revision.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or settings.ACTION_PLAN_CACHE_SIZE
+        # pk -> (modified, plan)
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pk, modified):
+        with self._lock:
+            entry = self._plans.get(pk)
+            if entry is None or entry[0] != modified:
+                self.misses += 1
+                return None
+            self._plans.move_to_end(pk)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, pk, modified, plan):
+        with self._lock:
+            self._plans[pk] = (modified, plan)
+            self._plans.move_to_end(pk)
+            while len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+
+    def invalidate(self, pk):
+        with self._lock:
+            self._plans.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def __len__(self):
+        return len(self._plans)
+
+    def stats(self):
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses}
+
+
+cache = PlanCache()
+
+
+def get_plan(hook, input=None):
+    # Unsaved hooks have no revision to key on.
+    if hook.pk is None or hook._state.adding:
+        plan = hook.compile_request()
+    else:
+        plan = cache.get(hook.pk, hook.modified)
+        if plan is None:
+            plan = hook.compile_request()
+            cache.set(hook.pk, hook.modified, plan)
+    if input is not None:
+        # The data mapped from a previous step changes with every fire.
+        return hook.render_request(plan, input)
+    return plan
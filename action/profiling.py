@@ -0,0 +1,219 @@
+"""
+Where the CPU time and memory of a fire go: cProfile stats, tracemalloc top
+allocations and a sampled collapsed-stack file (flamegraph.pl, speedscope)
+for any callable fired a number of times.
+
+Each report comes from its own run, so one profiler doesn't skew the
+others. Hooks are fired at a local echo server unless asked to go live.
+Used by `./manage.py profile_action` and `profile_zip`.
+"""
+import abc
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+import action.plans as plans
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return '{0} ({1}:{2})'.format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class StackSampler(object):
+    """
+    Samples the stacks of the threads started after it, plus the one that
+    started it, every `interval` seconds.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._ignored = set()
+
+    def start(self):
+        current = threading.get_ident()
+        # Threads already around (servers, pools) are not what we profile.
+        self._ignored = set(
+            thread.ident for thread in threading.enumerate()
+            if thread.ident != current)
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        self._ignored.add(self._thread.ident)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident in self._ignored:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, output):
+        for stack, count in self.stacks.most_common():
+            output.write('{0} {1}\n'.format(stack, count))
+
+
+def repeat(fire, runs):
+    errors = 0
+    for _ in range(runs):
+        try:
+            fire()
+        except Exception:
+            errors += 1
+    return errors
+
+
+def profile(fire, runs, prefix, top=30, interval=0.001):
+    """
+    Run `fire` `runs` times under each profiler, writing `<prefix>.prof`,
+    `<prefix>-cpu.txt`, `<prefix>-memory.txt` and `<prefix>-stacks.txt`.
+    Returns a summary dict.
+    """
+    start = time.perf_counter()
+    errors = repeat(fire, runs)
+    wall_time = time.perf_counter() - start
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    repeat(fire, runs)
+    profiler.disable()
+    profiler.dump_stats(prefix + '.prof')
+    cpu_report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=cpu_report)
+    stats.sort_stats('cumulative').print_stats(top)
+    with open(prefix + '-cpu.txt', 'w') as output:
+        output.write(cpu_report.getvalue())
+
+    tracemalloc.start(25)
+    repeat(fire, runs)
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocations = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    )).statistics('lineno')[:top]
+    with open(prefix + '-memory.txt', 'w') as output:
+        output.write('Peak traced memory: {0} KB\n'.format(peak // 1024))
+        for statistic in allocations:
+            output.write('{0}\n'.format(statistic))
+
+    sampler = StackSampler(interval).start()
+    try:
+        repeat(fire, runs)
+    finally:
+        sampler.stop()
+    with open(prefix + '-stacks.txt', 'w') as output:
+        sampler.write(output)
+
+    return {
+        'runs': runs,
+        'errors': errors,
+        'wall_time': wall_time,
+        'per_fire': wall_time / runs if runs else None,
+        'peak_kb': peak // 1024,
+        'samples': sum(sampler.stacks.values()),
+        'allocations': allocations,
+        'stats': stats,
+        'files': [prefix + suffix for suffix in (
+            '.prof', '-cpu.txt', '-memory.txt', '-stacks.txt')],
+    }
+
+
+class ProfileCommand(BaseCommand, metaclass=abc.ABCMeta):
+    """Base of the profile_* commands, which only say what to fire."""
+    name = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('pk', type=int)
+        parser.add_argument(
+            '--runs', type=int, default=100,
+            help='Fires per profiler.')
+        parser.add_argument(
+            '--live', action='store_true', default=False,
+            help='Fire at the real URL instead of a local echo server.')
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help='Seconds the echo server takes to answer.')
+        parser.add_argument(
+            '--output-dir', default='.',
+            help='Where the reports are written.')
+        parser.add_argument(
+            '--top', type=int, default=30,
+            help='Functions and allocations listed in the reports.')
+        parser.add_argument(
+            '--interval', type=float, default=0.001,
+            help='Seconds between stack samples.')
+
+    @abc.abstractmethod
+    def get_fire(self, pk):
+        """Return `(fire, hooks)`: what to call and the hooks it fires."""
+
+    def handle(self, *args, **options):
+        fire, hooks = self.get_fire(options['pk'])
+        prefix = os.path.join(options['output_dir'], '{0}-{1}'.format(
+            self.name, options['pk']))
+
+        if options['live']:
+            summary = self.profile(fire, prefix, options)
+        else:
+            # Only needed, and only importable, where benchmarks/ is around.
+            from benchmarks.server import StandInServer
+
+            with StandInServer(latency=options['latency'],
+                               echo=True) as server:
+                urls = [(hook, hook.data) for hook in hooks]
+                try:
+                    for hook in hooks:
+                        hook.data = dict(hook.data, url=server.url)
+                        plans.cache.invalidate(hook.pk)
+                    summary = self.profile(fire, prefix, options)
+                finally:
+                    # Don't leave plans pointing at the echo server around.
+                    for hook, data in urls:
+                        hook.data = data
+                        plans.cache.invalidate(hook.pk)
+
+        self.report(summary, options)
+
+    def profile(self, fire, prefix, options):
+        return profile(fire, options['runs'], prefix, top=options['top'],
+                       interval=options['interval'])
+
+    def report(self, summary, options):
+        self.stdout.write(
+            '{runs} fires, {errors} failed, {per_fire:.6f}s per fire, peak '
+            '{peak_kb} KB traced, {samples} stack samples'.format(**summary))
+
+        self.stdout.write('\nTop functions by cumulative time:')
+        stream = io.StringIO()
+        summary['stats'].stream = stream
+        summary['stats'].print_stats(10)
+        self.stdout.write(stream.getvalue().strip())
+
+        self.stdout.write('\nTop allocations:')
+        for statistic in summary['allocations'][:5]:
+            self.stdout.write(str(statistic))
+
+        self.stdout.write('\nWritten:')
+        for path in summary['files']:
+            self.stdout.write(path)
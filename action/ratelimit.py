@@ -0,0 +1,252 @@
+"""
+Token buckets capping how fast hooks hit a destination host.
+
+Limits come from `ACTION_RATE_LIMITS` (per host) and `Zip.rate_limit` (per
+host, for that Zip's hooks). The Zips' limits are read all at once and kept
+for `ACTION_RATE_LIMIT_ZIP_TTL` seconds, so fires never load their hook's
+Zip. Buckets live in the backend named by `ACTION_RATE_LIMIT_BACKEND`:
+"local" keeps them in this process, "database" keeps them in a table so
+every worker on every node draws from the same buckets.
+
+Taking a token never blocks in the backend: an empty bucket hands out the
+next token ahead of time and says how long to wait for it, so one round
+trip is all a fire costs.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+
+import action.executor as executor
+import action.http as http
+import action.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+Limit = namedtuple('Limit', ['rate', 'burst'])
+
+
+def parse_limit(value):
+    # 10 is 10 requests a second, bursting to 10. Or {"rate": .., "burst": ..}
+    if not value:
+        return None
+    if isinstance(value, dict):
+        rate = float(value['rate'])
+        return Limit(rate, float(value.get('burst') or max(rate, 1)))
+    return Limit(float(value), max(float(value), 1))
+
+
+def take(tokens, updated, now, limit):
+    """
+    Refill a bucket left with `tokens` at `updated` and take one token.
+    Returns the tokens left, negative when taken ahead of time, and the
+    seconds to wait before using it.
+    """
+    elapsed = max(now - updated, 0)
+    tokens = min(limit.burst, tokens + elapsed * limit.rate) - 1
+    return tokens, max(-tokens / limit.rate, 0)
+
+
+class LocalBackend(object):
+
+    def __init__(self, max_buckets=None):
+        self.max_buckets = max_buckets or settings.ACTION_HTTP_MAX_HOSTS
+        # key -> (tokens, updated), least recently used first.
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reserve(self, key, limit):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.burst, now))
+            tokens, wait = take(tokens, updated, now, limit)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # A forgotten bucket is a full one, hardly a problem.
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseBackend(object):
+    # Buckets are rows, locked while a token is taken. Wall clock time,
+    # since it is compared across nodes.
+
+    def reserve(self, key, limit):
+        bucket_model = apps.get_model('action', 'RateLimitBucket')
+        now = time.time()
+        with transaction.atomic():
+            bucket = (bucket_model.objects.select_for_update()
+                      .filter(key=key).first())
+            if bucket is None:
+                try:
+                    with transaction.atomic():
+                        bucket_model.objects.create(
+                            key=key, tokens=limit.burst - 1, updated=now)
+                    return 0
+                except IntegrityError:
+                    # Somebody else created it meanwhile.
+                    bucket = bucket_model.objects.select_for_update().get(
+                        key=key)
+
+            tokens, wait = take(bucket.tokens, bucket.updated, now, limit)
+            bucket_model.objects.filter(key=key).update(
+                tokens=tokens, updated=max(now, bucket.updated))
+        return wait
+
+    def clear(self):
+        apps.get_model('action', 'RateLimitBucket').objects.all().delete()
+
+
+BACKENDS = {
+    'local': LocalBackend,
+    'database': DatabaseBackend,
+}
+
+
+def zip_loaded(hook):
+    # Hooks loaded along with their Zip (select_related, zip.actionwebhook_set)
+    # have the freshest limit at hand.
+    return type(hook).zip.is_cached(hook)
+
+
+class RateLimiter(object):
+
+    def __init__(self):
+        self._backends = {}
+        self._lock = threading.Lock()
+        # Zip pk -> Limit, of the Zips that have one, and when to re-read.
+        self._zip_limits = None
+        self._zip_limits_expire = 0
+        self.reservations = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def backend(self):
+        name = settings.ACTION_RATE_LIMIT_BACKEND
+        backend = self._backends.get(name)
+        if backend is None:
+            try:
+                backend_class = BACKENDS[name]
+            except KeyError:
+                raise ImproperlyConfigured(
+                    'Unknown rate limit backend "{0}", pick one of: '
+                    '{1}'.format(name, ', '.join(sorted(BACKENDS))))
+            backend = self._backends.setdefault(name, backend_class())
+        return backend
+
+    def get_limits(self, hook):
+        """The `(bucket key, Limit)` pairs that apply to `hook`."""
+        host = http.get_host((hook.data or {}).get('url'))
+        limits = []
+
+        host_limit = parse_limit(settings.ACTION_RATE_LIMITS.get(
+            host, settings.ACTION_RATE_LIMIT_DEFAULT))
+        if host_limit:
+            limits.append((host, host_limit))
+
+        if hook.zip_id is not None:
+            if zip_loaded(hook):
+                zip_limit = parse_limit(hook.zip.rate_limit)
+            else:
+                zip_limit = self.get_zip_limits().get(hook.zip_id)
+            if zip_limit:
+                limits.append(('{0} zip:{1}'.format(host, hook.zip_id),
+                               zip_limit))
+        return limits
+
+    def zip_limits_stale(self, hook):
+        """Whether `get_limits(hook)` would read the Zips' limits first."""
+        return (hook.zip_id is not None and not zip_loaded(hook) and
+                (self._zip_limits is None or
+                 time.monotonic() >= self._zip_limits_expire))
+
+    def load_zip_limits(self):
+        zip_model = apps.get_model('zip', 'Zip')
+        limits = {}
+        for pk, rate_limit in zip_model.objects.exclude(
+                rate_limit=None).values_list('pk', 'rate_limit'):
+            limit = parse_limit(rate_limit)
+            if limit:
+                limits[pk] = limit
+        with self._lock:
+            self._zip_limits = limits
+            self._zip_limits_expire = (time.monotonic() +
+                                       settings.ACTION_RATE_LIMIT_ZIP_TTL)
+        return limits
+
+    def get_zip_limits(self):
+        limits = self._zip_limits
+        if limits is None or time.monotonic() >= self._zip_limits_expire:
+            limits = self.load_zip_limits()
+        return limits
+
+    def clear_zip_limits(self):
+        with self._lock:
+            self._zip_limits = None
+
+    def reserve(self, limits):
+        """Take a token from every bucket, returns the seconds to wait."""
+        backend = self.backend
+        wait = max(backend.reserve(key, limit) for key, limit in limits)
+        with self._lock:
+            self.reservations += 1
+            if wait > 0:
+                self.delayed += 1
+                self.wait_seconds += wait
+        if wait > 0:
+            logger.debug('Rate limited for %.3fs by %s', wait,
+                         ', '.join(key for key, _ in limits))
+        return wait
+
+    def reserve_for(self, hook):
+        limits = self.get_limits(hook)
+        if not limits:
+            return 0
+        return self.reserve(limits)
+
+    def stats(self):
+        return {'reservations': self.reservations, 'delayed': self.delayed,
+                'wait_seconds': self.wait_seconds}
+
+
+limiter = RateLimiter()
+
+
+def throttle(hook):
+    """Wait for `hook`'s turn to fire, returns the seconds waited."""
+    wait = limiter.reserve_for(hook)
+    metrics.observe_seconds('throttle', hook, wait)
+    if wait > 0:
+        time.sleep(wait)
+    return wait
+
+
+async def athrottle(hook):
+    """Same as `throttle`, without blocking the event loop."""
+    # Database work (the Zips' limits, the buckets) is kept off the loop,
+    # on executor threads that close their connection.
+    loop = asyncio.get_event_loop()
+    if limiter.zip_limits_stale(hook):
+        await loop.run_in_executor(
+            None, executor.run_threaded, limiter.load_zip_limits)
+    limits = limiter.get_limits(hook)
+    if not limits:
+        return 0
+    wait = await loop.run_in_executor(
+        None, executor.run_threaded, limiter.reserve, limits)
+    metrics.observe_seconds('throttle', hook, wait)
+    if wait > 0:
+        await asyncio.sleep(wait)
+    return wait
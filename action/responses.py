@@ -0,0 +1,283 @@
+"""
+Response bodies read within bounds, so one misbehaving endpoint can't eat a
+worker's memory.
+
+Bodies up to `ACTION_RESPONSE_SPILL_SIZE` bytes stay in memory, larger ones
+go to a memory-mapped temporary file, and anything past
+`ACTION_RESPONSE_MAX_SIZE` is not read at all. Nothing is decoded until
+somebody asks for it, and a spilled body is decoded from its mapping:
+`content` is the only thing that copies it into memory.
+"""
+import copy
+import logging
+import mmap
+import tempfile
+import threading
+
+from django.conf import settings
+
+import action.jsoncodec as jsoncodec
+
+logger = logging.getLogger(__name__)
+
+_NOT_DECODED = object()
+
+
+def is_success(status_code):
+    return 200 <= status_code <= 299
+
+
+class ResponseError(Exception):
+    """
+    Non-2xx response. Carries the status and at most
+    `ACTION_RESPONSE_ERROR_SIZE` bytes of the body.
+    """
+
+    def __init__(self, status_code, content, truncated=False):
+        super().__init__(content)
+        self.status_code = status_code
+        self.content = content
+        self.truncated = truncated
+
+
+class ResponseTooLarge(ResponseError):
+    """2xx response whose body is over `ACTION_RESPONSE_MAX_SIZE`."""
+
+
+class Spill(object):
+    """
+    A spilled body's file and its mapping, closed along with the last body
+    sharing them.
+    """
+
+    def __init__(self, mapped, file):
+        self.mapped = mapped
+        self.file = file
+        self._users = 1
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users:
+                return
+        self.mapped.close()
+        if self.file is not None:
+            self.file.close()
+
+
+class Body(object):
+    """
+    A response body, decoded only when asked. Close it, or use it as a
+    context manager, to let go of a spilled body's file early. Callers
+    handed the same result get a `share()` each, to close as they please.
+    """
+
+    def __init__(self, content=b'', mapped=None, file=None, truncated=False,
+                 status_code=None):
+        self._content = content
+        self._spill = None if mapped is None else Spill(mapped, file)
+        self._mapped = mapped
+        self._decoded = _NOT_DECODED
+        self.truncated = truncated
+        self.status_code = status_code
+
+    def __len__(self):
+        if self._mapped is not None:
+            return len(self._mapped)
+        return len(self._content)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def spilled(self):
+        return self._spill is not None
+
+    @property
+    def content(self):
+        """The body as bytes, a copy of a spilled body's file."""
+        if self._mapped is not None:
+            return self._mapped[:]
+        return self._content
+
+    def view(self):
+        """
+        The body as a memoryview, a spilled one is not copied. Release it
+        (`with body.view() as view:`) before the body is closed.
+        """
+        if self._mapped is not None:
+            return memoryview(self._mapped)
+        return memoryview(self.content)
+
+    def chunks(self, size=None):
+        """The body, `size` bytes at a time."""
+        size = size or settings.ACTION_STREAM_CHUNK_SIZE
+        # Sliced off the mapping as they go, only a chunk is ever copied.
+        source = self._mapped if self._mapped is not None else self.content
+        for start in range(0, len(source), size):
+            yield source[start:start + size]
+
+    def json(self):
+        if self._decoded is _NOT_DECODED:
+            try:
+                if self._mapped is not None:
+                    with self.view() as view:
+                        self._decoded = jsoncodec.loads(view)
+                else:
+                    self._decoded = jsoncodec.loads(self.content)
+            except ValueError as e:
+                self._decoded = e
+        if isinstance(self._decoded, ValueError):
+            raise self._decoded
+        return self._decoded
+
+    def value(self):
+        # What a fire used to hand back: the decoded json, else the bytes.
+        try:
+            return self.json()
+        except ValueError as e:  # error decoding json
+            logger.error(e, extra={'body': self})
+            return self.content
+
+    def share(self):
+        """
+        This body for another caller: same content, closed on its own. A
+        spilled body's file is closed once all of them are.
+        """
+        if self._spill is not None:
+            self._spill.acquire()
+        return copy.copy(self)
+
+    def close(self):
+        if self._spill is not None:
+            self._content = b''
+            self._mapped = None
+            spill, self._spill = self._spill, None
+            spill.release()
+
+
+class DecodedBody(Body):
+    """A body known by its decoded value, like an entry of a batch response."""
+
+    def __init__(self, value):
+        super().__init__()
+        self._decoded = value
+
+    def __len__(self):
+        return len(self.content)
+
+    @property
+    def content(self):
+        return jsoncodec.dumps(self._decoded).encode('utf-8')
+
+
+class BodyWriter(object):
+    """
+    Collects a body chunk by chunk. 2xx bodies over `max_size` raise
+    `ResponseTooLarge`, other bodies are cut at `ACTION_RESPONSE_ERROR_SIZE`
+    since all they are good for is an error message.
+    """
+
+    def __init__(self, status_code, length=None, max_size=None,
+                 spill_size=None):
+        self.status_code = status_code
+        self.ok = is_success(status_code)
+        if self.ok:
+            self.max_size = max_size or settings.ACTION_RESPONSE_MAX_SIZE
+        else:
+            self.max_size = settings.ACTION_RESPONSE_ERROR_SIZE
+        self.spill_size = (settings.ACTION_RESPONSE_SPILL_SIZE
+                           if spill_size is None else spill_size)
+        self.size = 0
+        self.truncated = False
+        self._chunks = []
+        self._head = b''
+        self._file = None
+
+        # No need to read what the server already says is too big.
+        if self.ok and length is not None and int(length) > self.max_size:
+            self.too_large()
+
+    def write(self, chunk):
+        """Take `chunk`. False once the body is full and reading can stop."""
+        room = self.max_size - self.size
+        if len(chunk) > room:
+            if self.ok:
+                self.too_large(chunk)
+            chunk = chunk[:room]
+            self.truncated = True
+
+        if len(self._head) < settings.ACTION_RESPONSE_ERROR_SIZE:
+            self._head += chunk[:settings.ACTION_RESPONSE_ERROR_SIZE -
+                                len(self._head)]
+
+        if self._file is None and self.size + len(chunk) > self.spill_size:
+            self._file = tempfile.TemporaryFile()
+            self._file.writelines(self._chunks)
+            self._chunks = []
+
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._chunks.append(chunk)
+        self.size += len(chunk)
+        return not self.truncated
+
+    def finish(self):
+        if self._file is None:
+            return Body(b''.join(self._chunks), truncated=self.truncated,
+                        status_code=self.status_code)
+
+        self._file.flush()
+        mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return Body(mapped=mapped, file=self._file, truncated=self.truncated,
+                    status_code=self.status_code)
+
+    def too_large(self, chunk=b''):
+        head = (self._head + chunk)[:settings.ACTION_RESPONSE_ERROR_SIZE]
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._chunks = []
+        raise ResponseTooLarge(self.status_code, head, truncated=True)
+
+
+def share(result):
+    """`result`, or a `Body.share()` of it, for one more caller."""
+    if isinstance(result, Body):
+        return result.share()
+    return result
+
+
+def read(response, max_size=None):
+    """Read the body of a `requests` response sent with `stream=True`."""
+    try:
+        writer = BodyWriter(response.status_code,
+                            response.headers.get('Content-Length'),
+                            max_size=max_size)
+        for chunk in response.iter_content(settings.ACTION_STREAM_CHUNK_SIZE):
+            if not writer.write(chunk):
+                break
+    finally:
+        # Back to the pool if it was read to the end, dropped otherwise.
+        response.close()
+    return writer.finish()
+
+
+async def aread(response, max_size=None):
+    """Same as `read`, for an aiohttp response."""
+    writer = BodyWriter(response.status, response.content_length,
+                        max_size=max_size)
+    async for chunk in response.content.iter_chunked(
+            settings.ACTION_STREAM_CHUNK_SIZE):
+        if not writer.write(chunk):
+            break
+    return writer.finish()
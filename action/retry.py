@@ -0,0 +1,190 @@
+"""
+Retries with exponential backoff and jitter, and a per-host circuit breaker
+that fails fast while a destination is down instead of letting every fire
+wait out its timeout.
+
+A hook picks its policy in its data, e.g.
+`"retry": {"attempts": 3, "backoff": 0.5, "maxBackoff": 10,
+"statuses": ["5xx", "429"]}`, anything left out comes from the
+`ACTION_RETRY_*` settings.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import aiohttp
+import requests
+from django.conf import settings
+
+import action.http as http
+from action.responses import ResponseError, ResponseTooLarge
+
+
+class CircuitOpen(Exception):
+    """Fired at a host whose circuit is open, nothing was sent."""
+
+    def __init__(self, host, retry_in):
+        super().__init__('Circuit open for {0}, retry in {1:.1f}s'.format(
+            host, retry_in))
+        self.host = host
+        self.retry_in = retry_in
+
+
+def parse_statuses(statuses):
+    # "5xx" is the whole class, "429" just that status.
+    codes = set()
+    for status in statuses:
+        status = str(status).lower()
+        if status.endswith('xx'):
+            start = int(status[0]) * 100
+            codes.update(range(start, start + 100))
+        else:
+            codes.add(int(status))
+    return frozenset(codes)
+
+
+def is_transport_error(error):
+    return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                              aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def is_host_failure(error):
+    # What says the host is down, rather than unhappy with this request.
+    if isinstance(error, ResponseError):
+        return (not isinstance(error, ResponseTooLarge) and
+                error.status_code >= 500)
+    return is_transport_error(error)
+
+
+class RetryPolicy(namedtuple('RetryPolicy', [
+        'attempts', 'backoff', 'max_backoff', 'statuses'])):
+
+    @classmethod
+    def from_data(cls, data):
+        options = (data or {}).get('retry') or {}
+        return cls(
+            attempts=max(int(options.get(
+                'attempts', settings.ACTION_RETRY_ATTEMPTS)), 1),
+            backoff=float(options.get(
+                'backoff', settings.ACTION_RETRY_BACKOFF)),
+            max_backoff=float(options.get(
+                'maxBackoff', settings.ACTION_RETRY_MAX_BACKOFF)),
+            statuses=parse_statuses(options.get(
+                'statuses', settings.ACTION_RETRY_STATUSES)))
+
+    def should_retry(self, error):
+        if isinstance(error, ResponseTooLarge):
+            return False
+        if isinstance(error, ResponseError):
+            return error.status_code in self.statuses
+        return is_transport_error(error)
+
+    def delay(self, attempt):
+        # "Full jitter": spreads retries of hooks that failed together.
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class CircuitBreaker(object):
+    """
+    Opens a host's circuit after `failures` failures in a row. While open,
+    fires fail with `CircuitOpen`. After `reset_timeout` seconds one trial
+    fire goes through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failures=None, reset_timeout=None, max_hosts=None):
+        self.failures = failures or settings.ACTION_CIRCUIT_FAILURES
+        self.reset_timeout = (settings.ACTION_CIRCUIT_RESET_TIMEOUT
+                              if reset_timeout is None else reset_timeout)
+        self.max_hosts = max_hosts or settings.ACTION_HTTP_MAX_HOSTS
+        # host -> [failures in a row, opened at]. Healthy hosts aren't kept.
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def allow(self, host):
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None or entry[1] is None:
+                return
+            retry_in = entry[1] + self.reset_timeout - time.monotonic()
+            if retry_in > 0:
+                self.rejected += 1
+                raise CircuitOpen(host, retry_in)
+            # Half open: let this one through, hold the rest back until it
+            # comes back.
+            entry[1] = time.monotonic()
+
+    def success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def failure(self, host):
+        with self._lock:
+            entry = self._hosts.setdefault(host, [0, None])
+            self._hosts.move_to_end(host)
+            entry[0] += 1
+            if entry[0] >= self.failures:
+                entry[1] = time.monotonic()
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+
+    def is_open(self, host):
+        entry = self._hosts.get(host)
+        return entry is not None and entry[1] is not None
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+    def stats(self):
+        with self._lock:
+            open_hosts = sum(1 for _, opened in self._hosts.values()
+                             if opened is not None)
+            return {'failing_hosts': len(self._hosts),
+                    'open_hosts': open_hosts, 'rejected': self.rejected}
+
+
+breaker = CircuitBreaker()
+
+
+def call(hook, runner):
+    """Run `runner()` for `hook` under its retry policy and host circuit."""
+    policy = RetryPolicy.from_data(hook.data)
+    host = http.get_host((hook.data or {}).get('url'))
+
+    for attempt in range(policy.attempts):
+        breaker.allow(host)
+        try:
+            result = runner()
+        except Exception as e:
+            if is_host_failure(e):
+                breaker.failure(host)
+            if attempt + 1 >= policy.attempts or not policy.should_retry(e):
+                raise
+        else:
+            breaker.success(host)
+            return result
+        time.sleep(policy.delay(attempt))
+
+
+async def acall(hook, runner):
+    """Same as `call`, `runner()` being a coroutine function."""
+    policy = RetryPolicy.from_data(hook.data)
+    host = http.get_host((hook.data or {}).get('url'))
+
+    for attempt in range(policy.attempts):
+        breaker.allow(host)
+        try:
+            result = await runner()
+        except Exception as e:
+            if is_host_failure(e):
+                breaker.failure(host)
+            if attempt + 1 >= policy.attempts or not policy.should_retry(e):
+                raise
+        else:
+            breaker.success(host)
+            return result
+        await asyncio.sleep(policy.delay(attempt))
@@ -0,0 +1,304 @@
+"""
+Execution log of fires: one `ActionRun` row per fire with its status code,
+duration, byte counts and error.
+
+Turned on with `ACTION_RUN_LOG_ENABLED`. Fires only append a tuple to an
+in-process buffer. A background thread writes the buffer every
+`ACTION_RUN_LOG_INTERVAL` seconds, or once `ACTION_RUN_LOG_BATCH_SIZE`
+rows are waiting, with `COPY` on PostgreSQL and multi-row inserts
+elsewhere. The rows of a batch that failed are written one by one on the
+next flush, and the ones failing again are logged and dropped.
+
+On PostgreSQL the table is partitioned by day of `started` (migration
+0007). `./manage.py prune_action_runs` creates the coming days' partitions
+and drops the expired ones whole instead of deleting row by row.
+"""
+import atexit
+import csv
+import datetime
+import io
+import logging
+import re
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+import action.responses as responses
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'action_actionrun'
+DEFAULT_PARTITION = TABLE + '_default'
+COLUMNS = ('action_id', 'zip_id', 'started', 'duration', 'status_code',
+           'request_bytes', 'response_bytes', 'error')
+ERROR_SIZE = 1000
+
+
+def start():
+    """A start time to hand to `record`, None when the log is off."""
+    return time.monotonic() if settings.ACTION_RUN_LOG_ENABLED else None
+
+
+def request_bytes(plan):
+    # Of the plan a fire sent; streamed bodies are not counted.
+    if plan is None:
+        return None
+    if plan.body is None:
+        return 0
+    return len(plan.body) if isinstance(plan.body, bytes) else None
+
+
+def make_row(hook, started, result=None, error=None, plan=None):
+    """The row of a fire, None for unsaved hooks, which have no row."""
+    if hook.pk is None or hook.zip_id is None:
+        return None
+    duration = time.monotonic() - started
+    status_code = response_bytes = None
+    if isinstance(result, responses.Body):
+        status_code = result.status_code
+        response_bytes = len(result)
+    if isinstance(error, responses.ResponseError):
+        status_code = error.status_code
+        response_bytes = len(error.content or b'')
+    return (hook.pk, hook.zip_id,
+            timezone.now() - datetime.timedelta(seconds=duration), duration,
+            status_code, request_bytes(plan), response_bytes,
+            None if error is None else
+            '{0}: {1}'.format(type(error).__name__, error)[:ERROR_SIZE])
+
+
+class RunLog(object):
+    """
+    Buffers rows and writes them in batches, from a background thread
+    unless `background` is False, in which case `flush` is up to the caller.
+    """
+
+    def __init__(self, using='default', background=True):
+        self.using = using
+        self.background = background
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+        self._rows = []
+        # Rows of a batch that failed, written one by one next time.
+        self._retry = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, row):
+        with self._lock:
+            if len(self._rows) >= settings.ACTION_RUN_LOG_MAX_BUFFER:
+                # The database is not keeping up, or is down.
+                self.dropped += 1
+                return
+            self._rows.append(row)
+            size = len(self._rows)
+            if self.background and self._thread is None:
+                self._start()
+        if size >= settings.ACTION_RUN_LOG_BATCH_SIZE:
+            self._wakeup.set()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True,
+                                        name='action-run-log')
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            self._wakeup.wait(settings.ACTION_RUN_LOG_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                connections[self.using].close_if_unusable_or_obsolete()
+
+    def take(self):
+        with self._lock:
+            retry, self._retry = self._retry, []
+            rows, self._rows = self._rows, []
+        return retry, rows
+
+    def flush(self):
+        retry, rows = self.take()
+        if not retry and not rows:
+            return 0
+        written = self.write_each(retry)
+        if rows:
+            try:
+                write(rows, self.using)
+            except Exception:
+                self.errors += 1
+                with self._lock:
+                    self._retry.extend(rows)
+                raise
+            written += len(rows)
+        self.written += written
+        self.flushes += 1
+        return written
+
+    def write_each(self, rows):
+        # A bad row fails its whole batch. On their own, the rows that fail
+        # again are logged and dropped instead of being retried forever.
+        written = 0
+        for row in rows:
+            try:
+                write([row], self.using)
+            except Exception:
+                self.errors += 1
+                self.dropped += 1
+                logger.exception('Dropped run log row %r', row)
+            else:
+                written += 1
+        return written
+
+    def stats(self):
+        return {
+            'buffered': len(self._rows) + len(self._retry),
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'errors': self.errors,
+        }
+
+
+def write(rows, using='default'):
+    connection = connections[using]
+    # All or nothing, and a failure leaves the connection usable.
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            copy(rows, connection)
+            return
+        model = apps.get_model('action', 'ActionRun')
+        model.objects.using(using).bulk_create(
+            [model(**dict(zip(COLUMNS, row))) for row in rows],
+            batch_size=settings.ACTION_RUN_LOG_BATCH_SIZE)
+
+
+def copy(rows, connection):
+    data = io.StringIO()
+    writer = csv.writer(data)
+    for row in rows:
+        # Empty unquoted fields are NULLs to COPY ... CSV.
+        writer.writerow(['' if value is None else value for value in row])
+    data.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert('COPY {0} ({1}) FROM STDIN WITH CSV'.format(
+            TABLE, ', '.join(COLUMNS)), data)
+
+
+log = RunLog()
+
+
+def record(hook, started, result=None, error=None, plan=None):
+    """
+    Log a fire of `hook` that started at `started` (from `start`) and sent
+    `plan`, None if it failed before having one.
+    """
+    if started is None:
+        return
+    try:
+        row = make_row(hook, started, result, error, plan)
+        if row is not None:
+            log.add(row)
+    except Exception as e:
+        # The log must never fail a fire.
+        logger.exception(e)
+
+
+def is_partitioned(connection):
+    return connection.vendor == 'postgresql'
+
+
+def partition_name(day):
+    return '{0}_p{1:%Y%m%d}'.format(TABLE, day)
+
+
+def partition_day(name):
+    match = re.match(r'^{0}_p(\d{{8}})$'.format(TABLE), name)
+    if match:
+        return datetime.datetime.strptime(match.group(1), '%Y%m%d').date()
+    return None
+
+
+def partitions(connection):
+    """Days with a partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s', [TABLE])
+        days = [partition_day(row[0]) for row in cursor.fetchall()]
+    return sorted(day for day in days if day is not None)
+
+
+def create_partitions(connection, first_day, days):
+    """Make sure `days` days from `first_day` (UTC) have a partition."""
+    created = []
+    existing = set(partitions(connection))
+    for offset in range(days):
+        day = first_day + datetime.timedelta(days=offset)
+        if day in existing:
+            continue
+        name = partition_name(day)
+        bounds = ["{0} 00:00:00+00".format(day),
+                  "{0} 00:00:00+00".format(day + datetime.timedelta(days=1))]
+        # Rows of that day in the default partition would make a plain
+        # PARTITION OF fail, so they are moved over before attaching.
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute('CREATE TABLE {0} (LIKE {1} INCLUDING '
+                               'DEFAULTS INCLUDING CONSTRAINTS)'.format(
+                                   name, TABLE))
+                cursor.execute(
+                    'WITH moved AS (DELETE FROM {0} WHERE started >= %s '
+                    'AND started < %s RETURNING *) '
+                    'INSERT INTO {1} SELECT * FROM moved'.format(
+                        DEFAULT_PARTITION, name), bounds)
+                cursor.execute(
+                    'ALTER TABLE {0} ATTACH PARTITION {1} FOR VALUES FROM '
+                    '(%s) TO (%s)'.format(TABLE, name), bounds)
+        created.append(day)
+    return created
+
+
+def prune(keep_days, ahead=7, using='default'):
+    """
+    Drop the runs started more than `keep_days` days ago and, on
+    PostgreSQL, create the partitions of the next `ahead` days. Returns
+    `(dropped partitions, deleted rows, created partitions)`.
+    """
+    connection = connections[using]
+    today = timezone.now().astimezone(datetime.timezone.utc).date()
+    cutoff = today - datetime.timedelta(days=keep_days)
+    cutoff_time = datetime.datetime.combine(
+        cutoff, datetime.time(tzinfo=datetime.timezone.utc))
+
+    if not is_partitioned(connection):
+        model = apps.get_model('action', 'ActionRun')
+        deleted, _ = model.objects.using(using).filter(
+            started__lt=cutoff_time).delete()
+        return [], deleted, []
+
+    dropped = []
+    with connection.cursor() as cursor:
+        for day in partitions(connection):
+            if day < cutoff:
+                cursor.execute('DROP TABLE {0}'.format(partition_name(day)))
+                dropped.append(day)
+        # Stragglers that missed every partition.
+        cursor.execute(
+            'DELETE FROM {0} WHERE started < %s'.format(DEFAULT_PARTITION),
+            [cutoff_time])
+        deleted = cursor.rowcount
+    created = create_partitions(connection, today, ahead + 1)
+    return dropped, deleted, created
@@ -0,0 +1,49 @@
+import hashlib
+import json
+from collections import namedtuple
+
+# Pre-serialised schema, ready to be served as is.
+SchemaDocument = namedtuple('SchemaDocument', ['content', 'etag'])
+
+
+class FrozenDict(dict):
+    """
+    A dict nobody can change. Still a real dict, so `json` and the admin
+    widget take it as is.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('{0} is immutable'.format(type(self).__name__))
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    clear = _immutable
+    pop = _immutable
+    popitem = _immutable
+    setdefault = _immutable
+    update = _immutable
+
+    def __hash__(self):
+        return hash(tuple(sorted(self.items())))
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    # Mutable deep copy, for whoever needs to build on top of a schema.
+    if isinstance(value, dict):
+        return dict((key, thaw(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+def to_document(schema):
+    content = json.dumps(schema, sort_keys=True).encode('utf-8')
+    return SchemaDocument(content, hashlib.sha1(content).hexdigest())
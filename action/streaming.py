@@ -0,0 +1,107 @@
+"""
+Request bodies encoded on the fly, one chunk at a time, so a large payload
+never sits in memory fully encoded.
+"""
+import itertools
+
+from django.conf import settings
+from requests.models import RequestEncodingMixin
+
+import action.jsoncodec as jsoncodec
+
+# Form pairs urlencoded per group, not one by one.
+FORM_GROUP_SIZE = 256
+
+
+def rechunk(parts, chunk_size):
+    """Glue str `parts` into utf-8 chunks of roughly `chunk_size` bytes."""
+    buffered = []
+    size = 0
+    for part in parts:
+        buffered.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield ''.join(buffered).encode('utf-8')
+            buffered = []
+            size = 0
+    if buffered:
+        yield ''.join(buffered).encode('utf-8')
+
+
+def _json_key(key):
+    # Same conversions json.dumps applies to non-string keys.
+    if isinstance(key, str):
+        return key
+    if key is True:
+        return 'true'
+    if key is False:
+        return 'false'
+    if key is None:
+        return 'null'
+    return str(key)
+
+
+def iter_json_parts(data):
+    dumps = jsoncodec.dumps
+    yield '{'
+    for position, (key, value) in enumerate(data.items()):
+        yield '{0}{1}: {2}'.format(', ' if position else '',
+                                   dumps(_json_key(key)), dumps(value))
+    yield '}'
+
+
+def iter_json(data, chunk_size=None):
+    return rechunk(iter_json_parts(data),
+                   chunk_size or settings.ACTION_STREAM_CHUNK_SIZE)
+
+
+def iter_form_parts(data):
+    items = iter(data.items())
+    first = True
+    while True:
+        group = list(itertools.islice(items, FORM_GROUP_SIZE))
+        if not group:
+            return
+        # Exactly what requests would have sent for the whole dict.
+        encoded = RequestEncodingMixin._encode_params(group)
+        if encoded:
+            yield encoded if first else '&' + encoded
+            first = False
+
+
+def iter_form(data, chunk_size=None):
+    return rechunk(iter_form_parts(data),
+                   chunk_size or settings.ACTION_STREAM_CHUNK_SIZE)
+
+
+class StreamingBody(object):
+    """
+    Reusable streamed body: every iteration encodes `data` again from the
+    start, so a compiled plan can hand it to any number of fires. Having
+    no length, it goes out with `Transfer-Encoding: chunked`.
+    """
+
+    def __init__(self, encode, data, chunk_size=None):
+        self.encode = encode
+        self.data = data
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return iter(self.encode(self.data, self.chunk_size))
+
+    def __aiter__(self):
+        return _AsyncChunks(iter(self))
+
+
+class _AsyncChunks(object):
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
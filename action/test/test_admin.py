@@ -8,7 +8,7 @@ from action.models import ActionWebhook
 class ActionWebhookAdminTest(TestCase):
     def setUp(self):
         self.admin = ActionWebhookAdmin(model=ActionWebhook, admin_site=1)
-        self.fields = ('zip', 'title', 'hook_type', 'data')
+        self.fields = ('zip', 'title', 'hook_type', 'data', 'depends_on')
         self.fields_no_data = ('zip', 'title', 'hook_type')
 
     @mock.patch('django.contrib.admin.ModelAdmin.get_form')
@@ -37,3 +37,15 @@ class ActionWebhookAdminTest(TestCase):
         super_get_form.assert_called_once_with(
             request, obj, widgets={'data': 'json_widget'})
         self.assertEqual(self.admin.fields, self.fields)
+
+    def test_get_form_widget_schema_copy(self):
+        request = mock.MagicMock()
+        obj = ActionWebhook(hook_type='post')
+
+        with mock.patch('django.contrib.admin.ModelAdmin.get_form'), \
+                mock.patch('action.admin.JSONEditorWidget') as json_widget:
+            self.admin.get_form(request, obj)
+
+        schema = json_widget.call_args[0][0]
+        schema['title'] = ' '
+        self.assertEqual(obj.get_schema('post')['title'], 'Webhook POST')
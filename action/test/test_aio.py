@@ -0,0 +1,127 @@
+import json
+
+from django.test import SimpleTestCase, override_settings
+from unittest import mock
+
+import action.aio as aio
+from action.responses import Body, ResponseError, ResponseTooLarge
+from action.test.utils import make_hook, run
+from benchmarks.server import StandInServer
+
+
+class ResponseTest(SimpleTestCase):
+
+    def test_json(self):
+        response = aio.Response(200, Body(b'{"key1": "value1"}'))
+        self.assertEqual(response.json(), {'key1': 'value1'})
+        self.assertEqual(response.content, b'{"key1": "value1"}')
+
+    def test_json_error(self):
+        response = aio.Response(200, Body(b'nope'))
+        with self.assertRaises(ValueError):
+            response.json()
+
+
+class AsyncDispatchTest(SimpleTestCase):
+
+    def setUp(self):
+        self.server = StandInServer(echo=True).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def make_hook(self, pk, hook_type='post', **data):
+        data.setdefault('url', self.server.url)
+        return make_hook(hook_type, pk, **data)
+
+    def test_make_it_so_async_nope(self):
+        hook = self.make_hook(1, hook_type='Nothing')
+        self.assertEqual(run(hook.make_it_so_async()), 'Nope')
+
+    def test_make_it_so_async_json(self):
+        hook = self.make_hook(1, payloadType='json', data=[
+            {'key': 'key1', 'value': 'value1'}])
+
+        result = run(hook.make_it_so_async())
+
+        self.assertEqual(result.json(), {'key1': 'value1'})
+
+    def test_make_it_so_async_form(self):
+        hook = self.make_hook(1, data=[
+            {'key': 'key1', 'value': 'value1'},
+            {'key': 'key2', 'value': 'value2'}])
+
+        result = run(hook.make_it_so_async())
+
+        # Same body the blocking runner sends.
+        self.assertEqual(result.content, b'key1=value1&key2=value2')
+
+    def test_make_it_so_async_get(self):
+        self.server.stop()
+        self.server = StandInServer(body=b'[1, 2]').start()
+        hook = self.make_hook(1, hook_type='get')
+
+        self.assertEqual(run(hook.make_it_so_async()).json(), [1, 2])
+
+    def test_make_it_so_async_bad_response(self):
+        self.server.stop()
+        self.server = StandInServer(status=500, body=b'broken').start()
+        hook = self.make_hook(1)
+
+        with self.assertRaises(ResponseError) as context:
+            run(hook.make_it_so_async())
+
+        self.assertIn(b'broken', context.exception.args)
+        self.assertEqual(context.exception.status_code, 500)
+
+    @override_settings(ACTION_RESPONSE_MAX_SIZE=10)
+    def test_make_it_so_async_too_large(self):
+        self.server.stop()
+        self.server = StandInServer(body=b'x' * 100).start()
+        hook = self.make_hook(1, hook_type='get')
+
+        with self.assertRaises(ResponseTooLarge):
+            run(hook.make_it_so_async())
+
+    def test_gather(self):
+        hooks = [
+            self.make_hook(pk, payloadType='json', data=[
+                {'key': 'id', 'value': str(pk)}])
+            for pk in range(50)
+        ]
+        hooks.append(self.make_hook(50, url='http://127.0.0.1:1/'))
+
+        with mock.patch.object(aio.logger, 'exception') as test_logger:
+            report = aio.run(hooks, limit=10)
+
+        test_logger.assert_called_once_with('Action %s failed', 50)
+        self.assertEqual(self.server.requests, 50)
+        self.assertEqual(
+            [result.result.json() for result in report.succeeded],
+            [{'id': str(pk)} for pk in range(50)])
+        self.assertEqual([result.action.pk for result in report.failed], [50])
+
+    def test_gather_shared_session(self):
+        hooks = [self.make_hook(pk) for pk in range(3)]
+
+        async def gather():
+            async with aio.new_session() as session:
+                return await aio.gather(hooks, session=session)
+
+        report = run(gather())
+
+        self.assertEqual(len(report.succeeded), 3)
+
+
+class ServerTest(SimpleTestCase):
+
+    def test_chunked_echo(self):
+        import requests
+
+        with StandInServer(echo=True) as server:
+            response = requests.post(
+                server.url, data=iter([b'{"a": ', b'1}']),
+                headers={'Content-Type': 'application/json'})
+
+        self.assertEqual(json.loads(response.content.decode()), {'a': 1})
+        self.assertEqual(server.bytes_received, 8)
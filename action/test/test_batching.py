@@ -0,0 +1,162 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase, override_settings
+from unittest import mock
+
+from action.batching import Batcher, fan_out
+from action.responses import Body, BodyWriter, ResponseError
+from action.test.utils import make_hook, run
+from benchmarks.server import StandInServer
+
+
+class BatchOptionsTest(SimpleTestCase):
+
+    @override_settings(ACTION_BATCH_SIZE=10, ACTION_BATCH_WAIT=20)
+    def test_get_batch_options_defaults(self):
+        hook = make_hook(loaded=True, payloadType='json', batch=True)
+
+        self.assertEqual(hook.get_batch_options(), (10, 0.02))
+
+    def test_get_batch_options(self):
+        hook = make_hook(loaded=True, payloadType='xml',
+                         batch={'size': 3, 'wait': 500})
+
+        self.assertEqual(hook.get_batch_options(), (3, 0.5))
+
+    def test_get_batch_options_off(self):
+        self.assertIsNone(
+            make_hook(loaded=True, payloadType='json').get_batch_options())
+        self.assertIsNone(
+            make_hook(loaded=True, batch=True).get_batch_options())
+        self.assertIsNone(make_hook(
+            'get', loaded=True, payloadType='json',
+            batch=True).get_batch_options())
+        self.assertIsNone(
+            make_hook(payloadType='json', batch=True).get_batch_options())
+
+    def test_get_batch_item(self):
+        hook = make_hook(
+            loaded=True, data=[{'key': 'key1', 'value': 'value1'}])
+
+        self.assertEqual(hook.get_batch_item(), {'key1': 'value1'})
+        self.assertEqual(make_hook(loaded=True).get_batch_item(), {})
+
+    @mock.patch('action.http.request')
+    @mock.patch('action.utils.handle_response')
+    def test_run_batch_xml(self, handle_response, request):
+        hook = make_hook(loaded=True, url='url', payloadType='xml')
+
+        result = hook.run_batch([{'a': 1}])
+
+        request.assert_called_once_with(
+            'post', 'url', data=(
+                b'<?xml version="1.0" encoding="UTF-8" ?><root>'
+                b'<item type="dict"><a type="int">1</a></item></root>'),
+            headers={'Content-Type': 'application/xml'}, timeout=30,
+            stream=True)
+        self.assertEqual(result, handle_response.return_value)
+
+
+class FanOutTest(SimpleTestCase):
+
+    def test_fan_out(self):
+        results = fan_out(Body(b'[{"a": 1}, 2]'), 2)
+
+        self.assertEqual([result.json() for result in results],
+                         [{'a': 1}, 2])
+        self.assertEqual(results[0].content, b'{"a": 1}')
+
+    def test_fan_out_shared(self):
+        for content in (b'{"ok": true}', b'not json'):
+            body = Body(content)
+
+            results = fan_out(body, 3)
+
+            self.assertIs(results[0], body)
+            self.assertEqual(len(set(map(id, results))), 3)
+            self.assertEqual([result.content for result in results],
+                             [content] * 3)
+
+    @override_settings(ACTION_RESPONSE_SPILL_SIZE=1)
+    def test_fan_out_spilled(self):
+        writer = BodyWriter(200)
+        writer.write(b'{"ok": true}')
+        first, second = fan_out(writer.finish(), 2)
+
+        first.close()
+
+        self.assertEqual(second.json(), {'ok': True})
+
+
+class BatcherTest(SimpleTestCase):
+
+    def setUp(self):
+        self.server = StandInServer(echo=True).start()
+        self.batcher = Batcher()
+        patcher = mock.patch('action.batching.batcher', self.batcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def make_hook(self, **batch):
+        return make_hook(loaded=True, url=self.server.url,
+                         payloadType='json', batch=batch,
+                         data=[{'key': 'id', 'value': '1'}])
+
+    def test_full_batch(self):
+        hook = self.make_hook(size=5, wait=10000)
+
+        with ThreadPoolExecutor(5) as executor:
+            results = list(executor.map(
+                lambda _: hook.make_it_so(), range(5)))
+
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual([result.json() for result in results],
+                         [{'id': '1'}] * 5)
+        self.assertEqual(self.batcher.stats(),
+                         {'batches': 1, 'items': 5, 'pending': 0})
+
+    def test_wait(self):
+        hook = self.make_hook(size=100, wait=10)
+
+        result = hook.make_it_so()
+
+        self.assertEqual(result.json(), {'id': '1'})
+        self.assertEqual(self.server.requests, 1)
+
+    def test_flush_all(self):
+        hook = self.make_hook(size=100, wait=10000)
+        futures = [self.batcher.submit(hook, 100, 10) for _ in range(3)]
+
+        self.batcher.flush_all()
+
+        self.assertEqual([future.result().json() for future in futures],
+                         [{'id': '1'}] * 3)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_error(self):
+        self.server.stop()
+        self.server = StandInServer(status=500, body=b'broken').start()
+        hook = self.make_hook(size=2, wait=10000)
+
+        futures = [self.batcher.submit(hook, 2, 10) for _ in range(2)]
+
+        for future in futures:
+            with self.assertRaises(ResponseError):
+                future.result()
+
+    def test_async(self):
+        hook = self.make_hook(size=3, wait=10000)
+
+        async def fire():
+            return await asyncio.gather(
+                *[hook.make_it_so_async() for _ in range(3)])
+
+        results = run(fire())
+
+        self.assertEqual([result.json() for result in results],
+                         [{'id': '1'}] * 3)
+        self.assertEqual(self.server.requests, 1)
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+import benchmarks.suite as suite
+from action.models import ActionWebhook
+from zip.models import Zip
+
+
+class PercentileTest(SimpleTestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(suite.percentile(values, 50), 50)
+        self.assertEqual(suite.percentile(values, 99), 99)
+        self.assertEqual(suite.percentile(values, 100), 100)
+        self.assertEqual(suite.percentile([3], 95), 3)
+        self.assertIsNone(suite.percentile([], 50))
+
+    def test_compare(self):
+        def result(hook_type, level, throughput):
+            return {'hook_type': hook_type, 'payload_type': None,
+                    'concurrency': level, 'throughput': throughput}
+
+        old = {'results': [result('get', 1, 10), result('get', 10, 50)]}
+        new = {'results': [result('get', 10, 60), result('post', 10, 60)]}
+
+        self.assertEqual(list(suite.compare(old, new)), [
+            (('get', None, 10), old['results'][1], new['results'][0])])
+
+
+class RunBenchmarksTest(TestCase):
+
+    def test_run_benchmarks(self):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+
+        call_command('run_benchmarks', '--fires', '3', '--concurrency', '1',
+                     '2', '--latency', '0', '--no-memory', '--output', path,
+                     stdout=out)
+        call_command('run_benchmarks', '--fires', '2', '--concurrency', '2',
+                     '--latency', '0', '--no-memory', '--compare', path,
+                     stdout=out)
+
+        with open(path) as output:
+            report = json.load(output)
+        self.assertEqual(report['meta']['fires'], 3)
+        self.assertEqual(len(report['results']), len(suite.SCENARIOS) * 2)
+        for result in report['results']:
+            self.assertEqual(result['failed'], 0)
+            self.assertLessEqual(result['latency']['p50'],
+                                 result['latency']['p99'])
+        self.assertIn('Compared with', out.getvalue())
+        self.assertFalse(Zip.objects.exists())
+        self.assertFalse(ActionWebhook.objects.exists())
@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from action.admin import ActionWebhookAdmin
+from action.changelist import estimate_count
+from action.models import ActionWebhook
+from zip.models import Zip
+
+
+class EstimateCountTest(TestCase):
+
+    def setUp(self):
+        zipp = Zip.objects.create(title='Zip')
+        ActionWebhook.objects.create(zip=zipp, hook_type='get')
+
+    def test_exact_outside_postgresql(self):
+        self.assertEqual(estimate_count(ActionWebhook.objects.all()),
+                         (1, False))
+
+    @mock.patch('action.changelist.connections')
+    def test_postgresql_estimate(self, connections):
+        connection = connections.__getitem__.return_value
+        connection.vendor = 'postgresql'
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (50000.0,)
+
+        self.assertEqual(
+            estimate_count(ActionWebhook.objects.all(), exact_below=10000),
+            (50000, True))
+        self.assertIn('reltuples', cursor.execute.call_args[0][0])
+
+        # Filtered lists ask the planner.
+        cursor.fetchone.return_value = ('[{"Plan": {"Plan Rows": 20000}}]',)
+        self.assertEqual(
+            estimate_count(ActionWebhook.objects.filter(hook_type='get'),
+                           exact_below=10000),
+            (20000, True))
+        self.assertTrue(
+            cursor.execute.call_args[0][0].startswith('EXPLAIN'))
+
+        # Small tables are counted.
+        cursor.fetchone.return_value = (10.0,)
+        self.assertEqual(
+            estimate_count(ActionWebhook.objects.all(), exact_below=10000),
+            (1, False))
+
+
+@mock.patch.object(ActionWebhookAdmin, 'list_per_page', 2)
+class ActionWebhookChangeListTest(TestCase):
+    url = '/admin/action/actionwebhook/'
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'a@example.com', 'pw')
+        self.client.force_login(user)
+        zips = [Zip.objects.create(title='Zip {0}'.format(n), active=n == 0)
+                for n in range(5)]
+        self.hooks = [
+            ActionWebhook.objects.create(
+                zip=zipp, hook_type='post', data={'url': 'http://a/'})
+            for zipp in zips]
+
+    def test_keyset_pages(self):
+        response = self.client.get(self.url)
+        cl = response.context['cl']
+
+        self.assertTrue(cl.keyset)
+        self.assertEqual([hook.pk for hook in cl.result_list],
+                         [self.hooks[4].pk, self.hooks[3].pk])
+        self.assertEqual(cl.result_count, 5)
+        self.assertIn('after={0}'.format(self.hooks[3].pk), cl.next_url)
+        self.assertContains(response, cl.next_url.replace('&', '&amp;'))
+
+        response = self.client.get(self.url + cl.next_url)
+        cl = response.context['cl']
+        self.assertEqual([hook.pk for hook in cl.result_list],
+                         [self.hooks[2].pk, self.hooks[1].pk])
+
+        response = self.client.get(self.url + cl.next_url)
+        cl = response.context['cl']
+        self.assertEqual([hook.pk for hook in cl.result_list],
+                         [self.hooks[0].pk])
+        self.assertIsNone(cl.next_url)
+        self.assertNotIn('after', cl.first_url)
+
+    def test_data_deferred_and_zip_joined(self):
+        response = self.client.get(self.url)
+        cl = response.context['cl']
+
+        with self.assertNumQueries(0):
+            for hook in cl.result_list:
+                str(hook.zip)
+        self.assertIn('data', cl.result_list[0].get_deferred_fields())
+
+    def test_filters(self):
+        response = self.client.get(self.url + '?zip__active__exact=1')
+        cl = response.context['cl']
+
+        self.assertEqual([hook.pk for hook in cl.result_list],
+                         [self.hooks[0].pk])
+
+    def test_sorted_by_column_pages_by_offset(self):
+        response = self.client.get(self.url + '?o=1')
+        cl = response.context['cl']
+
+        self.assertFalse(cl.keyset)
+        self.assertEqual(len(cl.result_list), 2)
+
+    def test_bad_after(self):
+        response = self.client.get(self.url + '?after=x')
+
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,193 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from model_mommy import mommy
+from unittest import mock
+
+import action.dispatch as dispatch
+from action.models import ActionWebhook, DispatchJob
+from action.responses import Body
+
+
+class ClaimTest(TestCase):
+
+    def test_claim(self):
+        jobs = mommy.make('action.DispatchJob', _quantity=3)
+        mommy.make('action.DispatchJob', status=DispatchJob.STATUS_DONE)
+
+        claimed = dispatch.claim(2, 'worker-1')
+
+        self.assertEqual([job.pk for job in claimed],
+                         [job.pk for job in jobs[:2]])
+        for job in claimed:
+            self.assertEqual(job.status, DispatchJob.STATUS_RUNNING)
+            self.assertEqual(job.action, ActionWebhook.objects.get(
+                pk=job.action_id))
+            job.refresh_from_db()
+            self.assertEqual(job.status, DispatchJob.STATUS_RUNNING)
+            self.assertEqual(job.worker, 'worker-1')
+            self.assertEqual(job.attempts, 1)
+            self.assertIsNotNone(job.claimed_at)
+
+        self.assertEqual([job.pk for job in dispatch.claim(2, 'worker-2')],
+                         [jobs[2].pk])
+        self.assertEqual(dispatch.claim(2, 'worker-2'), [])
+
+    def test_claim_skips_paused(self):
+        paused = mommy.make('action.DispatchJob', action__paused=True)
+        job = mommy.make('action.DispatchJob')
+
+        self.assertEqual([job.pk for job in dispatch.claim(5, 'worker')],
+                         [job.pk])
+
+        ActionWebhook.objects.filter(pk=paused.action_id).resume()
+        self.assertEqual([job.pk for job in dispatch.claim(5, 'worker')],
+                         [paused.pk])
+
+    def test_claim_deleted_action(self):
+        deleted, job = mommy.make('action.DispatchJob', _quantity=2)
+        # Gone between the claim and loading the actions, cascade or not.
+        actions = ActionWebhook.objects.in_bulk([job.action_id])
+        with mock.patch('action.dispatch.ActionWebhook.objects.select_related'
+                        ) as select_related:
+            select_related.return_value.in_bulk.return_value = actions
+            claimed = dispatch.claim(5, 'worker')
+
+        self.assertEqual([job.pk for job in claimed], [job.pk])
+        deleted.refresh_from_db()
+        self.assertEqual((deleted.status, deleted.error),
+                         (DispatchJob.STATUS_FAILED, 'Action deleted'))
+
+
+class RunJobTest(TestCase):
+
+    @mock.patch.object(ActionWebhook, 'make_it_so')
+    def test_run_job(self, make_it_so):
+        make_it_so.return_value = {'key1': 'value1'}
+        mommy.make('action.DispatchJob')
+        job = dispatch.claim(1, 'worker')[0]
+
+        dispatch.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DispatchJob.STATUS_DONE)
+        self.assertEqual(job.result, {'key1': 'value1'})
+        self.assertIsNone(job.error)
+        self.assertIsNotNone(job.duration)
+        self.assertIsNotNone(job.finished_at)
+
+    @mock.patch.object(ActionWebhook, 'make_it_so')
+    def test_run_job_bytes(self, make_it_so):
+        make_it_so.return_value = b'not json'
+        mommy.make('action.DispatchJob')
+        job = dispatch.claim(1, 'worker')[0]
+
+        dispatch.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, 'not json')
+
+    @mock.patch.object(ActionWebhook, 'make_it_so')
+    def test_run_job_body(self, make_it_so):
+        make_it_so.return_value = Body(b'{"key1": "value1"}')
+        mommy.make('action.DispatchJob')
+        job = dispatch.claim(1, 'worker')[0]
+
+        dispatch.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'key1': 'value1'})
+
+    @mock.patch.object(ActionWebhook, 'make_it_so')
+    def test_run_job_error(self, make_it_so):
+        make_it_so.side_effect = Exception('boom')
+        mommy.make('action.DispatchJob')
+        job = dispatch.claim(1, 'worker')[0]
+
+        with mock.patch.object(dispatch.logger, 'exception'):
+            dispatch.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DispatchJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'boom')
+
+
+class QueueTest(TestCase):
+
+    def test_requeue_stale(self):
+        old = timezone.now() - timedelta(seconds=600)
+        stale = mommy.make('action.DispatchJob', claimed_at=old,
+                           status=DispatchJob.STATUS_RUNNING)
+        fresh = mommy.make('action.DispatchJob', claimed_at=timezone.now(),
+                           status=DispatchJob.STATUS_RUNNING)
+
+        self.assertEqual(dispatch.requeue_stale(300), 1)
+
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, DispatchJob.STATUS_PENDING)
+        self.assertIsNone(stale.worker)
+        self.assertEqual(fresh.status, DispatchJob.STATUS_RUNNING)
+
+    def test_stamped_when_started(self):
+        mommy.make('action.DispatchJob', _quantity=2)
+        first, second = dispatch.claim(2, 'worker')
+        # The second job waited behind the first one for a long time.
+        DispatchJob.objects.update(
+            claimed_at=timezone.now() - timedelta(seconds=600))
+
+        with mock.patch.object(ActionWebhook, 'make_it_so',
+                               return_value='ok'):
+            dispatch.run_job(first)
+            self.assertEqual(dispatch.requeue_stale(300), 1)
+            # Requeued meanwhile, and left to whoever claims it next.
+            self.assertIsNone(dispatch.run_job(second))
+            ActionWebhook.make_it_so.assert_called_once_with()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, DispatchJob.STATUS_DONE)
+        self.assertGreater(first.claimed_at,
+                           timezone.now() - timedelta(seconds=60))
+        self.assertEqual(second.status, DispatchJob.STATUS_PENDING)
+
+    def test_enqueue(self):
+        hook = mommy.make('action.ActionWebhook')
+
+        job = hook.enqueue()
+
+        self.assertEqual(job.action, hook)
+        self.assertEqual(job.status, DispatchJob.STATUS_PENDING)
+
+    def test_enqueue_zip(self):
+        zipp = mommy.make('zip.Zip', active=True)
+        mommy.make('action.ActionWebhook', zip=zipp, _quantity=2)
+
+        zipp.enqueue()
+
+        self.assertEqual(DispatchJob.objects.filter(
+            action__zip=zipp).count(), 2)
+
+    def test_enqueue_zip_inactive(self):
+        zipp = mommy.make('zip.Zip', active=False)
+        self.assertEqual(zipp.enqueue(), 'Nope')
+
+
+class RunDispatchWorkersTest(TransactionTestCase):
+
+    @mock.patch.object(ActionWebhook, 'make_it_so')
+    def test_command(self, make_it_so):
+        make_it_so.return_value = 'ok'
+        mommy.make('action.DispatchJob', _quantity=5)
+        out = StringIO()
+
+        call_command('run_dispatch_workers', workers=1, batch_size=2,
+                     burst=True, stdout=out)
+
+        self.assertEqual(DispatchJob.objects.filter(
+            status=DispatchJob.STATUS_DONE).count(), 5)
+        self.assertIn('Ran 5 jobs (0 failed)', out.getvalue())
+        self.assertIn('jobs/sec', out.getvalue())
@@ -0,0 +1,281 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms import modelform_factory
+from django.test import TestCase, override_settings
+from model_mommy import mommy
+from unittest import mock
+
+import action.retry as retry
+from action.executor import (
+    ActionResult,
+    CycleError,
+    DependencyFailed,
+    ExecutionReport,
+    get_dependencies,
+    logger,
+    run_action,
+    run_actions,
+    run_pipeline)
+from action.admin import ActionWebhookForm
+from action.models import ActionWebhook
+from action.responses import Body
+from benchmarks.server import StandInServer
+
+
+def make_action(pk, result=None, error=None, delay=0):
+    action = mock.MagicMock()
+    action.pk = pk
+
+    def make_it_so():
+        time.sleep(delay)
+        if error:
+            raise error
+        return result
+
+    action.make_it_so.side_effect = make_it_so
+    return action
+
+
+def make_step(pk, delay=0, error=None):
+    # Answers with its pk and the input it was given.
+    action = mock.MagicMock()
+    action.pk = pk
+
+    def make_it_so(input=None):
+        time.sleep(delay)
+        if error:
+            raise error
+        return {'pk': pk, 'input': input}
+
+    action.make_it_so.side_effect = make_it_so
+    return action
+
+
+class RunActionTest(TestCase):
+
+    def test_run_action(self):
+        action = make_action(1, result='result')
+
+        result = run_action(action)
+
+        self.assertIs(result.action, action)
+        self.assertEqual(result.result, 'result')
+        self.assertIsNone(result.error)
+        self.assertGreaterEqual(result.duration, 0)
+
+    def test_run_action_error(self):
+        error = Exception('boom')
+        action = make_action(1, error=error)
+
+        with mock.patch.object(logger, 'exception') as test_logger:
+            result = run_action(action)
+
+        test_logger.assert_called_once_with('Action %s failed', 1)
+        self.assertIsNone(result.result)
+        self.assertIs(result.error, error)
+
+
+class RunActionsTest(TestCase):
+
+    def test_run_actions_empty(self):
+        report = run_actions([])
+
+        self.assertEqual(len(report), 0)
+        self.assertGreaterEqual(report.wall_time, 0)
+
+    def test_run_actions_failure_does_not_abort(self):
+        actions = [
+            make_action(1, result='one'),
+            make_action(2, error=ValueError('two')),
+            make_action(3, result='three'),
+        ]
+
+        with mock.patch.object(logger, 'exception'):
+            report = run_actions(actions)
+
+        self.assertEqual([r.result for r in report], ['one', None, 'three'])
+        self.assertEqual([r.action.pk for r in report.succeeded], [1, 3])
+        self.assertEqual([r.action.pk for r in report.failed], [2])
+        self.assertIn('2 ok, 1 failed', repr(report))
+
+    def test_run_actions_concurrent(self):
+        actions = [make_action(pk, delay=0.2) for pk in range(10)]
+
+        report = run_actions(actions, max_workers=10)
+
+        # Roughly the slowest hook, not the sum of all of them.
+        self.assertLess(report.wall_time, 1)
+        self.assertEqual(len(report.succeeded), 10)
+
+    @override_settings(ACTION_MAX_WORKERS=3)
+    @mock.patch('action.executor.ThreadPoolExecutor')
+    def test_run_actions_max_workers(self, executor):
+        executor.return_value.__enter__.return_value.map.return_value = []
+
+        run_actions([make_action(pk) for pk in range(5)])
+        executor.assert_called_with(max_workers=3)
+
+        run_actions([make_action(pk) for pk in range(2)])
+        executor.assert_called_with(max_workers=2)
+
+    def test_run_actions_closes_connections(self):
+        with mock.patch('action.executor.connection') as connection:
+            run_actions([make_action(pk) for pk in range(3)])
+            run_pipeline([make_step(pk) for pk in range(3)],
+                         dependencies={0: [], 1: [0], 2: []})
+
+        self.assertEqual(connection.close.call_count, 6)
+
+
+class ExecutionReportTest(TestCase):
+
+    def test_report(self):
+        ok = ActionResult('a', 'result', None, 1)
+        bad = ActionResult('b', None, Exception(), 2)
+
+        report = ExecutionReport([ok, bad], 2)
+
+        self.assertEqual(list(report), [ok, bad])
+        self.assertEqual(report.succeeded, [ok])
+        self.assertEqual(report.failed, [bad])
+
+
+class RunPipelineTest(TestCase):
+
+    def test_outputs_feed_dependents(self):
+        steps = [make_step(pk) for pk in range(1, 5)]
+        # 1 -> 2 -> 4, 1 -> 3 -> 4
+        dependencies = {1: [], 2: [1], 3: [1], 4: [2, 3]}
+
+        report = run_pipeline(steps, input={'event': 1},
+                              dependencies=dependencies)
+
+        results = [result.result for result in report]
+        self.assertEqual(results[0]['input'], {'event': 1})
+        self.assertEqual(results[1]['input'], results[0])
+        self.assertEqual(results[3]['input'], {'2': results[1],
+                                               '3': results[2]})
+
+    def test_branches_run_concurrently(self):
+        steps = [make_step(1, 0.1), make_step(2, 0.3), make_step(3, 0.3),
+                 make_step(4, 0.1)]
+        dependencies = {1: [], 2: [1], 3: [1], 4: [2]}
+
+        report = run_pipeline(steps, max_workers=4,
+                              dependencies=dependencies)
+
+        # The longest chain, 1 -> 2 -> 4, not the sum of the steps.
+        self.assertLess(report.wall_time, 0.65)
+        self.assertEqual([result.action.pk for result in report.critical_path],
+                         [1, 2, 4])
+        self.assertAlmostEqual(report.critical_path_duration, 0.5, delta=0.1)
+        self.assertIn('critical path', repr(report))
+
+    def test_failure_skips_dependents(self):
+        steps = [make_step(1, error=ValueError('one')), make_step(2),
+                 make_step(3), make_step(4)]
+        dependencies = {1: [], 2: [1], 3: [2], 4: []}
+
+        with mock.patch.object(logger, 'exception'):
+            report = run_pipeline(steps, dependencies=dependencies)
+
+        self.assertEqual([r.action.pk for r in report.succeeded], [4])
+        self.assertIsInstance(report.results[2].error, DependencyFailed)
+        self.assertFalse(steps[2].make_it_so.called)
+
+    def test_cycle(self):
+        steps = [make_step(pk) for pk in range(1, 4)]
+
+        with self.assertRaises(CycleError):
+            run_pipeline(steps, dependencies={1: [3], 2: [1], 3: [2]})
+        self.assertFalse(steps[0].make_it_so.called)
+
+    def test_empty(self):
+        report = run_pipeline([])
+
+        self.assertEqual((len(report), report.critical_path_duration), (0, 0))
+
+    def test_zip(self):
+        zipp = mommy.make('zip.Zip', active=True)
+        first, second, other, after_paused = [
+            mommy.make('action.ActionWebhook', zip=zipp) for _ in range(4)]
+        paused = mommy.make('action.ActionWebhook', zip=zipp, paused=True)
+        outside = mommy.make('action.ActionWebhook')
+        second.depends_on.add(first)
+        other.depends_on.add(outside)
+        after_paused.depends_on.add(paused)
+
+        self.assertEqual(get_dependencies([first, second, other]),
+                         {first.pk: [], second.pk: [first.pk],
+                          other.pk: [outside.pk]})
+
+        with mock.patch('action.models.ActionWebhook.make_it_so',
+                        autospec=True) as make_it_so:
+            make_it_so.return_value = Body(b'{"id": 7}')
+            report = zipp.make_it_so(input={'event': 1})
+
+        calls = dict((call[0][0].pk, call[1]) for call in
+                     make_it_so.call_args_list)
+        self.assertEqual(calls, {first.pk: {'input': {'event': 1}},
+                                 second.pk: {'input': {'id': 7}}})
+        # Dependencies that don't run are unmet, not ignored.
+        self.assertEqual(sorted(r.action.pk for r in report.failed),
+                         [other.pk, after_paused.pk])
+        for result in report.failed:
+            self.assertIsInstance(result.error, DependencyFailed)
+            self.assertIn('not part of this run', str(result.error))
+
+    def test_zip_mappings(self):
+        zipp = mommy.make('zip.Zip', active=True)
+        with StandInServer(echo=True) as server:
+            def hook(**data):
+                return mommy.make(
+                    'action.ActionWebhook', zip=zipp, hook_type='post',
+                    data={'url': server.url, 'payloadType': 'json',
+                          'data': [{'key': key, 'value': value}
+                                   for key, value in data.items()]})
+            first = hook(id='a')
+            second = hook(id='b')
+            last = hook(fromA='{{{{trigger.{0}.id}}}}'.format(first.pk),
+                        fromB='{{{{trigger.{0}.id}}}}'.format(second.pk))
+            last.depends_on.add(first, second)
+
+            with mock.patch('action.retry.breaker', retry.CircuitBreaker()):
+                report = zipp.make_it_so()
+
+        results = dict((result.action.pk, result) for result in report)
+        self.assertEqual(results[last.pk].result.json(),
+                         {'fromA': 'a', 'fromB': 'b'})
+
+
+class DependencyCycleTest(TestCase):
+
+    def setUp(self):
+        zipp = mommy.make('zip.Zip')
+        self.first, self.second, self.third = [
+            mommy.make('action.ActionWebhook', zip=zipp) for _ in range(3)]
+        self.second.depends_on.add(self.first)
+        self.third.depends_on.add(self.second)
+
+    def test_rejected_when_saved(self):
+        for add in (lambda: self.first.depends_on.add(self.third),
+                    lambda: self.third.dependents.add(self.first),
+                    lambda: self.first.depends_on.add(self.first)):
+            with self.assertRaises(ValidationError), transaction.atomic():
+                add()
+
+        self.assertEqual(list(self.first.depends_on.all()), [])
+        self.first.dependents.add(self.third)
+        self.assertEqual(ActionWebhook.dependencies_of([self.third.pk]),
+                         {self.first.pk, self.second.pk})
+
+    def test_admin_form(self):
+        form_class = modelform_factory(ActionWebhook, ActionWebhookForm,
+                                       fields=('depends_on',))
+        form = form_class(instance=self.first,
+                          data={'depends_on': [self.third.pk]})
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('cycle', str(form.errors['depends_on']))
@@ -0,0 +1,115 @@
+from django.test import TestCase, override_settings
+from unittest import mock
+
+import action.http as http
+from action.http import SessionManager, get_host
+
+
+class GetHostTest(TestCase):
+
+    def test_get_host(self):
+        self.assertEqual(get_host('https://Example.com:8443/a/b?c=d'),
+                         'https://example.com:8443')
+
+    def test_get_host_nothing(self):
+        self.assertEqual(get_host(None), '://')
+
+
+class SessionManagerTest(TestCase):
+
+    def setUp(self):
+        self.manager = SessionManager(pool_connections=2, pool_maxsize=3,
+                                      idle_timeout=60, max_hosts=2)
+
+    def tearDown(self):
+        self.manager.close()
+
+    def test_new_session(self):
+        session = self.manager.new_session()
+        adapter = session.get_adapter('https://example.com')
+
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertFalse(session.cookies._policy.allowed_domains())
+
+    @override_settings(ACTION_HTTP_POOL_MAXSIZE=42)
+    def test_settings_defaults(self):
+        manager = SessionManager()
+        self.assertEqual(manager.pool_maxsize, 42)
+
+    def test_get_session_reuses_per_host(self):
+        first = self.manager.get_session('http://example.com/one')
+        second = self.manager.get_session('http://example.com/two?x=1')
+        other = self.manager.get_session('http://other.com/one')
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(self.manager.sessions_created, 2)
+
+    def test_get_session_max_hosts(self):
+        first = self.manager.get_session('http://one.com')
+        self.manager.get_session('http://two.com')
+        self.manager.get_session('http://three.com')
+
+        self.assertEqual(self.manager.stats()['hosts'], 2)
+        self.assertEqual(self.manager.sessions_evicted, 1)
+        self.assertIsNot(self.manager.get_session('http://one.com'), first)
+
+    @mock.patch('action.http.time.monotonic')
+    def test_get_session_idle_eviction(self, monotonic):
+        monotonic.return_value = 100
+        first = self.manager.get_session('http://example.com')
+
+        monotonic.return_value = 159
+        self.assertIs(self.manager.get_session('http://example.com'), first)
+
+        monotonic.return_value = 220
+        self.assertIsNot(self.manager.get_session('http://example.com'),
+                         first)
+        self.assertEqual(self.manager.sessions_evicted, 1)
+
+    def test_request(self):
+        session = self.manager.get_session('http://example.com')
+
+        with mock.patch.object(session, 'request') as session_request:
+            session_request.return_value = 'response'
+            result = self.manager.request('post', 'http://example.com/x',
+                                          data='data', timeout=30)
+
+        session_request.assert_called_once_with(
+            'post', 'http://example.com/x', data='data', timeout=30)
+        self.assertEqual(result, 'response')
+
+    def test_stats(self):
+        session = self.manager.get_session('http://example.com')
+        pool = session.get_adapter('http://example.com').poolmanager\
+            .connection_from_url('http://example.com')
+        pool.num_requests = 10
+        pool.num_connections = 2
+
+        stats = self.manager.stats()
+
+        self.assertEqual(stats['requests'], 10)
+        self.assertEqual(stats['pool_hits'], 8)
+        self.assertEqual(stats['pool_misses'], 2)
+
+        # Counters survive the session being closed.
+        self.manager.close()
+        stats = self.manager.stats()
+
+        self.assertEqual(stats['hosts'], 0)
+        self.assertEqual(stats['pool_hits'], 8)
+        self.assertEqual(stats['pool_misses'], 2)
+
+
+class ModuleTest(TestCase):
+
+    @mock.patch('action.http.get_manager')
+    def test_verbs(self, get_manager):
+        for verb in ('get', 'post', 'put'):
+            getattr(http, verb)('http://example.com', timeout=30)
+            get_manager.return_value.request.assert_called_with(
+                verb, 'http://example.com', timeout=30)
+
+    def test_get_manager_shared(self):
+        self.assertIs(http.get_manager(), http.get_manager())
@@ -0,0 +1,187 @@
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+from unittest import mock
+
+import action.httpcache as httpcache
+import action.plans as plans
+import action.retry as retry
+from action.httpcache import Entry, HTTPCache, freshness
+from action.models import ActionWebhook
+from action.responses import Body, ResponseError
+from action.test.utils import run
+from benchmarks.server import StandInServer
+
+
+class Response(object):
+
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FreshnessTest(SimpleTestCase):
+
+    def test_freshness(self):
+        now = 1000.0
+
+        self.assertEqual(freshness({'Cache-Control': 'max-age=60'}, now),
+                         1060)
+        self.assertEqual(freshness({'Cache-Control': 'public, max-age=60',
+                                    'Age': '10'}, now), 1050)
+        self.assertIsNone(freshness({'Cache-Control': 'no-store'}, now))
+        self.assertEqual(freshness({'Cache-Control': 'no-cache'}, now), now)
+        self.assertEqual(freshness({}, now), now)
+        self.assertEqual(freshness({
+            'Date': 'Sun, 06 Nov 1994 08:49:37 GMT',
+            'Expires': 'Sun, 06 Nov 1994 08:50:37 GMT'}, now), 1060)
+        self.assertEqual(freshness({'Expires': '0'}, now), now)
+        # max-age wins over Expires.
+        self.assertEqual(freshness({
+            'Cache-Control': 'max-age=5',
+            'Expires': 'Sun, 06 Nov 1994 08:50:37 GMT'}, now), 1005)
+
+
+class HTTPCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = HTTPCache(max_size=100)
+        self.sent = []
+
+    def send(self, status_code=200, content=b'{"n": 1}', **headers):
+        def send(request_headers):
+            self.sent.append(request_headers)
+            return (Response(status_code, headers),
+                    Body(content, status_code=status_code))
+        return send
+
+    def test_fresh_hit(self):
+        send = self.send(**{'Cache-Control': 'max-age=60'})
+
+        first = self.cache.fetch('http://a/', {'X-A': '1'}, send)
+        second = self.cache.fetch('http://a/', {'X-A': '1'}, send)
+        self.cache.fetch('http://a/', {'X-A': '2'}, send)
+
+        self.assertEqual(second.json(), {'n': 1})
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(len(self.sent), 2)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stored']),
+                         (1, 2, 2))
+
+    def test_revalidate(self):
+        self.cache.fetch('http://a/', {}, self.send(
+            ETag='"v1"', **{'Cache-Control': 'no-cache'}))
+
+        body = self.cache.fetch('http://a/', {}, self.send(
+            304, b'', **{'Cache-Control': 'max-age=60'}))
+
+        self.assertEqual(self.sent[1]['If-None-Match'], '"v1"')
+        self.assertEqual(body.content, b'{"n": 1}')
+        self.assertEqual(self.cache.stats()['revalidated'], 1)
+        # Fresh for a minute now.
+        self.cache.fetch('http://a/', {}, self.send())
+        self.assertEqual(len(self.sent), 2)
+
+    def test_changed(self):
+        self.cache.fetch('http://a/', {}, self.send(
+            **{'Last-Modified': 'Sun, 06 Nov 1994 08:49:37 GMT'}))
+
+        body = self.cache.fetch('http://a/', {}, self.send(
+            content=b'{"n": 2}',
+            **{'Last-Modified': 'Sun, 06 Nov 1994 09:49:37 GMT'}))
+
+        self.assertEqual(self.sent[1]['If-Modified-Since'],
+                         'Sun, 06 Nov 1994 08:49:37 GMT')
+        self.assertEqual(body.json(), {'n': 2})
+        self.assertEqual(self.cache.stats()['refreshed'], 1)
+
+    def test_uncacheable(self):
+        for send in (self.send(**{'Cache-Control': 'no-store'}),
+                     self.send(),  # no freshness, no validators
+                     self.send(**{'Cache-Control': 'max-age=60',
+                                  'Vary': '*'})):
+            self.cache.fetch('http://a/', {}, send)
+
+        self.assertEqual(self.cache.stats()['uncacheable'], 3)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_errors(self):
+        with self.assertRaises(ResponseError):
+            self.cache.fetch('http://a/', {}, self.send(
+                500, **{'Cache-Control': 'max-age=60'}))
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_lru(self):
+        for n in range(5):
+            self.cache.put(str(n), Entry(b'x' * 30, time.time() + 60))
+
+        self.assertEqual(self.cache.size, 90)
+        self.assertIsNone(self.cache.get('0'))
+        self.assertIsNotNone(self.cache.get('4'))
+        self.assertEqual(self.cache.stats()['evicted'], 2)
+
+    def test_disk_tier(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = HTTPCache(max_size=100, directory=directory, disk_size=100)
+        cache.put('a' * 64, Entry(b'cached', time.time() + 60, '"e"'))
+
+        entry = HTTPCache(max_size=100, directory=directory).get('a' * 64)
+
+        self.assertEqual((entry.content, entry.etag), (b'cached', '"e"'))
+        for n in range(5):
+            cache.put('{0:064d}'.format(n), Entry(b'x' * 40, 0))
+        self.assertLessEqual(sum(size for _, size, _ in cache.disk.files()),
+                             100 + 5 * 60)
+        self.assertLess(len(list(cache.disk.files())), 6)
+
+
+class CachedFireTest(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(plans.cache.clear)
+        patcher = mock.patch('action.httpcache._cache', HTTPCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('action.retry.breaker', retry.CircuitBreaker())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_make_it_so(self):
+        with StandInServer(etag='"v1"',
+                           headers={'Cache-Control': 'no-cache'}) as server:
+            hook = ActionWebhook(hook_type='get',
+                                 data={'url': server.url, 'cache': True})
+            results = [hook.make_it_so() for _ in range(3)]
+
+            self.assertEqual(server.requests, 3)
+            self.assertEqual(server.not_modified, 2)
+        self.assertEqual([result.json() for result in results],
+                         [{'ok': True}] * 3)
+
+    def test_make_it_so_async(self):
+        with StandInServer(headers={'Cache-Control': 'max-age=60'}) as server:
+            hook = ActionWebhook(hook_type='get',
+                                 data={'url': server.url, 'cache': True})
+
+            async def fire():
+                return [await hook.make_it_so_async() for _ in range(3)]
+            results = run(fire())
+
+            self.assertEqual(server.requests, 1)
+        self.assertEqual(results[2].json(), {'ok': True})
+
+    def test_not_enabled(self):
+        with StandInServer(headers={'Cache-Control': 'max-age=60'}) as server:
+            for data in ({'url': server.url},
+                         {'url': server.url, 'cache': False}):
+                hook = ActionWebhook(hook_type='get', data=data)
+                hook.make_it_so()
+                hook.make_it_so()
+            self.assertEqual(server.requests, 4)
+
+        self.assertFalse(httpcache.enabled(ActionWebhook(
+            hook_type='post', data={'url': 'http://a/', 'cache': True})))
@@ -0,0 +1,213 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase, override_settings
+from unittest import mock
+
+import action.idempotency as idempotency
+import action.plans as plans
+import action.retry as retry
+from action.idempotency import Suppressor
+from action.models import ActionWebhook
+from action.streaming import StreamingBody
+from action.test.utils import make_hook, run
+from benchmarks.server import StandInServer
+
+
+@override_settings(ACTION_IDEMPOTENCY_ENABLED=True)
+class KeyTest(SimpleTestCase):
+
+    def hook(self, **data):
+        return make_hook(**dict(
+            {'url': 'http://a/', 'payloadType': 'json',
+             'data': [{'key': 'n', 'value': '1'}]}, **data))
+
+    def key(self, hook):
+        return hook.get_request().headers['Idempotency-Key']
+
+    def test_key(self):
+        key = self.key(self.hook())
+
+        self.assertEqual(len(key), 64)
+        self.assertEqual(self.key(self.hook()), key)
+        self.assertNotEqual(self.key(self.hook(url='http://b/')), key)
+        self.assertNotEqual(
+            self.key(self.hook(data=[{'key': 'n', 'value': '2'}])), key)
+        self.assertNotEqual(self.key(self.hook(headers=[
+            {'key': 'X-A', 'value': '1'}])), key)
+        self.assertNotEqual(self.key(ActionWebhook(
+            pk=2, hook_type='post', data=self.hook().data)), key)
+
+    def test_batch_key(self):
+        hook = self.hook()
+        headers = hook.get_request().headers
+
+        first = idempotency.stamp_batch(hook, headers, b'[1]')
+        second = idempotency.stamp_batch(hook, headers, b'[1, 2]')
+
+        self.assertNotEqual(first['Idempotency-Key'],
+                            second['Idempotency-Key'])
+        self.assertEqual(headers['Idempotency-Key'], self.key(hook))
+
+    def test_disabled(self):
+        with self.settings(ACTION_IDEMPOTENCY_ENABLED=False):
+            self.assertNotIn('Idempotency-Key', self.hook().get_request()
+                             .headers)
+            self.assertIsNone(idempotency.get_key(
+                self.hook().get_request()))
+
+    def test_streamed_body(self):
+        hook = self.hook(streaming=True)
+        plan = hook.get_request()
+        streamed = plan._replace(body=b''.join(plan.body))
+
+        with mock.patch.object(StreamingBody, '__iter__', autospec=True,
+                               side_effect=StreamingBody.__iter__) as chunks:
+            key = idempotency.fingerprint(hook, plan)
+
+        # Read chunk by chunk, and the same key as the whole body's.
+        chunks.assert_called_once_with(plan.body)
+        self.assertEqual(key, idempotency.fingerprint(hook, streamed))
+
+
+class SuppressorTest(SimpleTestCase):
+
+    def setUp(self):
+        self.suppressor = Suppressor(max_keys=3)
+
+    def test_window(self):
+        future, owner = self.suppressor.claim('a')
+        self.assertTrue(owner)
+        self.assertEqual(self.suppressor.claim('a'), (future, False))
+
+        self.suppressor.done('a', future, 60, 'result')
+
+        again, owner = self.suppressor.claim('a')
+        self.assertFalse(owner)
+        self.assertEqual(again.result(), 'result')
+        self.assertEqual(self.suppressor.stats(), {
+            'keys': 1, 'fired': 1, 'shared': 1, 'suppressed': 1})
+
+    def test_expired(self):
+        future, _ = self.suppressor.claim('a')
+        self.suppressor.done('a', future, 0, 'result')
+
+        _, owner = self.suppressor.claim('a')
+
+        self.assertTrue(owner)
+
+    def test_failures_are_forgotten(self):
+        future, _ = self.suppressor.claim('a')
+        self.suppressor.done('a', future, 60, error=ValueError('nope'))
+
+        self.assertRaises(ValueError, future.result)
+        self.assertTrue(self.suppressor.claim('a')[1])
+
+    def test_bounded(self):
+        for key in 'abcde':
+            future, _ = self.suppressor.claim(key)
+            self.suppressor.done(key, future, 60)
+
+        self.assertEqual(len(self.suppressor), 3)
+        self.assertTrue(self.suppressor.claim('a')[1])
+        self.assertFalse(self.suppressor.claim('e')[1])
+
+
+@override_settings(ACTION_IDEMPOTENCY_ENABLED=True)
+class SuppressedFireTest(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(plans.cache.clear)
+        for target, value in (('action.idempotency.suppressor', Suppressor()),
+                              ('action.retry.breaker',
+                               retry.CircuitBreaker())):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def hook(self, url, **data):
+        return ActionWebhook(hook_type='post', data=dict(
+            {'url': url, 'payloadType': 'json',
+             'data': [{'key': 'n', 'value': '1'}]}, **data))
+
+    def test_make_it_so(self):
+        with StandInServer(echo=True) as server:
+            hook = self.hook(server.url)
+            results = [hook.make_it_so() for _ in range(3)]
+
+            self.assertEqual(server.requests, 1)
+        self.assertEqual([result.json() for result in results],
+                         [{'n': '1'}] * 3)
+        self.assertEqual(idempotency.suppressor.suppressed, 2)
+
+    def test_concurrent(self):
+        with StandInServer(latency=0.2) as server:
+            hook = self.hook(server.url)
+            with ThreadPoolExecutor(4) as executor:
+                results = list(executor.map(
+                    lambda _: hook.make_it_so(), range(4)))
+
+            self.assertEqual(server.requests, 1)
+        # One response, a body of its own for each caller.
+        self.assertEqual(len(set(map(id, results))), 4)
+        self.assertEqual(len(set(result.content for result in results)), 1)
+        self.assertEqual(idempotency.suppressor.shared, 3)
+
+    @override_settings(ACTION_RESPONSE_SPILL_SIZE=10)
+    def test_closing_a_shared_body(self):
+        with StandInServer(body=b'{"padding": "' + b'x' * 100 + b'"}') \
+                as server:
+            hook = self.hook(server.url)
+            first = hook.make_it_so()
+            # Closed by its caller, like dispatch jobs do.
+            with first:
+                self.assertTrue(first.spilled)
+            second = hook.make_it_so()
+            third = hook.make_it_so()
+
+            self.assertEqual(server.requests, 1)
+        second.close()
+        self.assertEqual(len(third.json()['padding']), 100)
+
+    def test_make_it_so_async(self):
+        with StandInServer(latency=0.1) as server:
+            hook = self.hook(server.url)
+
+            async def fire():
+                return await asyncio.gather(
+                    *[hook.make_it_so_async() for _ in range(3)])
+            results = run(fire())
+
+            self.assertEqual(server.requests, 1)
+        self.assertEqual(results[2].json(), {'ok': True})
+
+    def test_rendered_once(self):
+        with StandInServer() as server:
+            hook = ActionWebhook(hook_type='post', data={
+                'url': server.url, 'payloadType': 'json',
+                'data': [{'key': 'n', 'value': '{{trigger.n}}'}]})
+            with mock.patch.object(
+                    ActionWebhook, 'render_request', autospec=True,
+                    side_effect=ActionWebhook.render_request) as render:
+                hook.make_it_so(input={'n': 1})
+                hook.make_it_so(input={'n': 2})
+
+            self.assertEqual(render.call_count, 2)
+            self.assertEqual(server.requests, 2)
+
+    def test_no_window(self):
+        with StandInServer() as server:
+            hook = self.hook(server.url, dedupeWindow=0)
+            hook.make_it_so()
+            hook.make_it_so()
+
+            self.assertEqual(server.requests, 2)
+
+    def test_failed_fires_go_again(self):
+        with StandInServer(status=500) as server:
+            hook = self.hook(server.url)
+            for _ in range(2):
+                with self.assertRaises(Exception):
+                    hook.make_it_so()
+
+            self.assertEqual(server.requests, 2)
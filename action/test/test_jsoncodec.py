@@ -0,0 +1,63 @@
+import json
+from collections import OrderedDict
+from unittest import skipUnless
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from unittest import mock
+
+import action.jsoncodec as jsoncodec
+
+
+class RegistryTest(TestCase):
+
+    def test_default(self):
+        self.assertEqual(jsoncodec.available()[0], 'json')
+        self.assertEqual(jsoncodec.get_codec().name, 'json')
+        self.assertEqual(jsoncodec.dumps({'a': 1}), json.dumps({'a': 1}))
+        self.assertEqual(jsoncodec.loads(b'{"a": 1}'), {'a': 1})
+        self.assertEqual(jsoncodec.loads('{"a": 1}'), {'a': 1})
+
+    def test_register(self):
+        with mock.patch.dict(jsoncodec._codecs):
+            jsoncodec.register('test', lambda obj: 'dumped',
+                               lambda data: 'loaded')
+
+            with override_settings(ACTION_JSON_CODEC='test'):
+                self.assertEqual(jsoncodec.dumps({}), 'dumped')
+                self.assertEqual(jsoncodec.loads(b''), 'loaded')
+
+        self.assertNotIn('test', jsoncodec.available())
+
+    @override_settings(ACTION_JSON_CODEC='nope')
+    def test_unknown(self):
+        with self.assertRaises(ImproperlyConfigured):
+            jsoncodec.dumps({})
+
+
+class CodecsTest(TestCase):
+    # Whatever is installed has to round trip the same and fail the same.
+
+    def test_codecs(self):
+        data = OrderedDict([('key1', 'välue/1'), ('key2', [1, 2.5, None])])
+
+        for name in jsoncodec.available():
+            codec = jsoncodec.get_codec(name)
+
+            encoded = codec.dumps(data)
+            self.assertIsInstance(encoded, str, name)
+            self.assertEqual(json.loads(encoded), data, name)
+            self.assertEqual(codec.loads(encoded.encode('utf-8')), data, name)
+            self.assertEqual(codec.loads(memoryview(encoded.encode('utf-8'))),
+                             data, name)
+
+            for broken in (b'', b'{nope', b'\xff'):
+                with self.assertRaises(ValueError, msg=name):
+                    codec.loads(broken)
+                with self.assertRaises(ValueError, msg=name):
+                    codec.loads(memoryview(broken))
+
+    @skipUnless('orjson' in jsoncodec.available(), 'orjson not installed')
+    def test_orjson(self):
+        with override_settings(ACTION_JSON_CODEC='orjson'):
+            self.assertEqual(jsoncodec.dumps({'a': 1}), '{"a":1}')
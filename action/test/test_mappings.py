@@ -0,0 +1,176 @@
+from urllib.parse import parse_qsl, urlsplit
+
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+
+import action.mappings as mappings
+import action.plans as plans
+import action.retry as retry
+from action.mappings import Mapping, compile_value
+from action.models import ActionWebhook
+from action.responses import Body
+from action.test.utils import make_hook, run
+from benchmarks.server import StandInServer
+
+TRIGGER = {'user': {'email': 'a@example.com', 'age': 30},
+           'items': [{'id': 7}]}
+
+
+class CompileTest(SimpleTestCase):
+
+    def test_constants(self):
+        for value in ('plain', 7, None, '{{ not.ours }}', '{', ''):
+            self.assertIsNone(compile_value(value))
+
+    def test_references(self):
+        for value, expected in (
+                ('{{trigger.user.email}}', 'a@example.com'),
+                ('{{ trigger.user.age }}', 30),
+                ('{{trigger.items.0.id}}', 7),
+                ('{{trigger.user}}', TRIGGER['user']),
+                ('{{trigger}}', TRIGGER),
+                ('{{trigger.missing.deeper}}', None),
+                ('{{trigger.items.9}}', None),
+                ('Hi {{trigger.user.email}} ({{trigger.user.age}})!',
+                 'Hi a@example.com (30)!'),
+                ('[{{trigger.nope}}]', '[]')):
+            self.assertEqual(compile_value(value)(TRIGGER), expected)
+
+    def test_numbered_keys(self):
+        # Several dependencies' outputs, keyed by their pk.
+        outputs = {'12': {'id': 7}, '13': [{'id': 8}]}
+
+        self.assertEqual(compile_value('{{trigger.12.id}}')(outputs), 7)
+        self.assertEqual(compile_value('{{trigger.13.0.id}}')(outputs), 8)
+        self.assertIsNone(compile_value('{{trigger.13.id}}')(outputs))
+        self.assertIsNone(compile_value('{{trigger.14}}')(outputs))
+
+    def test_mapping(self):
+        mapping = Mapping([{'key': 'email', 'value': '{{trigger.user.email}}'},
+                           {'key': 'source', 'value': 'zipier'}])
+
+        self.assertTrue(mapping.uses_input)
+        self.assertEqual(list(mapping.render(TRIGGER).items()),
+                         [('email', 'a@example.com'), ('source', 'zipier')])
+        self.assertFalse(Mapping([{'key': 'a', 'value': 'b'}]).uses_input)
+
+    def test_no_data_sends_the_input(self):
+        mapping = Mapping([])
+
+        self.assertTrue(mapping.uses_input)
+        self.assertEqual(mapping.render(TRIGGER), TRIGGER)
+        self.assertEqual(mapping.render([1, 2]), {'data': [1, 2]})
+
+    def test_as_input(self):
+        self.assertEqual(mappings.as_input(Body(b'{"a": 1}')), {'a': 1})
+        self.assertEqual(mappings.as_input(Body(b'plain')), 'plain')
+        self.assertEqual(mappings.as_input(TRIGGER), TRIGGER)
+
+
+class RequestTest(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(plans.cache.clear)
+        self.addCleanup(mappings.cache.clear)
+
+    def hook(self, hook_type='post', **data):
+        return make_hook(hook_type, loaded=True, **dict(
+            {'url': 'http://a/', 'payloadType': 'json',
+             'data': [{'key': 'email', 'value': '{{trigger.user.email}}'}]},
+            **data))
+
+    def test_compiled_once_per_revision(self):
+        hook = self.hook()
+        with mock.patch('action.mappings.compile_value',
+                        wraps=compile_value) as compiled:
+            bodies = [hook.get_request({'user': {'email': str(n)}}).body
+                      for n in range(3)]
+
+            self.assertEqual(compiled.call_count, 1)
+            hook.modified = timezone.now()
+            hook.get_request(TRIGGER)
+            self.assertEqual(compiled.call_count, 2)
+
+        self.assertEqual(bodies, [b'{"email": "0"}', b'{"email": "1"}',
+                                  b'{"email": "2"}'])
+
+    def test_plan_is_reused(self):
+        hook = self.hook(data=[{'key': 'a', 'value': 'b'}])
+
+        self.assertIs(hook.get_request(TRIGGER), hook.get_request())
+
+    def test_get(self):
+        hook = self.hook('get')
+
+        self.assertEqual(hook.get_request(TRIGGER).url,
+                         'http://a/?email=a%40example.com')
+
+    def test_get_encodes_values(self):
+        hook = self.hook('get', data=[
+            {'key': 'q', 'value': '{{trigger.q}}'},
+            {'key': 'name', 'value': '{{trigger.name}}'}])
+
+        url = hook.get_request({'q': 'a&admin=1 #x', 'name': 'Zoë'}).url
+
+        self.assertEqual(url, 'http://a/?q=a%26admin%3D1+%23x&name=Zo%C3%AB')
+        self.assertEqual(parse_qsl(urlsplit(url).query),
+                         [('q', 'a&admin=1 #x'), ('name', 'Zoë')])
+
+    @override_settings(ACTION_IDEMPOTENCY_ENABLED=True)
+    def test_idempotency_key(self):
+        hook = self.hook()
+
+        keys = set(hook.get_request({'user': {'email': str(n)}})
+                   .headers['Idempotency-Key'] for n in range(2))
+
+        self.assertEqual(len(keys), 2)
+
+    def test_no_input(self):
+        hook = self.hook(data=[{'key': 'email', 'value': '{{trigger.email}}'},
+                               {'key': 'note', 'value': 'to {{trigger.a}}'},
+                               {'key': 'source', 'value': 'zipier'}])
+
+        self.assertEqual(hook.get_request().body,
+                         b'{"email": null, "note": "to ", "source": "zipier"}')
+        self.assertEqual(hook.get_request().body, hook.get_request({}).body)
+        self.assertEqual(self.hook('get').get_request().url,
+                         'http://a/?email=')
+
+    def test_batch_item(self):
+        self.assertEqual(dict(self.hook().get_batch_item(TRIGGER)),
+                         {'email': 'a@example.com'})
+
+
+class MappedFireTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch('action.retry.breaker', retry.CircuitBreaker())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def hook(self, url, data):
+        return ActionWebhook(hook_type='post', data={
+            'url': url, 'payloadType': 'json', 'data': data})
+
+    def test_make_it_so(self):
+        with StandInServer(echo=True) as server:
+            hook = self.hook(server.url, [
+                {'key': 'to', 'value': '{{trigger.user.email}}'},
+                {'key': 'first', 'value': '{{trigger.items.0}}'}])
+
+            result = hook.make_it_so(input=TRIGGER)
+            unmapped = hook.make_it_so()
+
+        self.assertEqual(result.json(), {'to': 'a@example.com',
+                                         'first': {'id': 7}})
+        # No input: references are missing, never sent as template text.
+        self.assertEqual(unmapped.json(), {'to': None, 'first': None})
+
+    def test_make_it_so_async(self):
+        with StandInServer(echo=True) as server:
+            hook = self.hook(server.url, [])
+
+            result = run(hook.make_it_so_async(input=TRIGGER))
+
+        self.assertEqual(result.json(), TRIGGER)
@@ -0,0 +1,119 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from model_mommy import mommy
+from unittest import mock
+
+import action.http as http
+import action.metrics as metrics
+from action.metrics import Counter, Histogram
+from action.test.utils import make_hook
+from benchmarks.server import StandInServer
+
+
+class MetricTest(SimpleTestCase):
+
+    def test_counter(self):
+        counter = Counter('fires_total', 'Fires.', ('host',))
+        counter.inc(('a"b',))
+        counter.inc(('a"b',), 2)
+
+        self.assertEqual(list(counter.render()), [
+            '# HELP fires_total Fires.',
+            '# TYPE fires_total counter',
+            'fires_total{host="a\\"b"} 3'])
+
+    def test_histogram(self):
+        histogram = Histogram('seconds', 'Time.', buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe((), value)
+
+        self.assertEqual(list(histogram.render()), [
+            '# HELP seconds Time.',
+            '# TYPE seconds histogram',
+            'seconds_bucket{le="0.1"} 2',
+            'seconds_bucket{le="1"} 3',
+            'seconds_bucket{le="+Inf"} 4',
+            'seconds_sum 5.65',
+            'seconds_count 4'])
+        self.assertEqual(histogram.get(), (4, 5.65))
+
+
+class InstrumentationTest(SimpleTestCase):
+
+    def setUp(self):
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+
+    def test_disabled(self):
+        self.assertIsNone(metrics.start())
+        self.assertIsNone(metrics.observe('plan', make_hook(), None))
+        metrics.fired(make_hook(), None)
+
+        self.assertNotIn('action_phase_seconds_count', metrics.render())
+
+    @override_settings(ACTION_METRICS_ENABLED=True)
+    def test_observe(self):
+        hook = make_hook(url='http://Example.com/hook', payloadType='json')
+        started = metrics.start()
+
+        next_start = metrics.observe('plan', hook, started)
+
+        self.assertGreaterEqual(next_start, started)
+        self.assertEqual(metrics.phases.get(
+            ('plan', 'post', 'json', 'http://example.com'))[0], 1)
+
+    @override_settings(ACTION_METRICS_ENABLED=True)
+    def test_fired(self):
+        hook = make_hook('get', url='http://Example.com/hook')
+
+        metrics.fired(hook, metrics.start())
+        metrics.fired(hook, metrics.start(), Exception())
+
+        labels = ('get', '', 'http://example.com')
+        self.assertEqual(metrics.fires.get(labels + ('ok',)), 1)
+        self.assertEqual(metrics.fires.get(labels + ('error',)), 1)
+        self.assertEqual(metrics.phases.get(('total',) + labels)[0], 2)
+
+    @override_settings(ACTION_METRICS_ENABLED=True)
+    def test_make_it_so_phases(self):
+        with StandInServer(body=b'{}') as server:
+            hook = make_hook('get', url=server.url)
+            hook.make_it_so()
+            # A pool of its own, so the connection is new and timed.
+            with mock.patch('action.http._manager', http.SessionManager()):
+                hook.make_it_so()
+
+        host = http.get_host(server.url)
+        for phase in ('plan', 'request', 'response', 'total'):
+            self.assertGreaterEqual(
+                metrics.phases.get((phase, 'get', '', host))[0], 2, phase)
+        self.assertGreaterEqual(metrics.connects.get((host,))[0], 1)
+        self.assertEqual(metrics.fires.get(('get', '', host, 'ok')), 2)
+
+
+@override_settings(ACTION_METRICS_ENABLED=True)
+class MetricsViewTest(TestCase):
+
+    @override_settings(ACTION_METRICS_ALLOWED_IPS=('127.0.0.1',))
+    def test_metrics(self):
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        content = response.content.decode('utf-8')
+        self.assertIn('# TYPE action_phase_seconds histogram', content)
+        self.assertIn('action_plan_cache{stat="hits"}', content)
+
+    def test_staff(self):
+        self.client.force_login(mommy.make('auth.User', is_staff=True))
+
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_forbidden(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(mommy.make('auth.User'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(ACTION_METRICS_ENABLED=False,
+                       ACTION_METRICS_ALLOWED_IPS=('127.0.0.1',))
+    def test_disabled(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
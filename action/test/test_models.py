@@ -1,12 +1,13 @@
 import json
-import requests
 
 from dicttoxml import dicttoxml
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from model_mommy import mommy
 from unittest import mock
 
 from action.models import ActionWebhook
+from action.schemas import thaw
+from action.streaming import StreamingBody
 
 
 class ActionWebhookTest(TestCase):
@@ -17,11 +18,16 @@ class ActionWebhookTest(TestCase):
 
     def test_get_schema_base(self):
         webhook = mommy.make('action.ActionWebhook')
-        webhook.BASE_SCHEMA = {'test': 'schema'}
 
         schema = webhook.get_schema(None)
 
         self.assertEqual(schema, webhook.BASE_SCHEMA)
+        self.assertEqual(webhook.get_schema('unknown'), webhook.BASE_SCHEMA)
+
+    def test_build_schema_base(self):
+        schema = ActionWebhook.build_schema(None, {'test': 'schema'})
+
+        self.assertEqual(schema, {'test': 'schema'})
 
     def test_get_schema_get(self):
         webhook = mommy.make('action.ActionWebhook')
@@ -31,26 +37,55 @@ class ActionWebhookTest(TestCase):
         self.assertEqual(schema['title'], 'Webhook GET')
         self.assertEqual(schema['description'],
                          'Set up Webhooks by Zipier GET')
-        self.assertIsNone(schema.get('payloadType'))
+        self.assertIsNone(schema['properties'].get('payloadType'))
         self.assertEqual(schema['properties']['data']['title'],
                          'Query String Params')
         # I know, I'm being lazy here but time == money
         self.assertTrue('URL-encoded' in (
             schema['properties']['data']['description']))
 
-    def test_get_schema_get_skip_inside_ifs_lazy(self):
-        webhook = mommy.make('action.ActionWebhook')
-        webhook.BASE_SCHEMA = {
+    def test_build_schema_get_skip_inside_ifs_lazy(self):
+        base = {
             'title': 'schema',
             'description': 'foobar',
             'properties': {}
         }
 
-        schema = webhook.get_schema(webhook.HOOK_GET)
+        schema = ActionWebhook.build_schema(ActionWebhook.HOOK_GET, base)
 
         self.assertEqual(schema['title'], 'Webhook GET')
         self.assertEqual(schema['description'],
                          'Set up Webhooks by Zipier GET')
+        self.assertEqual(base['title'], 'schema')
+
+    def test_get_schema_precomputed(self):
+        webhook = mommy.make('action.ActionWebhook')
+
+        schema = webhook.get_schema(webhook.HOOK_POST)
+
+        self.assertIs(schema, webhook.get_schema(webhook.HOOK_POST))
+        with self.assertRaises(TypeError):
+            schema['title'] = 'Changed'
+        with self.assertRaises(TypeError):
+            del schema['properties']['payloadType']
+
+    def test_get_schema_order_independent(self):
+        webhook = mommy.make('action.ActionWebhook')
+
+        webhook.get_schema(webhook.HOOK_GET)
+        schema = webhook.get_schema(webhook.HOOK_POST)
+
+        self.assertIn('payloadType', schema['properties'])
+        self.assertEqual(schema['properties']['data']['title'], 'Data')
+        self.assertIn('payloadType', webhook.BASE_SCHEMA['properties'])
+
+    def test_get_schema_document(self):
+        document = ActionWebhook.get_schema_document(ActionWebhook.HOOK_PUT)
+
+        self.assertEqual(
+            json.loads(document.content.decode('utf-8')),
+            thaw(ActionWebhook().get_schema(ActionWebhook.HOOK_PUT)))
+        self.assertIsNone(ActionWebhook.get_schema_document('unknown'))
 
     def test_get_schema_post(self):
         webhook = mommy.make('action.ActionWebhook')
@@ -77,45 +112,48 @@ class ActionWebhookTest(TestCase):
 
     @mock.patch.object(ActionWebhook, 'run_get')
     def test_make_it_so_get(self, run_get):
-        webhook = mommy.make('action.ActionWebhook', hook_type='get')
+        webhook = mommy.make('action.ActionWebhook', hook_type='get',
+                             data={'url': 'url'})
 
         return_get = mock.MagicMock()
         run_get.return_value = return_get
 
         result = webhook.make_it_so()
 
-        run_get.assert_called_once_with()
+        run_get.assert_called_once_with(webhook.get_request())
         self.assertEqual(return_get, result)
 
     @mock.patch.object(ActionWebhook, 'run_post')
     def test_make_it_so_post(self, run_post):
-        webhook = mommy.make('action.ActionWebhook', hook_type='post')
+        webhook = mommy.make('action.ActionWebhook', hook_type='post',
+                             data={'url': 'url'})
 
         return_post = mock.MagicMock()
         run_post.return_value = return_post
 
         result = webhook.make_it_so()
 
-        run_post.assert_called_once_with()
+        run_post.assert_called_once_with(webhook.get_request())
         self.assertEqual(return_post, result)
 
     @mock.patch.object(ActionWebhook, 'run_put')
     def test_make_it_so_put(self, run_put):
-        webhook = mommy.make('action.ActionWebhook', hook_type='put')
+        webhook = mommy.make('action.ActionWebhook', hook_type='put',
+                             data={'url': 'url'})
 
         return_put = mock.MagicMock()
         run_put.return_value = return_put
 
         result = webhook.make_it_so()
 
-        run_put.assert_called_once_with()
+        run_put.assert_called_once_with(webhook.get_request())
         self.assertEqual(return_put, result)
 
     # How do you like to test?
     # I can mock everything out.
     @mock.patch.object(ActionWebhook, 'get_headers')
     @mock.patch.object(ActionWebhook, 'get_data')
-    @mock.patch.object(requests, 'post')
+    @mock.patch('action.http.post')
     @mock.patch('action.utils.handle_response')
     def test_run_post(self, handle_response, post, get_data, get_headers):
         data = {'url': 'url'}
@@ -132,14 +170,15 @@ class ActionWebhookTest(TestCase):
         get_headers.assert_called_once_with(
             {'Content-Type': 'multipart/form-data'})
         get_data.assert_called_once_with()
-        post.assert_called_once_with('url', data={}, headers={}, timeout=30)
+        post.assert_called_once_with('url', data=b'', headers={}, timeout=30,
+                                     stream=True)
         handle_response.assert_called_once_with('request_response')
 
         self.assertEqual(result, handle_response.return_value)
 
     @mock.patch.object(ActionWebhook, 'get_headers')
     @mock.patch.object(ActionWebhook, 'get_data')
-    @mock.patch.object(requests, 'post')
+    @mock.patch('action.http.post')
     @mock.patch('action.utils.handle_response')
     def test_run_post_json(self, handle_response, post, get_data, get_headers):
         data = {
@@ -156,7 +195,7 @@ class ActionWebhookTest(TestCase):
 
     @mock.patch.object(ActionWebhook, 'get_headers')
     @mock.patch.object(ActionWebhook, 'get_data')
-    @mock.patch.object(requests, 'post')
+    @mock.patch('action.http.post')
     @mock.patch('action.utils.handle_response')
     def test_run_post_xml(self, handle_response, post, get_data, get_headers):
         data = {
@@ -173,7 +212,7 @@ class ActionWebhookTest(TestCase):
 
     # Or let just important things run through (get_data)
     @mock.patch.object(ActionWebhook, 'get_headers')
-    @mock.patch.object(requests, 'get')
+    @mock.patch('action.http.get')
     @mock.patch('action.utils.handle_response')
     def test_run_get(self, handle_response, get, get_headers):
         data = {
@@ -199,14 +238,14 @@ class ActionWebhookTest(TestCase):
 
         get_headers.assert_called_once_with()
         get.assert_called_once_with('url?key1=value1&key2=value2', headers={},
-                                    timeout=30)
+                                    timeout=30, stream=True)
         handle_response.assert_called_once_with('request_response')
 
         self.assertEqual(result, handle_response.return_value)
 
     @mock.patch.object(ActionWebhook, 'get_headers')
     @mock.patch.object(ActionWebhook, 'get_data')
-    @mock.patch.object(requests, 'put')
+    @mock.patch('action.http.put')
     @mock.patch('action.utils.handle_response')
     def test_run_put(self, handle_response, put, get_data, get_headers):
         data = {'url': 'url'}
@@ -223,14 +262,15 @@ class ActionWebhookTest(TestCase):
         get_headers.assert_called_once_with(
             {'Content-Type': 'multipart/form-data'})
         get_data.assert_called_once_with()
-        put.assert_called_once_with('url', data={}, headers={}, timeout=30)
+        put.assert_called_once_with('url', data=b'', headers={}, timeout=30,
+                                    stream=True)
         handle_response.assert_called_once_with('request_response')
 
         self.assertEqual(result, handle_response.return_value)
 
     @mock.patch.object(ActionWebhook, 'get_headers')
     @mock.patch.object(ActionWebhook, 'get_data')
-    @mock.patch.object(requests, 'put')
+    @mock.patch('action.http.put')
     @mock.patch('action.utils.handle_response')
     def test_run_put_json(self, handle_response, put, get_data, get_headers):
         data = {
@@ -247,7 +287,7 @@ class ActionWebhookTest(TestCase):
 
     @mock.patch.object(ActionWebhook, 'get_headers')
     @mock.patch.object(ActionWebhook, 'get_data')
-    @mock.patch.object(requests, 'put')
+    @mock.patch('action.http.put')
     @mock.patch('action.utils.handle_response')
     def test_run_put_xml(self, handle_response, put, get_data, get_headers):
         data = {
@@ -262,6 +302,81 @@ class ActionWebhookTest(TestCase):
         get_headers.assert_called_once_with(
             {'Content-Type': 'application/xml'})
 
+    def test_get_request_get(self):
+        data = {
+            'url': 'url',
+            'headers': [{'key': 'X-Key', 'value': 'x'}],
+            'data': [{'key': 'key1', 'value': 'value1'}]
+        }
+        webhook = mommy.make('action.ActionWebhook', hook_type='get',
+                             data=data)
+
+        result = webhook.get_request()
+
+        self.assertEqual(result, ('get', 'url?key1=value1', {'X-Key': 'x'},
+                                  None))
+
+    def test_get_request_post(self):
+        data = {
+            'url': 'url',
+            'payloadType': 'json',
+            'data': [{'key': 'key1', 'value': 'value1'}]
+        }
+        webhook = mommy.make('action.ActionWebhook', hook_type='post',
+                             data=data)
+
+        result = webhook.get_request()
+
+        self.assertEqual(result, (
+            'post', 'url', {'Content-Type': 'application/json'},
+            json.dumps({'key1': 'value1'}).encode('utf-8')))
+
+    def test_get_request_post_streaming(self):
+        data = {
+            'url': 'url',
+            'payloadType': 'json',
+            'streaming': True,
+            'data': [{'key': 'key1', 'value': 'value1'}]
+        }
+        webhook = mommy.make('action.ActionWebhook', hook_type='post',
+                             data=data)
+
+        method, url, headers, payload = webhook.get_request()
+
+        self.assertIsInstance(payload, StreamingBody)
+        self.assertEqual(b''.join(payload),
+                         json.dumps({'key1': 'value1'}).encode('utf-8'))
+
+    @override_settings(ACTION_STREAM_THRESHOLD=2)
+    def test_get_request_post_streaming_threshold(self):
+        data = {
+            'url': 'url',
+            'data': [{'key': 'key1', 'value': 'value1'},
+                     {'key': 'key2', 'value': 'value 2'}]
+        }
+        webhook = mommy.make('action.ActionWebhook', hook_type='put',
+                             data=data)
+
+        payload = webhook.get_request().body
+
+        self.assertIsInstance(payload, StreamingBody)
+        self.assertEqual(b''.join(payload), b'key1=value1&key2=value+2')
+
+    @override_settings(ACTION_STREAM_THRESHOLD=1)
+    def test_get_request_post_streaming_off(self):
+        data = {
+            'url': 'url',
+            'payloadType': 'xml',
+            'streaming': False,
+            'data': [{'key': 'key1', 'value': 'value1'}]
+        }
+        webhook = mommy.make('action.ActionWebhook', hook_type='post',
+                             data=data)
+
+        payload = webhook.get_request().body
+
+        self.assertEqual(payload, dicttoxml({'key1': 'value1'}))
+
     @mock.patch('action.utils.build_dict')
     def test_get_data_no_data(self, build_dict):
         data = {}
@@ -382,6 +497,15 @@ class ActionWebhookTest(TestCase):
 
         self.assertEquals(result, {})
 
+    def test_get_headers_default_not_shared(self):
+        data = {'headers': [{'key': 'key1', 'value': 'value1'}]}
+        webhook = mommy.make('action.ActionWebhook', data=data)
+        webhook.get_headers()
+
+        other = mommy.make('action.ActionWebhook', data={})
+
+        self.assertEqual(other.get_headers(), {})
+
     def test_get_headers_results_no_header(self):
         data = {'headers': []}
         webhook = mommy.make('action.ActionWebhook', data=data)
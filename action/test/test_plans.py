@@ -0,0 +1,110 @@
+from collections import OrderedDict
+
+from django.test import TestCase
+from model_mommy import mommy
+from unittest import mock
+
+import action.plans as plans
+from action.models import ActionWebhook
+from action.plans import PlanCache, RequestPlan, encode_body
+
+
+class EncodeBodyTest(TestCase):
+
+    def test_encode_body(self):
+        self.assertIsNone(encode_body(None))
+        self.assertEqual(encode_body(b'<xml/>'), b'<xml/>')
+        self.assertEqual(encode_body('{"a": 1}'), b'{"a": 1}')
+
+    def test_encode_body_form(self):
+        payload = OrderedDict([('key 1', 'välue'), ('key2', 2)])
+        self.assertEqual(encode_body(payload),
+                         b'key+1=v%C3%A4lue&key2=2')
+
+
+class PlanCacheTest(TestCase):
+
+    def test_get_set(self):
+        cache = PlanCache(maxsize=10)
+        cache.set(1, 'rev1', 'plan')
+
+        self.assertEqual(cache.get(1, 'rev1'), 'plan')
+        self.assertIsNone(cache.get(1, 'rev2'))
+        self.assertIsNone(cache.get(2, 'rev1'))
+        self.assertEqual(cache.stats(), {'size': 1, 'hits': 1, 'misses': 2})
+
+    def test_lru(self):
+        cache = PlanCache(maxsize=2)
+        cache.set(1, 'rev', 'one')
+        cache.set(2, 'rev', 'two')
+        cache.get(1, 'rev')
+        cache.set(3, 'rev', 'three')
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(1, 'rev'), 'one')
+        self.assertIsNone(cache.get(2, 'rev'))
+
+    def test_invalidate_clear(self):
+        cache = PlanCache(maxsize=10)
+        cache.set(1, 'rev', 'one')
+        cache.set(2, 'rev', 'two')
+
+        cache.invalidate(1)
+        cache.invalidate(3)
+        self.assertIsNone(cache.get(1, 'rev'))
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class GetPlanTest(TestCase):
+
+    def setUp(self):
+        plans.cache.clear()
+        self.data = {
+            'url': 'http://example.com',
+            'payloadType': 'json',
+            'data': [{'key': 'key1', 'value': 'value1'}]
+        }
+
+    def test_get_plan_cached(self):
+        hook = mommy.make('action.ActionWebhook', hook_type='post',
+                          data=self.data)
+
+        with mock.patch.object(ActionWebhook, 'compile_request',
+                               autospec=True) as compile_request:
+            compile_request.return_value = 'plan'
+            hook.get_request()
+            ActionWebhook.objects.get(pk=hook.pk).get_request()
+
+        compile_request.assert_called_once_with(hook)
+
+    def test_get_plan_unsaved(self):
+        hook = ActionWebhook(pk=1, hook_type='post', data=self.data)
+
+        hook.get_request()
+
+        self.assertEqual(len(plans.cache), 0)
+
+    def test_get_plan_invalidated_on_save(self):
+        hook = mommy.make('action.ActionWebhook', hook_type='post',
+                          data=self.data)
+        self.assertEqual(hook.get_request().body, b'{"key1": "value1"}')
+
+        hook.data['data'][0]['value'] = 'value2'
+        hook.save()
+
+        self.assertEqual(len(plans.cache), 0)
+        plan = ActionWebhook.objects.get(pk=hook.pk).get_request()
+        self.assertEqual(plan, RequestPlan(
+            'post', 'http://example.com',
+            {'Content-Type': 'application/json'}, b'{"key1": "value2"}'))
+
+    def test_get_plan_invalidated_on_delete(self):
+        hook = mommy.make('action.ActionWebhook', hook_type='post',
+                          data=self.data)
+        hook.get_request()
+
+        hook.delete()
+
+        self.assertEqual(len(plans.cache), 0)
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+import action.plans as plans
+from action.models import ActionWebhook
+from action.management.commands.profile_zip import Command as ProfileZip
+from action.profiling import ProfileCommand, StackSampler
+from zip.models import Zip
+
+
+class StackSamplerTest(SimpleTestCase):
+
+    def test_samples_new_threads_only(self):
+        stop = threading.Event()
+        before = threading.Thread(target=stop.wait, daemon=True)
+        before.start()
+        self.addCleanup(stop.set)
+
+        sampler = StackSampler(0.001).start()
+        time.sleep(0.05)
+        sampler.stop()
+
+        self.assertTrue(sampler.stacks)
+        for stack in sampler.stacks:
+            self.assertIn('test_samples_new_threads_only', stack)
+
+        output = StringIO()
+        sampler.write(output)
+        stack, count = output.getvalue().splitlines()[0].rsplit(' ', 1)
+        self.assertEqual(int(count), sampler.stacks[stack])
+
+
+class ProfileCommandTest(TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.zip = Zip.objects.create(title='Profiled', active=True)
+        self.hook = ActionWebhook.objects.create(
+            zip=self.zip, hook_type='post',
+            data={'url': 'http://127.0.0.1:1/', 'payloadType': 'json',
+                  'data': [{'key': 'a', 'value': '1'}]})
+        self.addCleanup(plans.cache.clear)
+
+    def assertReports(self, prefix):
+        for suffix in ('.prof', '-cpu.txt', '-memory.txt', '-stacks.txt'):
+            self.assertTrue(os.path.exists(
+                os.path.join(self.output_dir, prefix + suffix)))
+
+    def test_profile_action(self):
+        out = StringIO()
+
+        call_command('profile_action', self.hook.pk, '--runs', '3',
+                     '--output-dir', self.output_dir, stdout=out)
+
+        self.assertIn('3 fires, 0 failed', out.getvalue())
+        self.assertReports('action-{0}'.format(self.hook.pk))
+        # The echo server's URL is never saved.
+        self.hook.refresh_from_db()
+        self.assertEqual(self.hook.data['url'], 'http://127.0.0.1:1/')
+
+    def test_profile_zip(self):
+        out = StringIO()
+
+        call_command('profile_zip', self.zip.pk, '--runs', '2',
+                     '--output-dir', self.output_dir, stdout=out)
+
+        self.assertIn('2 fires, 0 failed', out.getvalue())
+        self.assertReports('zip-{0}'.format(self.zip.pk))
+
+    def test_profile_zip_skips_paused(self):
+        ActionWebhook.objects.create(
+            zip=self.zip, hook_type='post', paused=True,
+            data={'url': 'http://127.0.0.1:1/', 'payloadType': 'json'})
+
+        _, hooks = ProfileZip().get_fire(self.zip.pk)
+
+        self.assertEqual([hook.pk for hook in hooks], [self.hook.pk])
+
+    def test_get_fire_required(self):
+        class Command(ProfileCommand):
+            name = 'nothing'
+
+        with self.assertRaises(TypeError):
+            Command()
+
+    def test_profile_live(self):
+        out = StringIO()
+
+        call_command('profile_action', self.hook.pk, '--runs', '1', '--live',
+                     '--output-dir', self.output_dir, stdout=out)
+
+        # Nothing listens on the real URL.
+        self.assertIn('1 fires, 1 failed', out.getvalue())
+
+    def test_profile_missing(self):
+        with self.assertRaises(CommandError):
+            call_command('profile_action', 0, '--runs', '1')
+        self.zip.active = False
+        self.zip.save()
+        with self.assertRaises(CommandError):
+            call_command('profile_zip', self.zip.pk, '--runs', '1')
@@ -0,0 +1,65 @@
+from django.test import TestCase
+from model_mommy import mommy
+
+from action.models import ActionWebhook
+
+
+class ActionWebhookQuerySetTest(TestCase):
+
+    def make(self, url='http://example.com/', hook_type='post', **data):
+        data['url'] = url
+        return mommy.make('action.ActionWebhook', hook_type=hook_type,
+                          data=data)
+
+    def test_for_host(self):
+        hooks = [
+            self.make('http://example.com/hook'),
+            self.make('https://EXAMPLE.com:8443/'),
+            self.make('http://user:pw@example.com'),
+            self.make('http://example.com?a=1'),
+        ]
+        self.make('http://sub.example.com/')
+        self.make('http://example.community/')
+        self.make('http://other.com/example.com')
+
+        found = ActionWebhook.objects.for_host('Example.com')
+
+        self.assertEqual(sorted(hook.pk for hook in found),
+                         [hook.pk for hook in hooks])
+
+    def test_with_payload_type(self):
+        xml = self.make(payloadType='xml')
+        json = self.make(hook_type='put', payloadType='json')
+        form = self.make(payloadType='form')
+        unset = self.make()
+        self.make(hook_type='get')
+
+        def pks(payload_type):
+            return sorted(hook.pk for hook in
+                          ActionWebhook.objects.with_payload_type(
+                              payload_type))
+
+        self.assertEqual(pks('xml'), [xml.pk])
+        self.assertEqual(pks('json'), [json.pk])
+        self.assertEqual(pks('form'), [form.pk, unset.pk])
+
+    def test_pause_resume(self):
+        down = self.make('http://down.com/')
+        self.make('http://up.com/')
+
+        self.assertEqual(ActionWebhook.objects.for_host('down.com').pause(),
+                         1)
+        down.refresh_from_db()
+        self.assertTrue(down.paused)
+        self.assertEqual(ActionWebhook.objects.filter(paused=True).count(), 1)
+
+        ActionWebhook.objects.for_host('down.com').resume()
+        down.refresh_from_db()
+        self.assertFalse(down.paused)
+
+    def test_running(self):
+        hook = mommy.make('action.ActionWebhook', zip__active=True)
+        mommy.make('action.ActionWebhook', zip__active=True, paused=True)
+        mommy.make('action.ActionWebhook', zip__active=False)
+
+        self.assertEqual(list(ActionWebhook.objects.running()), [hook])
@@ -0,0 +1,201 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from model_mommy import mommy
+from unittest import mock
+
+import action.ratelimit as ratelimit
+from action.models import ActionWebhook, RateLimitBucket
+from action.ratelimit import (
+    DatabaseBackend,
+    Limit,
+    LocalBackend,
+    RateLimiter,
+    parse_limit,
+    take)
+from action.test.utils import run
+from zip.models import Zip
+
+
+class LimitTest(SimpleTestCase):
+
+    def test_parse_limit(self):
+        self.assertIsNone(parse_limit(None))
+        self.assertEqual(parse_limit(10), Limit(10.0, 10.0))
+        self.assertEqual(parse_limit(0.5), Limit(0.5, 1))
+        self.assertEqual(parse_limit({'rate': 2, 'burst': 5}),
+                         Limit(2.0, 5.0))
+
+    def test_take(self):
+        limit = Limit(2, 4)
+
+        self.assertEqual(take(4, 0, 0, limit), (3, 0))
+        # Refilled at 2 a second, never past the burst.
+        self.assertEqual(take(0, 0, 1, limit), (1, 0))
+        self.assertEqual(take(0, 0, 10, limit), (3, 0))
+        # Taken ahead of time.
+        self.assertEqual(take(0, 0, 0, limit), (-1, 0.5))
+        self.assertEqual(take(-1, 0, 0, limit), (-2, 1))
+
+
+class LocalBackendTest(SimpleTestCase):
+
+    @mock.patch('action.ratelimit.time.monotonic', return_value=100)
+    def test_reserve(self, monotonic):
+        backend = LocalBackend()
+        limit = Limit(10, 2)
+
+        waits = [backend.reserve('host', limit) for _ in range(4)]
+
+        self.assertEqual(waits, [0, 0, 0.1, 0.2])
+        self.assertEqual(backend.reserve('other', limit), 0)
+
+    def test_max_buckets(self):
+        backend = LocalBackend(max_buckets=1)
+        limit = Limit(1, 1)
+        backend.reserve('a', limit)
+        backend.reserve('b', limit)
+
+        # "a" was forgotten, so it is full again.
+        self.assertEqual(backend.reserve('a', limit), 0)
+
+
+class DatabaseBackendTest(TestCase):
+
+    @mock.patch('action.ratelimit.time.time', return_value=1000)
+    def test_reserve(self, time):
+        backend = DatabaseBackend()
+        limit = Limit(10, 2)
+
+        waits = [backend.reserve('host', limit) for _ in range(4)]
+
+        self.assertEqual(waits, [0, 0, 0.1, 0.2])
+        bucket = RateLimitBucket.objects.get(key='host')
+        self.assertEqual(bucket.tokens, -2)
+        self.assertEqual(bucket.updated, 1000)
+
+        time.return_value = 1001
+        self.assertEqual(backend.reserve('host', limit), 0)
+
+
+@override_settings(ACTION_RATE_LIMIT_BACKEND='local',
+                   ACTION_RATE_LIMITS={'http://limited.com': 5},
+                   ACTION_RATE_LIMIT_DEFAULT=None)
+class RateLimiterTest(TestCase):
+
+    def setUp(self):
+        self.limiter = RateLimiter()
+        patcher = mock.patch('action.ratelimit.limiter', self.limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_hook(self, url, rate_limit=None):
+        zipp = mommy.make('zip.Zip', rate_limit=rate_limit)
+        return mommy.make('action.ActionWebhook', zip=zipp, hook_type='post',
+                          data={'url': url})
+
+    def test_get_limits(self):
+        hook = self.make_hook('http://LIMITED.com/path', rate_limit=2)
+
+        self.assertEqual(self.limiter.get_limits(hook), [
+            ('http://limited.com', Limit(5.0, 5.0)),
+            ('http://limited.com zip:{0}'.format(hook.zip_id),
+             Limit(2.0, 2.0))])
+
+    def test_get_limits_none(self):
+        hook = self.make_hook('http://example.com')
+
+        self.assertEqual(self.limiter.get_limits(hook), [])
+
+    @override_settings(ACTION_RATE_LIMIT_DEFAULT=1)
+    def test_get_limits_default(self):
+        hook = ActionWebhook(data={'url': 'http://example.com'})
+
+        self.assertEqual(self.limiter.get_limits(hook), [
+            ('http://example.com', Limit(1.0, 1.0))])
+
+    @override_settings(ACTION_RATE_LIMIT_BACKEND='nope')
+    def test_unknown_backend(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.limiter.backend
+
+    @mock.patch('action.ratelimit.time.sleep')
+    def test_throttle(self, sleep):
+        hook = self.make_hook('http://example.com', rate_limit=1)
+
+        self.assertEqual(ratelimit.throttle(hook), 0)
+        wait = ratelimit.throttle(hook)
+
+        self.assertGreater(wait, 0.9)
+        sleep.assert_called_once_with(wait)
+        self.assertEqual(self.limiter.stats(), {
+            'reservations': 2, 'delayed': 1, 'wait_seconds': wait})
+
+    @mock.patch('action.ratelimit.time.sleep')
+    def test_throttle_unlimited(self, sleep):
+        hook = self.make_hook('http://example.com')
+
+        self.assertEqual(ratelimit.throttle(hook), 0)
+        sleep.assert_not_called()
+        self.assertEqual(self.limiter.stats()['reservations'], 0)
+
+    @mock.patch('action.http.post')
+    @mock.patch('action.utils.handle_response')
+    def test_runners_throttle(self, handle_response, post):
+        hook = self.make_hook('http://limited.com')
+
+        with mock.patch('action.ratelimit.throttle') as throttle:
+            hook.make_it_so()
+
+        throttle.assert_called_once_with(hook)
+
+    def test_zip_limits_cached(self):
+        hook = self.make_hook('http://example.com', rate_limit=2)
+        limits = [('http://example.com zip:{0}'.format(hook.zip_id),
+                   Limit(2.0, 2.0))]
+        self.assertEqual(self.limiter.get_limits(
+            ActionWebhook.objects.get(pk=hook.pk)), limits)
+        fresh = ActionWebhook.objects.get(pk=hook.pk)
+
+        # Read once for every Zip, not loaded for every hook.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.limiter.get_limits(fresh), limits)
+
+        hook.zip.rate_limit = None
+        hook.zip.save()
+        self.assertEqual(self.limiter.get_limits(fresh), [])
+
+    @override_settings(ACTION_RATE_LIMIT_ZIP_TTL=0)
+    def test_zip_limits_expire(self):
+        hook = ActionWebhook.objects.get(
+            pk=self.make_hook('http://example.com').pk)
+        self.assertEqual(self.limiter.get_limits(hook), [])
+        Zip.objects.filter(pk=hook.zip_id).update(rate_limit=3)
+
+        self.assertEqual(self.limiter.get_limits(hook), [
+            ('http://example.com zip:{0}'.format(hook.zip_id),
+             Limit(3.0, 3.0))])
+
+    @override_settings(ACTION_RATE_LIMITS={})
+    def test_athrottle_unlimited(self):
+        hook = ActionWebhook(data={'url': 'http://example.com'})
+        with mock.patch('asyncio.BaseEventLoop.run_in_executor') as executor:
+            wait = run(ratelimit.athrottle(hook))
+
+        self.assertEqual(wait, 0)
+        executor.assert_not_called()
+
+    def test_athrottle_closes_connections(self):
+        hook = self.make_hook('http://example.com', rate_limit=1)
+
+        async def no_sleep(*args):
+            pass
+
+        with mock.patch('action.executor.connection') as connection, \
+                mock.patch('action.ratelimit.asyncio.sleep',
+                           side_effect=no_sleep):
+            waits = [run(ratelimit.athrottle(hook)) for _ in range(2)]
+
+        self.assertEqual(waits[0], 0)
+        self.assertGreater(waits[1], 0.9)
+        # A reservation per fire, each on an executor thread.
+        self.assertEqual(connection.close.call_count, 2)
@@ -0,0 +1,152 @@
+from django.test import SimpleTestCase, override_settings
+from unittest import mock
+
+from action.responses import (
+    Body,
+    BodyWriter,
+    ResponseError,
+    ResponseTooLarge,
+    read)
+
+
+def make_response(status_code, chunks, headers=None):
+    response = mock.Mock(status_code=status_code, headers=headers or {})
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+
+class BodyTest(SimpleTestCase):
+
+    def test_json_cached(self):
+        body = Body(b'{"a": 1}')
+
+        with mock.patch('action.jsoncodec.loads') as loads:
+            loads.return_value = {'a': 1}
+            self.assertEqual(body.json(), {'a': 1})
+            self.assertEqual(body.json(), {'a': 1})
+
+        loads.assert_called_once_with(b'{"a": 1}')
+
+    def test_json_error_cached(self):
+        body = Body(b'nope')
+
+        with self.assertRaises(ValueError):
+            body.json()
+        with mock.patch('action.jsoncodec.loads') as loads, \
+                self.assertRaises(ValueError):
+            body.json()
+
+        loads.assert_not_called()
+
+    def test_value(self):
+        self.assertEqual(Body(b'[1]').value(), [1])
+
+        with mock.patch('action.responses.logger') as test_logger:
+            self.assertEqual(Body(b'nope').value(), b'nope')
+
+        self.assertTrue(test_logger.error.called)
+
+
+@override_settings(ACTION_RESPONSE_MAX_SIZE=100, ACTION_RESPONSE_SPILL_SIZE=10,
+                   ACTION_RESPONSE_ERROR_SIZE=5)
+class BodyWriterTest(SimpleTestCase):
+
+    def test_in_memory(self):
+        writer = BodyWriter(200)
+        writer.write(b'12345')
+        writer.write(b'67890')
+
+        body = writer.finish()
+
+        self.assertFalse(body.spilled)
+        self.assertEqual(body.content, b'1234567890')
+        self.assertEqual(len(body), 10)
+
+    def test_spilled(self):
+        writer = BodyWriter(200)
+        writer.write(b'{"a": ')
+        writer.write(b'"0123456789"}')
+
+        with writer.finish() as body:
+            self.assertTrue(body.spilled)
+            self.assertEqual(len(body), 19)
+            # Read from the mapping, never copied whole.
+            with mock.patch.object(Body, 'content', property(
+                    mock.Mock(side_effect=AssertionError('copied')))):
+                self.assertEqual(body.json(), {'a': '0123456789'})
+                with body.view() as view:
+                    self.assertEqual(view[:6], b'{"a": ')
+                self.assertEqual(list(body.chunks(8)),
+                                 [b'{"a": "0', b'12345678', b'9"}'])
+            self.assertEqual(body.content, b'{"a": "0123456789"}')
+
+        self.assertFalse(body.spilled)
+
+    def test_shared(self):
+        writer = BodyWriter(200)
+        writer.write(b'{"a": "0123456789"}')
+        body = writer.finish()
+        shared = body.share()
+
+        body.close()
+
+        self.assertFalse(body.spilled)
+        self.assertTrue(shared.spilled)
+        self.assertEqual(shared.json(), {'a': '0123456789'})
+        mapped = shared._mapped
+        shared.close()
+        self.assertTrue(mapped.closed)
+        self.assertEqual(Body(b'1').share().content, b'1')
+
+    def test_too_large(self):
+        writer = BodyWriter(200)
+        writer.write(b'x' * 60)
+
+        with self.assertRaises(ResponseTooLarge) as context:
+            writer.write(b'y' * 60)
+
+        self.assertEqual(context.exception.content, b'xxxxx')
+        self.assertEqual(context.exception.status_code, 200)
+        self.assertTrue(context.exception.truncated)
+
+    def test_too_large_content_length(self):
+        with self.assertRaises(ResponseTooLarge):
+            BodyWriter(200, length='101')
+
+    def test_error_truncated(self):
+        writer = BodyWriter(502)
+
+        self.assertFalse(writer.write(b'bad gateway'))
+
+        body = writer.finish()
+        self.assertEqual(body.content, b'bad g')
+        self.assertTrue(body.truncated)
+
+
+@override_settings(ACTION_RESPONSE_MAX_SIZE=100, ACTION_RESPONSE_ERROR_SIZE=5)
+class ReadTest(SimpleTestCase):
+
+    def test_read(self):
+        response = make_response(200, [b'{"a": ', b'1}'])
+
+        self.assertEqual(read(response).json(), {'a': 1})
+        response.close.assert_called_once_with()
+
+    def test_read_stops_early(self):
+        chunks = iter([b'bad gateway', b'never read'])
+        response = make_response(502, chunks)
+
+        self.assertEqual(read(response).content, b'bad g')
+        self.assertEqual(list(chunks), [b'never read'])
+        response.close.assert_called_once_with()
+
+    def test_read_too_large(self):
+        response = make_response(200, [b'x'] * 101)
+
+        with self.assertRaises(ResponseTooLarge):
+            read(response)
+
+        response.close.assert_called_once_with()
+
+    def test_response_too_large_is_response_error(self):
+        self.assertTrue(issubclass(ResponseTooLarge, ResponseError))
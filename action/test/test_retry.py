@@ -0,0 +1,174 @@
+import asyncio
+
+import requests
+from django.test import SimpleTestCase, override_settings
+from unittest import mock
+
+import action.retry as retry
+from action.responses import ResponseError, ResponseTooLarge
+from action.retry import CircuitBreaker, CircuitOpen, RetryPolicy
+from action.test.utils import make_hook, run
+
+
+class RetryPolicyTest(SimpleTestCase):
+
+    @override_settings(ACTION_RETRY_ATTEMPTS=2, ACTION_RETRY_BACKOFF=1,
+                       ACTION_RETRY_MAX_BACKOFF=4,
+                       ACTION_RETRY_STATUSES=('5xx',))
+    def test_from_data_defaults(self):
+        policy = RetryPolicy.from_data(None)
+
+        self.assertEqual(policy.attempts, 2)
+        self.assertEqual(policy.backoff, 1.0)
+        self.assertEqual(policy.max_backoff, 4.0)
+        self.assertEqual(policy.statuses, frozenset(range(500, 600)))
+
+    def test_from_data(self):
+        policy = RetryPolicy.from_data({'retry': {
+            'attempts': 0, 'maxBackoff': 2, 'statuses': ['429', 503]}})
+
+        self.assertEqual(policy.attempts, 1)
+        self.assertEqual(policy.max_backoff, 2.0)
+        self.assertEqual(policy.statuses, frozenset([429, 503]))
+
+    def test_should_retry(self):
+        policy = RetryPolicy(3, 0.1, 1, frozenset([503]))
+
+        self.assertTrue(policy.should_retry(ResponseError(503, b'')))
+        self.assertFalse(policy.should_retry(ResponseError(404, b'')))
+        self.assertFalse(policy.should_retry(ResponseTooLarge(200, b'')))
+        self.assertTrue(policy.should_retry(requests.ConnectionError()))
+        self.assertTrue(policy.should_retry(asyncio.TimeoutError()))
+        self.assertFalse(policy.should_retry(ValueError()))
+
+    def test_delay(self):
+        policy = RetryPolicy(10, 0.5, 3, frozenset())
+
+        for attempt in range(10):
+            delay = policy.delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(3, 0.5 * 2 ** attempt))
+
+
+class CircuitBreakerTest(SimpleTestCase):
+
+    def test_opens(self):
+        breaker = CircuitBreaker(failures=2, reset_timeout=30)
+
+        breaker.failure('host')
+        breaker.allow('host')
+        breaker.failure('host')
+
+        self.assertTrue(breaker.is_open('host'))
+        with self.assertRaises(CircuitOpen) as context:
+            breaker.allow('host')
+        self.assertEqual(context.exception.host, 'host')
+        self.assertEqual(breaker.stats(), {
+            'failing_hosts': 1, 'open_hosts': 1, 'rejected': 1})
+
+    def test_success_closes(self):
+        breaker = CircuitBreaker(failures=1, reset_timeout=30)
+        breaker.failure('host')
+
+        breaker.success('host')
+
+        self.assertFalse(breaker.is_open('host'))
+        breaker.allow('host')
+
+    @mock.patch('action.retry.time.monotonic')
+    def test_half_open(self, monotonic):
+        breaker = CircuitBreaker(failures=1, reset_timeout=30)
+        monotonic.return_value = 100
+        breaker.failure('host')
+
+        monotonic.return_value = 131
+        breaker.allow('host')
+        # Only the trial fire gets through.
+        with self.assertRaises(CircuitOpen):
+            breaker.allow('host')
+
+    def test_max_hosts(self):
+        breaker = CircuitBreaker(failures=1, max_hosts=2)
+
+        for host in ('a', 'b', 'c'):
+            breaker.failure(host)
+
+        self.assertFalse(breaker.is_open('a'))
+        self.assertTrue(breaker.is_open('c'))
+
+
+@override_settings(ACTION_CIRCUIT_FAILURES=2)
+class CallTest(SimpleTestCase):
+
+    def setUp(self):
+        for patcher in (mock.patch('action.retry.breaker', CircuitBreaker()),
+                        mock.patch('action.retry.time.sleep')):
+            self.sleep = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_call(self):
+        runner = mock.Mock(return_value='result')
+
+        self.assertEqual(retry.call(make_hook(), runner), 'result')
+        runner.assert_called_once_with()
+
+    @mock.patch('action.retry.breaker', CircuitBreaker(failures=3))
+    def test_call_retries(self):
+        runner = mock.Mock(side_effect=[
+            ResponseError(503, b''), requests.Timeout(), 'result'])
+
+        result = retry.call(make_hook(retry={'attempts': 3}), runner)
+
+        self.assertEqual(result, 'result')
+        self.assertEqual(runner.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertFalse(retry.breaker.is_open('http://example.com'))
+
+    def test_call_gives_up(self):
+        error = ResponseError(503, b'')
+        runner = mock.Mock(side_effect=error)
+
+        with self.assertRaises(ResponseError) as context:
+            retry.call(make_hook(retry={'attempts': 2}), runner)
+
+        self.assertIs(context.exception, error)
+        self.assertEqual(runner.call_count, 2)
+
+    def test_call_no_retry(self):
+        runner = mock.Mock(side_effect=ResponseError(404, b''))
+
+        with self.assertRaises(ResponseError):
+            retry.call(make_hook(retry={'attempts': 3}), runner)
+
+        runner.assert_called_once_with()
+        self.assertFalse(retry.breaker.is_open('http://example.com'))
+
+    def test_call_circuit_open(self):
+        runner = mock.Mock(side_effect=requests.ConnectionError())
+
+        with self.assertRaises(CircuitOpen):
+            retry.call(make_hook(retry={'attempts': 5}), runner)
+
+        # Fast-failed once the host failed twice in a row.
+        self.assertEqual(runner.call_count, 2)
+        with self.assertRaises(CircuitOpen):
+            retry.call(make_hook(), runner)
+        self.assertEqual(runner.call_count, 2)
+
+    def test_acall(self):
+        runner = mock.Mock(side_effect=[ResponseError(500, b''), 'result'])
+
+        async def fire():
+            return runner()
+
+        async def no_sleep(*args):
+            pass
+
+        with mock.patch('action.retry.asyncio.sleep',
+                        side_effect=no_sleep) as sleep:
+            result = run(
+                retry.acall(make_hook(retry={'attempts': 2}), fire))
+
+        self.assertEqual(result, 'result')
+        self.assertEqual(runner.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
@@ -0,0 +1,173 @@
+import datetime
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from model_mommy import mommy
+from unittest import mock
+
+import action.plans as plans
+import action.retry as retry
+import action.runlog as runlog
+from action.models import ActionRun
+from action.responses import Body, ResponseError
+from benchmarks.server import StandInServer
+
+
+class MakeRowTest(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(plans.cache.clear)
+        self.hook = mommy.prepare(
+            'action.ActionWebhook', pk=3, zip_id=7, hook_type='post',
+            data={'url': 'http://example.com/', 'payloadType': 'json',
+                  'data': [{'key': 'a', 'value': '1'}]})
+
+    def test_success(self):
+        row = dict(zip(runlog.COLUMNS, runlog.make_row(
+            self.hook, time.monotonic() - 0.5,
+            Body(b'{"ok": 1}', status_code=201),
+            plan=self.hook.get_request())))
+
+        self.assertEqual((row['action_id'], row['zip_id']), (3, 7))
+        self.assertEqual(row['status_code'], 201)
+        self.assertEqual(row['request_bytes'], len(b'{"a": "1"}'))
+        self.assertEqual(row['response_bytes'], 9)
+        self.assertGreaterEqual(row['duration'], 0.5)
+        self.assertLess(abs((timezone.now() - row['started']).total_seconds() -
+                            row['duration']), 1)
+        self.assertIsNone(row['error'])
+
+    def test_error(self):
+        row = dict(zip(runlog.COLUMNS, runlog.make_row(
+            self.hook, time.monotonic(),
+            error=ResponseError(503, b'down'))))
+
+        self.assertEqual(row['status_code'], 503)
+        self.assertIsNone(row['request_bytes'])
+        self.assertEqual(row['response_bytes'], 4)
+        self.assertEqual(row['error'], "ResponseError: b'down'")
+
+    @override_settings(ACTION_RUN_LOG_ENABLED=True)
+    def test_unsaved(self):
+        self.hook.pk = None
+
+        self.assertIsNone(runlog.make_row(self.hook, time.monotonic()))
+        with mock.patch.object(runlog.log, 'add') as add:
+            runlog.record(self.hook, runlog.start())
+        add.assert_not_called()
+
+    def test_disabled(self):
+        self.assertIsNone(runlog.start())
+        with mock.patch.object(runlog.log, 'add') as add:
+            runlog.record(self.hook, None)
+        add.assert_not_called()
+
+    def test_partition_names(self):
+        day = datetime.date(2026, 3, 9)
+
+        self.assertEqual(runlog.partition_name(day),
+                         'action_actionrun_p20260309')
+        self.assertEqual(runlog.partition_day('action_actionrun_p20260309'),
+                         day)
+        self.assertIsNone(runlog.partition_day('action_actionrun_default'))
+
+
+class RunLogTest(TestCase):
+
+    def setUp(self):
+        self.hook = mommy.make('action.ActionWebhook')
+        self.row = (self.hook.pk, self.hook.zip_id, timezone.now(), 0.25,
+                    200, 10, 20, None)
+
+    def test_flush(self):
+        log = runlog.RunLog(background=False)
+        log.add(self.row)
+        log.add(self.row[:-1] + ('Timeout: too slow',))
+
+        self.assertEqual(log.flush(), 2)
+        self.assertEqual(log.flush(), 0)
+
+        runs = ActionRun.objects.order_by('pk')
+        self.assertEqual([run.error for run in runs],
+                         [None, 'Timeout: too slow'])
+        self.assertEqual(runs[0].action, self.hook)
+        self.assertEqual((runs[0].status_code, runs[0].request_bytes,
+                          runs[0].response_bytes), (200, 10, 20))
+        self.assertEqual(log.stats()['written'], 2)
+
+    def test_failed_flush(self):
+        log = runlog.RunLog(background=False)
+        log.add(self.row)
+        log.add((None,) + self.row[1:])
+
+        with self.assertRaises(Exception):
+            log.flush()
+        self.assertEqual(log.stats()['buffered'], 2)
+
+        with mock.patch.object(runlog.logger, 'exception') as logged:
+            self.assertEqual(log.flush(), 1)
+
+        # The good row is written, the bad one logged and let go.
+        self.assertEqual(list(ActionRun.objects.values_list('action_id',
+                                                            flat=True)),
+                         [self.hook.pk])
+        self.assertEqual(logged.call_count, 1)
+        self.assertEqual((log.stats()['buffered'], log.stats()['dropped']),
+                         (0, 1))
+
+    @override_settings(ACTION_RUN_LOG_MAX_BUFFER=1)
+    def test_full_buffer(self):
+        log = runlog.RunLog(background=False)
+        log.add(self.row)
+        log.add(self.row)
+
+        self.assertEqual(log.stats()['dropped'], 1)
+        self.assertEqual(log.flush(), 1)
+
+    @override_settings(ACTION_RUN_LOG_ENABLED=True)
+    def test_make_it_so(self):
+        log = runlog.RunLog(background=False)
+        with StandInServer() as server, \
+                mock.patch('action.runlog.log', log), \
+                mock.patch('action.retry.breaker', retry.CircuitBreaker()):
+            ok = mommy.make('action.ActionWebhook', hook_type='get',
+                            data={'url': server.url})
+            mapped = mommy.make('action.ActionWebhook', hook_type='post',
+                                data={'url': server.url, 'payloadType': 'json',
+                                      'data': [{'key': 'n',
+                                                'value': '{{trigger.n}}'}]})
+            mapped.make_it_so(input={'n': 'twelve chars'})
+            failing = mommy.make('action.ActionWebhook', hook_type='get',
+                                 data={'url': server.url + 'failing'})
+            ok.make_it_so()
+            server.status = 500
+            with self.assertRaises(ResponseError):
+                failing.make_it_so()
+            log.flush()
+
+        runs = dict((run.action_id, run) for run in ActionRun.objects.all())
+        self.assertEqual(runs[ok.pk].status_code, 200)
+        self.assertEqual(runs[ok.pk].request_bytes, 0)
+        # What was sent, not the template.
+        self.assertEqual(runs[mapped.pk].request_bytes,
+                         len(b'{"n": "twelve chars"}'))
+        self.assertEqual(runs[ok.pk].zip_id, ok.zip_id)
+        self.assertIsNone(runs[ok.pk].error)
+        self.assertEqual(runs[failing.pk].status_code, 500)
+        self.assertTrue(runs[failing.pk].error.startswith('ResponseError'))
+
+    def test_prune(self):
+        now = timezone.now()
+        for days in (0, 29, 31, 40):
+            mommy.make('action.ActionRun', action=self.hook,
+                       zip=self.hook.zip, duration=0,
+                       started=now - datetime.timedelta(days=days))
+        out = StringIO()
+
+        call_command('prune_action_runs', '--days', '30', stdout=out)
+
+        self.assertEqual(ActionRun.objects.count(), 2)
+        self.assertIn('Deleted 2 rows', out.getvalue())
@@ -0,0 +1,46 @@
+import json
+
+from django.test import TestCase
+
+from action.schemas import FrozenDict, freeze, thaw, to_document
+
+
+class FreezeTest(TestCase):
+
+    def test_freeze(self):
+        frozen = freeze({'a': [{'b': 1}], 'c': 'd'})
+
+        self.assertIsInstance(frozen, FrozenDict)
+        self.assertIsInstance(frozen['a'], tuple)
+        self.assertIsInstance(frozen['a'][0], FrozenDict)
+        self.assertEqual(json.loads(json.dumps(frozen)),
+                         {'a': [{'b': 1}], 'c': 'd'})
+
+    def test_frozen_dict_immutable(self):
+        frozen = freeze({'a': 1})
+
+        for change in (lambda: frozen.__setitem__('a', 2),
+                       lambda: frozen.__delitem__('a'),
+                       lambda: frozen.update(a=2),
+                       lambda: frozen.pop('a'),
+                       lambda: frozen.setdefault('b', 2),
+                       frozen.popitem,
+                       frozen.clear):
+            with self.assertRaises(TypeError):
+                change()
+        self.assertEqual(frozen, {'a': 1})
+
+    def test_thaw(self):
+        thawed = thaw(freeze({'a': [{'b': 1}]}))
+
+        thawed['a'][0]['b'] = 2
+
+        self.assertIs(type(thawed), dict)
+        self.assertEqual(thawed, {'a': [{'b': 2}]})
+
+    def test_to_document(self):
+        document = to_document(freeze({'b': 1, 'a': [1]}))
+
+        self.assertEqual(document.content, b'{"a": [1], "b": 1}')
+        self.assertEqual(document.etag,
+                         to_document({'a': [1], 'b': 1}).etag)
@@ -0,0 +1,93 @@
+import json
+from collections import OrderedDict
+
+from django.test import TestCase, override_settings
+from requests.models import RequestEncodingMixin
+
+from action.streaming import StreamingBody, iter_form, iter_json, rechunk
+from action.test.utils import run
+from action.xmlstream import iter_xml, to_xml
+
+
+def drain(body):
+    async def read():
+        # No async comprehensions before Python 3.6.
+        chunks = []
+        async for chunk in body:
+            chunks.append(chunk)
+        return chunks
+    return run(read())
+
+
+class RechunkTest(TestCase):
+
+    def test_rechunk(self):
+        chunks = list(rechunk(['ab', 'cd', 'e', 'ü'], 3))
+
+        self.assertEqual(chunks, [b'abcd', 'eü'.encode('utf-8')])
+
+    def test_rechunk_empty(self):
+        self.assertEqual(list(rechunk([], 3)), [])
+
+
+class IterJsonTest(TestCase):
+
+    def test_iter_json_same_as_dumps(self):
+        data = OrderedDict([
+            ('a', 'b'), ('ü', ['x', None]), (1, {'n': 1.5}), (True, '/')])
+
+        self.assertEqual(b''.join(iter_json(data)),
+                         json.dumps(data).encode('utf-8'))
+
+    def test_iter_json_empty(self):
+        self.assertEqual(b''.join(iter_json({})), b'{}')
+
+    def test_iter_json_chunks(self):
+        data = OrderedDict(('key{0}'.format(i), 'value') for i in range(100))
+
+        chunks = list(iter_json(data, chunk_size=64))
+
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(len(chunk) < 64 * 2 for chunk in chunks))
+        self.assertEqual(b''.join(chunks), json.dumps(data).encode('utf-8'))
+
+
+class IterFormTest(TestCase):
+
+    def test_iter_form_same_as_requests(self):
+        data = OrderedDict(('key {0}'.format(i), 'välue&{0}'.format(i))
+                           for i in range(1000))
+
+        self.assertEqual(
+            b''.join(iter_form(data, chunk_size=100)),
+            RequestEncodingMixin._encode_params(data).encode('utf-8'))
+
+    def test_iter_form_skips_none(self):
+        data = OrderedDict([('a', None), ('b', 'c'), ('d', ['e', 'f'])])
+
+        self.assertEqual(b''.join(iter_form(data)), b'b=c&d=e&d=f')
+
+    @override_settings(ACTION_STREAM_CHUNK_SIZE=10)
+    def test_iter_form_chunk_size_setting(self):
+        data = OrderedDict(('k{0}'.format(i), 'v') for i in range(1000))
+
+        # One chunk per group of pairs encoded together.
+        self.assertEqual(len(list(iter_form(data))), 4)
+
+
+class StreamingBodyTest(TestCase):
+
+    def test_reusable(self):
+        body = StreamingBody(iter_json, {'a': 'b'})
+
+        self.assertEqual(b''.join(body), b'{"a": "b"}')
+        self.assertEqual(b''.join(body), b'{"a": "b"}')
+
+    def test_async(self):
+        data = OrderedDict(('key{0}'.format(i), i) for i in range(100))
+        body = StreamingBody(iter_xml, data, chunk_size=64)
+
+        chunks = drain(body)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), to_xml(data))
@@ -0,0 +1,128 @@
+import datetime
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from model_mommy import mommy
+
+import action.jsoncodec as jsoncodec
+import action.transfer as transfer
+from action.models import ActionWebhook
+from zip.models import Zip
+
+
+class TransferTest(TestCase):
+
+    def setUp(self):
+        self.zips = [mommy.make('zip.Zip', title='Zip {0}'.format(n),
+                                active=True, rate_limit=2.5)
+                     for n in range(2)]
+        self.hooks = [
+            ActionWebhook.objects.create(
+                zip=self.zips[n % 2], hook_type='post', paused=n == 0,
+                data={'url': 'http://example.com/{0}'.format(n),
+                      'data': [{'key': 'n', 'value': str(n)}]})
+            for n in range(5)]
+        # Last changed well before the import.
+        self.modified = timezone.now() - datetime.timedelta(days=3)
+        Zip.objects.update(modified=self.modified)
+        ActionWebhook.objects.update(modified=self.modified)
+
+    def export(self, zips=None):
+        output = StringIO()
+        transfer.export(output, zips)
+        return output.getvalue().splitlines(True)
+
+    def test_export(self):
+        lines = self.export()
+
+        records = [jsoncodec.loads(line) for line in lines]
+        self.assertEqual([record['model'] for record in records],
+                         ['zip.zip'] * 2 + ['action.actionwebhook'] * 5)
+        self.assertEqual(records[0]['pk'], self.zips[0].pk)
+        self.assertEqual(records[0]['fields']['title'], 'Zip 0')
+        self.assertEqual(records[2]['fields']['zip'], self.zips[0].pk)
+        self.assertEqual(records[2]['fields']['data'], self.hooks[0].data)
+
+    def test_export_zips(self):
+        lines = self.export([self.zips[1].pk])
+
+        self.assertEqual(len(lines), 1 + 2)
+
+    def test_round_trip(self):
+        lines = self.export()
+        ActionWebhook.objects.all().delete()
+        Zip.objects.all().delete()
+
+        progress = transfer.load(lines, batch_size=2)
+
+        self.assertEqual(progress.counts, {'zip.zip': 2,
+                                           'action.actionwebhook': 5})
+        for zipp in self.zips:
+            loaded = Zip.objects.get(pk=zipp.pk)
+            self.assertEqual((loaded.title, loaded.active, loaded.rate_limit,
+                              loaded.created, loaded.modified),
+                             (zipp.title, True, 2.5, zipp.created,
+                              self.modified))
+        for hook in self.hooks:
+            loaded = ActionWebhook.objects.get(pk=hook.pk)
+            self.assertEqual(
+                (loaded.zip_id, loaded.data, loaded.paused, loaded.hook_type,
+                 loaded.modified),
+                (hook.zip_id, hook.data, hook.paused, 'post', self.modified))
+        # Sequences were moved past the imported pks.
+        self.assertGreater(mommy.make('zip.Zip').pk, self.zips[-1].pk)
+
+    def test_dependencies(self):
+        self.hooks[2].depends_on.add(self.hooks[0])
+        self.hooks[3].depends_on.add(self.hooks[0])
+        lines = self.export([self.zips[0].pk])
+        self.zips[0].delete()
+
+        progress = transfer.load(lines)
+
+        self.assertEqual(progress.counts['action.actionwebhook_depends_on'],
+                         1)
+        self.assertEqual(list(ActionWebhook.objects.get(
+            pk=self.hooks[2].pk).depends_on.all()), [self.hooks[0]])
+
+    def test_commands(self):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        err = StringIO()
+
+        call_command('export_zips', '--output', path, stderr=err)
+        self.assertIn('Exported 5 action.actionwebhook, 2 zip.zip',
+                      err.getvalue())
+
+        ActionWebhook.objects.all().delete()
+        Zip.objects.all().delete()
+        out = StringIO()
+        call_command('import_zips', path, '--batch-size', '3', stdout=out)
+
+        self.assertIn('Imported 5 action.actionwebhook, 2 zip.zip',
+                      out.getvalue())
+        self.assertEqual(ActionWebhook.objects.count(), 5)
+
+    def test_commands_utf8(self):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        Zip.objects.filter(pk=self.zips[0].pk).update(title='Zïp ✓')
+
+        # orjson writes raw UTF-8, json escapes it.
+        for codec in ('json', 'orjson'):
+            if codec not in jsoncodec.available():
+                continue
+            with self.settings(ACTION_JSON_CODEC=codec):
+                call_command('export_zips', '--output', path,
+                             stderr=StringIO())
+                Zip.objects.all().delete()
+                call_command('import_zips', path, stdout=StringIO())
+
+            self.assertEqual(Zip.objects.get(pk=self.zips[0].pk).title,
+                             'Zïp ✓')
@@ -1,12 +1,14 @@
 import json
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest import mock
 
+from action.jsoncodec import Codec
+from action.responses import Body, ResponseError
 from action.utils import (
     build_dict,
+    find_first,
     handle_response,
-    logger,
     search_dict)
 
 
@@ -150,39 +152,122 @@ class SearchDictTest(TestCase):
             result[0], ('first_option', 'This is the one I want'))
         self.assertEqual(len(result), 1)
 
+    def test_search_dict_order(self):
+        payload = {
+            'a': {'x': 1, 'b': [{'x': 2}, 'skipped', [{'x': 'nested'}]]},
+            'x': 3,
+            'c': [{'d': {'x': 4}}, {'x': 5}],
+        }
+        result = list(search_dict('x', payload))
+        self.assertEqual(result, [('x', 1), ('x', 2), ('x', 3), ('x', 4),
+                                  ('x', 5)])
+
+    def test_search_dict_deep(self):
+        payload = current = {}
+        for _ in range(5000):
+            current['next'] = {}
+            current = current['next']
+        current['test_key'] = 'deep down'
+
+        result = list(search_dict('test_key', payload))
+        self.assertEqual(result, [('test_key', 'deep down')])
+
+    def test_search_dict_max_depth(self):
+        payload = {
+            'test_key': 0,
+            'a': {'test_key': 1, 'b': [{'test_key': 2}]}
+        }
+        self.assertEqual(list(search_dict('test_key', payload, max_depth=0)),
+                         [('test_key', 0)])
+        self.assertEqual(list(search_dict('test_key', payload, max_depth=1)),
+                         [('test_key', 0), ('test_key', 1)])
+        self.assertEqual(len(list(search_dict('test_key', payload))), 3)
+
+    def test_find_first_stops_early(self):
+        class Untouchable(dict):
+            def items(self):
+                raise AssertionError('walked too far')
+
+        payload = {'headers': ['h'], 'data': Untouchable(a=1)}
+
+        self.assertEqual(find_first('headers', payload), ('headers', ['h']))
+        self.assertIsNone(find_first('nope', {}))
+        self.assertEqual(find_first('nope', 'string', default=1), 1)
+
 
 class HandleResponseTest(TestCase):
-    def test_handle_response_no_json(self):
-        response = mock.MagicMock()
-        response.json = mock.MagicMock()
-        response.json.side_effect = ValueError(mock.Mock(), 'error')
-        response.status_code = 200
 
-        with mock.patch.object(logger, 'error') as test_logger:
+    def make_response(self, status_code, content, headers=None):
+        response = mock.Mock(status_code=status_code, headers=headers or {})
+        response.iter_content.return_value = iter([content])
+        return response
+
+    def test_handle_response(self):
+        response = self.make_response(
+            200, json.dumps({'key1': 'value1'}).encode('utf-8'))
+
+        result = handle_response(response)
+
+        self.assertEqual(result.json(), {'key1': 'value1'})
+        self.assertEqual(result.value(), {'key1': 'value1'})
+        response.close.assert_called_once_with()
+
+    def test_handle_response_lazy(self):
+        response = self.make_response(200, b'not json')
+
+        with mock.patch('action.jsoncodec.loads') as loads:
             result = handle_response(response)
 
-        test_logger.assert_called_with(response.json.side_effect,
-                                       extra=response)
-        self.assertEquals(result, response.content)
+        loads.assert_not_called()
+        self.assertEqual(result.content, b'not json')
+
+    @mock.patch('action.jsoncodec.loads')
+    def test_handle_response_no_json(self, loads):
+        response = self.make_response(200, b'not json')
+        loads.side_effect = ValueError(mock.Mock(), 'error')
+
+        result = handle_response(response)
+        with mock.patch('action.responses.logger') as test_logger:
+            value = result.value()
+
+        loads.assert_called_once_with(b'not json')
+        test_logger.error.assert_called_with(loads.side_effect,
+                                             extra={'body': result})
+        self.assertEqual(value, b'not json')
 
     def test_handle_response_bad_response(self):
-        expected_result = json.dumps({'key1': 'value1'})
-        response = mock.MagicMock()
-        response.json.return_value = expected_result
-        response.content = 'this is a sample response'
-        response.status_code = 401
+        response = self.make_response(401, b'this is a sample response')
 
-        with self.assertRaises(Exception) as context:
+        with self.assertRaises(ResponseError) as context:
             handle_response(response)
 
-        self.assertTrue('this is a sample response' in context.exception.args)
+        self.assertTrue(b'this is a sample response' in context.exception.args)
+        self.assertEqual(context.exception.status_code, 401)
+        self.assertFalse(context.exception.truncated)
 
-    def test_handle_response(self):
-        expected_result = json.dumps({'key1': 'value1'})
-        response = mock.MagicMock()
-        response.json.return_value = expected_result
-        response.status_code = 200
+    @override_settings(ACTION_RESPONSE_ERROR_SIZE=4)
+    def test_handle_response_bad_response_truncated(self):
+        response = self.make_response(500, b'this is a sample response')
 
-        result = handle_response(response)
+        with self.assertRaises(ResponseError) as context:
+            handle_response(response)
+
+        self.assertEqual(context.exception.content, b'this')
+        self.assertTrue(context.exception.truncated)
+
+    def test_handle_response_body(self):
+        response = mock.Mock(status_code=200)
+        body = Body(b'{}')
+
+        self.assertIs(handle_response(response, body), body)
+        response.iter_content.assert_not_called()
+
+    @override_settings(ACTION_JSON_CODEC='test')
+    def test_handle_response_codec(self):
+        response = self.make_response(200, b'')
+
+        with mock.patch.dict('action.jsoncodec._codecs', test=Codec(
+                'test', None, lambda data: 'decoded')):
+            result = handle_response(response)
 
-        self.assertEquals(result, response.json())
+            self.assertEquals(result.json(), 'decoded')
@@ -0,0 +1,41 @@
+import json
+
+from django.test import TestCase
+
+from action.models import ActionWebhook
+from action.schemas import thaw
+
+
+class ActionWebhookSchemaViewTest(TestCase):
+
+    def test_get(self):
+        response = self.client.get('/action/schema/get')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         thaw(ActionWebhook().get_schema('get')))
+        self.assertEqual(response['ETag'], '"{0}"'.format(
+            ActionWebhook.get_schema_document('get').etag))
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_get_not_modified(self):
+        etag = self.client.get('/action/schema/post')['ETag']
+
+        response = self.client.get('/action/schema/post',
+                                   HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_get_stale_etag(self):
+        etag = self.client.get('/action/schema/post')['ETag']
+
+        response = self.client.get('/action/schema/put',
+                                   HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_unknown(self):
+        response = self.client.get('/action/schema/nope')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from decimal import Decimal
+
+from dicttoxml import dicttoxml
+from django.test import TestCase, override_settings
+
+from action.xmlstream import iter_xml, make_name, to_xml
+
+HEADER = b'<?xml version="1.0" encoding="UTF-8" ?>'
+
+
+class ToXmlTest(TestCase):
+
+    def test_to_xml_build_dict(self):
+        data = OrderedDict([('key1', 'value1'), ('key2', 'value2')])
+
+        result = to_xml(data)
+
+        self.assertEqual(result, HEADER + (
+            b'<root><key1 type="str">value1</key1>'
+            b'<key2 type="str">value2</key2></root>'))
+        self.assertEqual(result, dicttoxml(data))
+
+    def test_to_xml_types(self):
+        data = OrderedDict([
+            ('s', '<&"\'>'), ('i', 1), ('f', 1.5), ('b', True), ('n', None),
+            ('d', Decimal('1.10')), ('u', 'ü')])
+
+        self.assertEqual(to_xml(data), HEADER + (
+            '<root><s type="str">&lt;&amp;&quot;&apos;&gt;</s>'
+            '<i type="int">1</i><f type="float">1.5</f>'
+            '<b type="bool">True</b><n type="null"></n>'
+            '<d type="number">1.10</d><u type="str">ü</u></root>'
+        ).encode('utf-8'))
+
+    def test_to_xml_nested(self):
+        data = OrderedDict([
+            ('d', OrderedDict([('x', [1, None, {'y': 'z'}, [2]])])),
+            ('e', {})])
+
+        self.assertEqual(to_xml(data), HEADER + (
+            b'<root><d type="dict"><x type="list"><item type="int">1</item>'
+            b'<item type="null"></item>'
+            b'<item type="dict"><y type="str">z</y></item>'
+            b'<item type="list"><item type="int">2</item></item>'
+            b'</x></d><e type="dict"></e></root>'))
+
+    def test_to_xml_list(self):
+        self.assertEqual(to_xml(['a']), HEADER + (
+            b'<root><item type="str">a</item></root>'))
+
+    def test_to_xml_unsupported(self):
+        with self.assertRaises(TypeError):
+            to_xml({'a': object()})
+
+
+class MakeNameTest(TestCase):
+
+    def test_make_name(self):
+        self.assertEqual(make_name('key'), ('key', ''))
+        self.assertEqual(make_name('é'), ('é', ''))
+        self.assertEqual(make_name('12'), ('n12', ''))
+        self.assertEqual(make_name('a b'), ('a_b', ''))
+        self.assertEqual(make_name('a<b'), ('key', ' name="a&lt;b"'))
+        self.assertEqual(make_name('ns:a'), ('key', ' name="ns:a"'))
+        self.assertEqual(make_name(3), ('n3', ''))
+
+
+class IterXmlTest(TestCase):
+
+    def test_iter_xml_chunks(self):
+        data = OrderedDict(
+            ('key{0}'.format(n), 'value') for n in range(100))
+
+        chunks = list(iter_xml(data, chunk_size=100))
+
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(len(chunk) < 200 for chunk in chunks))
+        self.assertEqual(b''.join(chunks), to_xml(data))
+
+    @override_settings(ACTION_STREAM_CHUNK_SIZE=10 ** 9)
+    def test_iter_xml_default_chunk_size(self):
+        self.assertEqual(len(list(iter_xml({'a': 'b'}))), 1)
@@ -0,0 +1,26 @@
+"""Helpers shared by the action tests."""
+import asyncio
+
+from django.utils import timezone
+
+from action.models import ActionWebhook
+
+
+def run(coroutine):
+    # asyncio.run is Python 3.7+. A loop of its own, closed once done.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def make_hook(hook_type='post', pk=1, loaded=False, **data):
+    # An unsaved hook firing at example.com unless given a url. `loaded`
+    # hooks look like rows from the database, so they get plans and batches.
+    data.setdefault('url', 'http://example.com/hook')
+    hook = ActionWebhook(pk=pk, hook_type=hook_type, data=data)
+    if loaded:
+        hook.modified = timezone.now()
+        hook._state.adding = False
+    return hook
@@ -0,0 +1,199 @@
+"""
+Zips and their actions as JSON Lines, for `./manage.py export_zips` and
+`import_zips`.
+
+One object per line, `{"model": "zip.zip", "pk": 1, "fields": {...}}`,
+Zips before the actions pointing at them, and the actions' dependencies
+last. Export reads through a server-side cursor and import creates rows in
+batches, so both run in constant memory whatever the number of rows.
+"""
+import datetime
+import time
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Case, Value, When
+from model_utils.fields import AutoLastModifiedField
+
+import action.jsoncodec as jsoncodec
+
+# In the order they are written and read back.
+MODELS = ('zip.zip', 'action.actionwebhook')
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def fields(model):
+    return [field for field in model._meta.concrete_fields
+            if not field.primary_key]
+
+
+def stamped_fields(model):
+    """The fields that set themselves when a row is saved."""
+    return [field for field in fields(model)
+            if isinstance(field, AutoLastModifiedField) or
+            getattr(field, 'auto_now', False) or
+            getattr(field, 'auto_now_add', False)]
+
+
+def encode(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def querysets(zips=None):
+    """The rows to export, all of them or those of the `zips` pks."""
+    zip_model = apps.get_model('zip', 'Zip')
+    action_model = apps.get_model('action', 'ActionWebhook')
+    dependency_model = action_model.depends_on.through
+    zip_rows = zip_model.objects.all()
+    action_rows = action_model.objects.all()
+    dependency_rows = dependency_model.objects.all()
+    if zips:
+        zip_rows = zip_rows.filter(pk__in=zips)
+        action_rows = action_rows.filter(zip__in=zips)
+        dependency_rows = dependency_rows.filter(
+            from_actionwebhook__zip__in=zips, to_actionwebhook__zip__in=zips)
+    return [zip_rows.order_by('pk'), action_rows.order_by('pk'),
+            dependency_rows.order_by('pk')]
+
+
+def export_lines(querysets):
+    """Yield `(model label, line)` for every row, line ending included."""
+    for queryset in querysets:
+        model = queryset.model
+        model_label = label(model)
+        model_fields = fields(model)
+        pk = model._meta.pk.attname
+        columns = [pk] + [field.attname for field in model_fields]
+        for row in queryset.values_list(*columns).iterator():
+            yield model_label, jsoncodec.dumps({
+                'model': model_label,
+                'pk': row[0],
+                'fields': dict(
+                    (field.name, encode(value))
+                    for field, value in zip(model_fields, row[1:])),
+            }) + '\n'
+
+
+class Progress(object):
+    """Rows per model, and how fast they went by."""
+
+    def __init__(self, callback=None, every=100000):
+        self.counts = dict((model, 0) for model in MODELS)
+        self.started = time.perf_counter()
+        self.callback = callback
+        self.every = every
+        self.total = 0
+
+    def add(self, model_label, count=1):
+        self.counts[model_label] = self.counts.get(model_label, 0) + count
+        before = self.total
+        self.total += count
+        if self.callback and before // self.every != self.total // self.every:
+            self.callback(self)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.total / self.elapsed if self.elapsed else 0
+
+    def summary(self):
+        return '{0} in {1:.1f}s, {2:.0f} rows/s'.format(
+            ', '.join('{0} {1}'.format(self.counts[model_label], model_label)
+                      for model_label in sorted(self.counts)),
+            self.elapsed, self.rate)
+
+
+def export(output, zips=None, progress=None):
+    """Write the rows to the `output` text file. Returns a `Progress`."""
+    progress = progress or Progress()
+    for model_label, line in export_lines(querysets(zips)):
+        output.write(line)
+        progress.add(model_label)
+    return progress
+
+
+class Importer(object):
+    """
+    Creates the objects of the lines it is given, `batch_size` at a time,
+    keeping their primary keys.
+    """
+
+    def __init__(self, batch_size=1000, using='default', progress=None):
+        self.batch_size = batch_size
+        self.using = using
+        self.progress = progress or Progress()
+        self._model = None
+        self._batch = []
+        self._models = set()
+
+    def add(self, line):
+        line = line.strip()
+        if not line:
+            return
+        record = jsoncodec.loads(line)
+        model = apps.get_model(record['model'])
+        if model is not self._model:
+            # A model's rows go in before the next model's refer to them.
+            self.flush()
+            self._model = model
+            self._models.add(model)
+
+        instance = model(pk=record['pk'])
+        values = record['fields']
+        for field in fields(model):
+            if field.name in values:
+                setattr(instance, field.attname,
+                        field.to_python(values[field.name]))
+        self._batch.append(instance)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        objects = self._model.objects.using(self.using)
+        stamped = stamped_fields(self._model)
+        # bulk_create stamps `modified` and the like with the time of the
+        # import, the exported values are put back afterwards.
+        stamps = [(instance.pk, [getattr(instance, field.attname)
+                                 for field in stamped])
+                  for instance in self._batch]
+        objects.bulk_create(self._batch)
+        if stamped:
+            objects.filter(pk__in=[pk for pk, _ in stamps]).update(**dict(
+                (field.attname, Case(*[
+                    When(pk=pk, then=Value(values[n]))
+                    for pk, values in stamps], output_field=field))
+                for n, field in enumerate(stamped)))
+        self.progress.add(label(self._model), len(self._batch))
+        self._batch = []
+
+    def finish(self):
+        self.flush()
+        # New rows get pks past the imported ones.
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), list(self._models))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        return self.progress
+
+
+def load(lines, batch_size=1000, using='default', progress=None):
+    """Import `lines` in one transaction. Returns a `Progress`."""
+    with transaction.atomic(using=using):
+        importer = Importer(batch_size, using, progress)
+        for line in lines:
+            importer.add(line)
+        return importer.finish()
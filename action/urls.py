@@ -1,13 +1,7 @@
-# from django.conf.urls import url
-# from action.views import (
-#     ActionWebhookView,
-#     ActionWebhookSchemaView,
-# )
-#
-# urlpatterns = [
-#     url(r'schema/(?P<schema_type>\w+)',
-#         ActionWebhookSchemaView.as_view()),
-#     # url(r'schema/(?P<schema_type>\w+)', ActionWebhookView.as_view()),
-# ]
+from django.conf.urls import url
+from action.views import ActionWebhookSchemaView
 
-urlpatterns = []
+urlpatterns = [
+    url(r'^schema/(?P<schema_type>\w+)$', ActionWebhookSchemaView.as_view(),
+        name='action-schema'),
+]
@@ -1,5 +1,9 @@
+import itertools
 import logging
 from collections import OrderedDict
+
+import action.responses as responses
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,30 +24,61 @@ def build_dict(items):
         return built_dict
 
 
-def search_dict(input_key, input_dict):
-    if hasattr(input_dict, 'items'):
-        for key, value in input_dict.items():
-            if isinstance(input_key, str) and key == input_key:
-                yield key, value
-            elif isinstance(input_key, list) and key in input_key:
-                yield key, value
-            if isinstance(value, dict):
-                for result in search_dict(input_key, value):
-                    yield result
-            elif isinstance(value, list):
-                for item in value:
-                    for result in search_dict(input_key, item):
-                        yield result
-
-
-def handle_response(response):
-    try:
-        result = response.json()
-    except ValueError as e:  # error decoding json
-        logger.error(e, extra=response)
-        result = response.content
-
-    if 200 <= response.status_code <= 299:
-        return result
+def _children(value):
+    if isinstance(value, dict):
+        return iter(value.items())
+    # Only dicts inside of lists are searched, same as always.
+    return itertools.chain.from_iterable(
+        item.items() for item in value if hasattr(item, 'items'))
+
+
+def search_dict(input_key, input_dict, max_depth=None):
+    # Depth first, parents before children, like the recursive version it
+    # replaced, but with an explicit stack: no generator frame per level, no
+    # recursion limit, and nothing is walked past what the caller consumes.
+    if not hasattr(input_dict, 'items'):
+        return
+
+    if isinstance(input_key, str):
+        input_keys = (input_key,)
+    elif isinstance(input_key, list):
+        input_keys = input_key
     else:
-        raise Exception(response.content)
+        input_keys = ()
+
+    stack = [(iter(input_dict.items()), 0)]
+    while stack:
+        items, depth = stack.pop()
+        descend = max_depth is None or depth < max_depth
+        for key, value in items:
+            if key in input_keys:
+                yield key, value
+
+            if descend and isinstance(value, (dict, list)):
+                # Come back to the rest of this level once the child is done.
+                stack.append((items, depth))
+                stack.append((_children(value), depth + 1))
+                break
+
+
+def find_first(input_key, input_dict, max_depth=None, default=None):
+    return next(search_dict(input_key, input_dict, max_depth), default)
+
+
+def handle_response(response, body=None):
+    """
+    Read `response` within bounds and hand back its `responses.Body`, left
+    undecoded until the caller asks. Non-2xx responses raise
+    `responses.ResponseError` carrying the start of their body.
+
+    `body` is for responses whose body was read already.
+    """
+    if body is None:
+        body = responses.read(response)
+
+    if responses.is_success(response.status_code):
+        return body
+
+    with body:
+        raise responses.ResponseError(response.status_code, body.content,
+                                      body.truncated)
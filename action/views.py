@@ -1,17 +1,47 @@
-# from django.views import View
-# from django.http import JsonResponse
-#
-# from action.models import ActionWebhook
-#
-#
-# class ActionWebhookView(View):
-#     def get(self, request):
-#         return JsonResponse({'some': 'data'})
-#
-#
-# class ActionWebhookSchemaView(View):
-#     def get(self, request, **kwargs):
-#         schema_type = kwargs.get('schema_type', '')
-#
-#         if schema_type:
-#             return JsonResponse(ActionWebhook().get_schema(schema_type))
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition
+
+import action.metrics as metrics
+from action.models import ActionWebhook
+
+
+def schema_etag(request, schema_type=None):
+    document = ActionWebhook.get_schema_document(schema_type)
+    return document.etag if document else None
+
+
+class ActionWebhookSchemaView(View):
+    # Schemas only change with a deploy. Let clients keep them for a while
+    # and revalidate with the ETag after that.
+    max_age = 300
+
+    @method_decorator(condition(etag_func=schema_etag))
+    def get(self, request, schema_type=None):
+        document = ActionWebhook.get_schema_document(schema_type)
+
+        if not document:
+            raise Http404('Unknown schema type')
+
+        response = HttpResponse(document.content,
+                                content_type='application/json')
+        response['Cache-Control'] = 'public, max-age={0}'.format(
+            self.max_age)
+        return response
+
+
+def metrics_view(request):
+    # Labels name customer hosts: only for staff, and scrapers on the
+    # allowlist.
+    if not settings.ACTION_METRICS_ENABLED:
+        raise Http404('Metrics are disabled')
+    if not ((request.user.is_active and request.user.is_staff) or
+            request.META.get('REMOTE_ADDR') in
+            settings.ACTION_METRICS_ALLOWED_IPS):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
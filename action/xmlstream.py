@@ -0,0 +1,132 @@
+"""
+Streaming XML encoder producing the same bytes `dicttoxml` (1.7.4, default
+options) produces, one chunk at a time instead of one big string.
+"""
+import numbers
+import re
+from functools import lru_cache
+from xml.dom.minidom import parseString
+
+from django.conf import settings
+
+import action.streaming as streaming
+
+HEADER = '<?xml version="1.0" encoding="UTF-8" ?>'
+
+# Names made of these are always well formed, no need to ask a parser.
+PLAIN_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_.-]*$')
+
+
+def escape_xml(value):
+    return (value.replace('&', '&amp;')
+                 .replace('"', '&quot;')
+                 .replace('\'', '&apos;')
+                 .replace('<', '&lt;')
+                 .replace('>', '&gt;'))
+
+
+@lru_cache(maxsize=4096)
+def is_valid_name(key):
+    if PLAIN_NAME.match(key):
+        return True
+    # Whatever dicttoxml's parser accepts, exactly.
+    try:
+        parseString('{0}<{1}>foo</{1}>'.format(HEADER, key))
+    except Exception:
+        return False
+    return True
+
+
+@lru_cache(maxsize=4096)
+def make_name(key):
+    """Tag and attribute string for a key, the way dicttoxml fixes them up."""
+    key = escape_xml(str(key))
+
+    if is_valid_name(key):
+        return key, ''
+    # prepend a lowercase n if the key is numeric
+    if key.isdigit():
+        return 'n{0}'.format(key), ''
+    # replace spaces with underscores if that fixes the problem
+    if is_valid_name(key.replace(' ', '_')):
+        return key.replace(' ', '_'), ''
+    # key is still invalid - move it into a name attribute
+    return 'key', ' name="{0}"'.format(key)
+
+
+def xml_type(value):
+    # By type name, like dicttoxml, so subclasses land where they did there.
+    name = type(value).__name__
+    if name == 'str':
+        return 'str'
+    if name == 'int':
+        return 'int'
+    if name == 'float':
+        return 'float'
+    if name == 'bool':
+        return 'bool'
+    if isinstance(value, numbers.Number):
+        return 'number'
+    if isinstance(value, dict):
+        return 'dict'
+    return 'list'
+
+
+def iter_value(tag, attrs, value):
+    # dicttoxml checks for numbers before booleans, so True is "True".
+    if isinstance(value, (numbers.Number, str)):
+        text = escape_xml(value) if isinstance(value, str) else str(value)
+        yield '<{0}{1} type="{2}">{3}</{0}>'.format(
+            tag, attrs, xml_type(value), text)
+    elif hasattr(value, 'isoformat'):
+        yield '<{0}{1} type="str">{2}</{0}>'.format(
+            tag, attrs, escape_xml(value.isoformat()))
+    elif value is None:
+        yield '<{0}{1} type="null"></{0}>'.format(tag, attrs)
+    elif isinstance(value, dict):
+        yield '<{0}{1} type="dict">'.format(tag, attrs)
+        yield from iter_dict(value)
+        yield '</{0}>'.format(tag)
+    elif isinstance(value, (list, tuple, set)):
+        yield '<{0}{1} type="list">'.format(tag, attrs)
+        yield from iter_list(value)
+        yield '</{0}>'.format(tag)
+    else:
+        raise TypeError('Unsupported data type: {0} ({1})'.format(
+            value, type(value).__name__))
+
+
+def iter_dict(obj):
+    for key, value in obj.items():
+        tag, attrs = make_name(key)
+        yield from iter_value(tag, attrs, value)
+
+
+def iter_list(items):
+    for item in items:
+        yield from iter_value('item', '', item)
+
+
+def iter_xml_parts(obj):
+    yield HEADER
+    yield '<root>'
+    if isinstance(obj, dict):
+        yield from iter_dict(obj)
+    elif isinstance(obj, (list, tuple, set)):
+        yield from iter_list(obj)
+    else:
+        yield from iter_value('item', '', obj)
+    yield '</root>'
+
+
+def iter_xml(obj, chunk_size=None):
+    """
+    Yield the document as utf-8 encoded chunks of roughly `chunk_size`
+    bytes, good for a chunked request body.
+    """
+    return streaming.rechunk(iter_xml_parts(obj),
+                             chunk_size or settings.ACTION_STREAM_CHUNK_SIZE)
+
+
+def to_xml(obj):
+    return b''.join(iter_xml(obj))
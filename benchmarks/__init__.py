@@ -0,0 +1,10 @@
+import os
+
+
+def setup():
+    # Benchmarks run as plain scripts (`python -m benchmarks.<name>`), so
+    # they have to bring Django up themselves.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zipier.settings')
+
+    import django
+    django.setup()
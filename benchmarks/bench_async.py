@@ -0,0 +1,54 @@
+"""
+Blocking thread pool vs asyncio dispatch against a local stand-in server.
+
+    python -m benchmarks.bench_async --hooks 2000 --latency 0.05
+"""
+import argparse
+
+import benchmarks
+from benchmarks.server import StandInServer
+
+
+def make_hooks(url, count):
+    from action.models import ActionWebhook
+
+    return [
+        ActionWebhook(pk=pk, hook_type=ActionWebhook.HOOK_POST, data={
+            'url': url,
+            'payloadType': 'json',
+            'data': [{'key': 'id', 'value': str(pk)}],
+        })
+        for pk in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hooks', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=10,
+                        help='Threads of the blocking runner.')
+    parser.add_argument('--limit', type=int, default=1000,
+                        help='In-flight requests of the asyncio runner.')
+    args = parser.parse_args()
+
+    benchmarks.setup()
+
+    import action.aio as aio
+    from action.executor import run_actions
+
+    with StandInServer(latency=args.latency) as server:
+        hooks = make_hooks(server.url, args.hooks)
+
+        for name, run in (
+                ('threads', lambda: run_actions(hooks, args.workers)),
+                ('asyncio', lambda: aio.run(hooks, args.limit))):
+            report = run()
+            print('{0:>8}: {1} hooks, {2} failed, {3:.3f}s, {4:.0f} '
+                  'fires/s'.format(name, len(report), len(report.failed),
+                                   report.wall_time,
+                                   len(report) / report.wall_time))
+
+
+if __name__ == '__main__':
+    main()
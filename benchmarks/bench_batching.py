@@ -0,0 +1,62 @@
+"""
+Fires of one hook sent one by one vs coalesced into batches, against a
+local stand-in server.
+
+    python -m benchmarks.bench_batching --fires 2000 --size 50 --wait 20
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import benchmarks
+from benchmarks.server import StandInServer
+
+
+def make_hook(url, batch):
+    from django.utils import timezone
+
+    from action.models import ActionWebhook
+
+    data = {
+        'url': url,
+        'payloadType': 'json',
+        'data': [{'key': 'id', 'value': '1'}],
+    }
+    if batch:
+        data['batch'] = batch
+    hook = ActionWebhook(pk=1, hook_type=ActionWebhook.HOOK_POST, data=data,
+                         modified=timezone.now())
+    hook._state.adding = False
+    return hook
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fires', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=100,
+                        help='Callers firing concurrently.')
+    parser.add_argument('--size', type=int, default=50)
+    parser.add_argument('--wait', type=int, default=20,
+                        help='Milliseconds a batch waits to fill up.')
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    benchmarks.setup()
+
+    for name, batch in (
+            ('single', None),
+            ('batched', {'size': args.size, 'wait': args.wait})):
+        with StandInServer(latency=args.latency, echo=True) as server:
+            hook = make_hook(server.url, batch)
+            start = time.monotonic()
+            with ThreadPoolExecutor(args.threads) as executor:
+                list(executor.map(lambda _: hook.make_it_so(),
+                                  range(args.fires)))
+            wall_time = time.monotonic() - start
+            print('{0:>8}: {1} fires, {2} requests, {3:.3f}s, {4:.0f} '
+                  'fires/s'.format(name, args.fires, server.requests,
+                                   wall_time, args.fires / wall_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Polling a GET hook with and without the response cache, against a stand-in
+server that allows caching for `--max-age` seconds and then answers
+revalidations with 304s.
+
+    python -m benchmarks.bench_httpcache --fires 2000 --max-age 1
+"""
+import argparse
+import time
+
+import benchmarks
+from benchmarks.server import StandInServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fires', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--max-age', type=int, default=1)
+    parser.add_argument('--size', type=int, default=10000,
+                        help='Response body bytes.')
+    args = parser.parse_args()
+
+    benchmarks.setup()
+    import action.httpcache as httpcache
+    from action.models import ActionWebhook
+
+    body = b'{"data": "' + b'x' * args.size + b'"}'
+    for cached in (False, True):
+        with StandInServer(
+                latency=args.latency, body=body, etag='"v1"',
+                headers={'Cache-Control': 'max-age={0}'.format(
+                    args.max_age)}) as server:
+            hook = ActionWebhook(hook_type='get',
+                                 data={'url': server.url, 'cache': cached})
+            start = time.perf_counter()
+            for _ in range(args.fires):
+                hook.make_it_so()
+            elapsed = time.perf_counter() - start
+
+        print('{0:>9}: {1:8.1f} fires/s, {2} requests sent, {3} answered '
+              '304'.format('cache' if cached else 'no cache',
+                           args.fires / elapsed, server.requests,
+                           server.not_modified))
+    print(httpcache.stats())
+
+
+if __name__ == '__main__':
+    main()
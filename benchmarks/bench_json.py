@@ -0,0 +1,63 @@
+"""
+Every installed JSON codec on webhook shaped payloads and responses.
+
+    python -m benchmarks.bench_json
+"""
+import argparse
+import time
+from collections import OrderedDict
+
+import benchmarks
+
+
+def payload(items):
+    # What get_data hands to the codec: build_dict of the hook's key/values.
+    return OrderedDict(
+        ('key{0}'.format(n), 'value {0}'.format(n)) for n in range(items))
+
+
+def response(items):
+    # A typical API answer: a list of small records.
+    return [{'id': n, 'email': 'user{0}@example.com'.format(n),
+             'active': n % 2 == 0, 'score': n / 3.0, 'tags': ['a', 'b']}
+            for n in range(items)]
+
+
+def per_call(function, seconds):
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        function()
+        calls += 1
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=0.5,
+                        help='Time spent on every measurement.')
+    args = parser.parse_args()
+
+    benchmarks.setup()
+
+    import action.jsoncodec as jsoncodec
+
+    documents = (
+        ('payload 10', payload(10)),
+        ('payload 1000', payload(1000)),
+        ('response 10', response(10)),
+        ('response 1000', response(1000)),
+    )
+    for label, document in documents:
+        encoded = jsoncodec.get_codec('json').dumps(document).encode('utf-8')
+        print('{0} ({1} bytes):'.format(label, len(encoded)))
+        for name in jsoncodec.available():
+            codec = jsoncodec.get_codec(name)
+            dumps = per_call(lambda: codec.dumps(document), args.seconds)
+            loads = per_call(lambda: codec.loads(encoded), args.seconds)
+            print('{0:>12}: dumps {1:9.2f}us  loads {2:9.2f}us'.format(
+                name, dumps * 1e6, loads * 1e6))
+
+
+if __name__ == '__main__':
+    main()
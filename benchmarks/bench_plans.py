@@ -0,0 +1,82 @@
+"""
+Per-fire CPU of building a hook's request, compiled every time (what every
+fire used to do) vs served from the per-revision plan cache. With
+`--mapped`, data values are `{{trigger...}}` templates rendered for an
+input, parsed on every fire vs compiled once per revision.
+
+    python -m benchmarks.bench_plans --items 50 --fires 20000 --mapped
+"""
+import argparse
+import time
+
+import benchmarks
+
+
+def make_hook(hook_type, payload_type, items, mapped=False):
+    from django.utils import timezone
+
+    from action.models import ActionWebhook
+
+    hook = ActionWebhook(pk=1, hook_type=hook_type, modified=timezone.now(),
+                         data={
+                             'url': 'http://127.0.0.1/',
+                             'payloadType': payload_type,
+                             'headers': [
+                                 {'key': 'X-Header-{0}'.format(n),
+                                  'value': str(n)} for n in range(10)],
+                             'data': [
+                                 {'key': 'key{0}'.format(n),
+                                  'value': ('{{{{trigger.user.field{0}}}}}'
+                                            if mapped else 'value{0}').format(
+                                                n)}
+                                 for n in range(items)],
+                         })
+    # Pretend it came from the database so it has a revision to cache on.
+    hook._state.adding = False
+    return hook
+
+
+def per_fire(build, fires):
+    start = time.process_time()
+    for _ in range(fires):
+        build()
+    return (time.process_time() - start) / fires
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--fires', type=int, default=20000)
+    parser.add_argument('--mapped', action='store_true', default=False,
+                        help='Map every data value from an input.')
+    args = parser.parse_args()
+
+    benchmarks.setup()
+
+    import action.mappings as mappings
+    import action.plans as plans
+
+    trigger = {'user': {'field{0}'.format(n): n for n in range(args.items)}}
+    for hook_type, payload_type in (('get', 'form'), ('post', 'form'),
+                                    ('post', 'json'), ('post', 'xml')):
+        hook = make_hook(hook_type, payload_type, args.items, args.mapped)
+        plans.cache.clear()
+        mappings.cache.clear()
+
+        if args.mapped:
+            def parsed():
+                mappings.cache.clear()
+                return hook.get_request(trigger)
+            before = per_fire(parsed, args.fires)
+            after = per_fire(lambda: hook.get_request(trigger), args.fires)
+        else:
+            before = per_fire(hook.compile_request, args.fires)
+            after = per_fire(hook.get_request, args.fires)
+
+        print('{0:>4} {1:>4}: {2:8.1f}us -> {3:6.2f}us per fire '
+              '({4:.0f}x)'.format(hook_type, payload_type, before * 1e6,
+                                  after * 1e6, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+`for_host` / `with_payload_type` lookups against a Python scan of every
+hook's data, on a large table. On PostgreSQL the query plans are printed
+too, to check the GIN and URL host indexes are used.
+
+    python -m benchmarks.bench_queries --rows 1000000
+"""
+import argparse
+import time
+
+import benchmarks
+
+HOSTS = 1000
+PAYLOAD_TYPES = ('form', 'json', 'xml')
+
+
+def populate(rows, batch_size):
+    from action.models import ActionWebhook
+    from zip.models import Zip
+
+    zipp = Zip.objects.create(title='Query benchmark', active=True)
+    for start in range(0, rows, batch_size):
+        ActionWebhook.objects.bulk_create(
+            ActionWebhook(
+                zip=zipp, hook_type='post', title='Hook {0}'.format(n),
+                data={'url': 'https://host{0}.example.com/hook/{1}'.format(
+                          n % HOSTS, n),
+                      'payloadType': PAYLOAD_TYPES[n % len(PAYLOAD_TYPES)],
+                      'data': [{'key': 'id', 'value': str(n)}]})
+            for n in range(start, min(start + batch_size, rows)))
+    return zipp
+
+
+def explain(queryset):
+    from django.db import connections
+
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN ANALYZE ' + sql, params)
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def scan(zipp, match):
+    from action.models import ActionWebhook
+
+    return sum(1 for data in ActionWebhook.objects.filter(zip=zipp)
+               .values_list('data', flat=True).iterator() if match(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', default=False,
+                        help='Leave the rows in place for another run.')
+    args = parser.parse_args()
+
+    benchmarks.setup()
+    from django.db import connection
+    from action.models import ActionWebhook
+
+    start = time.perf_counter()
+    zipp = populate(args.rows, args.batch_size)
+    print('{0} rows inserted in {1:.1f}s'.format(
+        args.rows, time.perf_counter() - start))
+    postgresql = connection.vendor == 'postgresql'
+    if postgresql:
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE action_actionwebhook')
+    else:
+        print('Not PostgreSQL: the data indexes do not exist here.')
+
+    hooks = ActionWebhook.objects.filter(zip=zipp)
+    host = 'host7.example.com'
+    try:
+        for name, queryset, match in (
+                ('for_host', hooks.for_host(host),
+                 lambda data: '//{0}/'.format(host) in data['url']),
+                ('with_payload_type', hooks.with_payload_type('xml'),
+                 lambda data: data.get('payloadType') == 'xml')):
+            query_time, count = timed(queryset.count, args.repeat)
+            scan_time, scanned = timed(lambda: scan(zipp, match), 1)
+            print('{0:>20}: {1} rows, query {2:10.1f}ms, Python scan '
+                  '{3:10.1f}ms ({4} rows)'.format(
+                      name, count, query_time * 1000, scan_time * 1000,
+                      scanned))
+            if postgresql:
+                print(explain(queryset))
+
+        pause_time, paused = timed(hooks.for_host(host).pause, 1)
+        hooks.for_host(host).resume()
+        print('{0:>20}: {1} rows in {2:.1f}ms'.format(
+            'pause', paused, pause_time * 1000))
+    finally:
+        if not args.keep:
+            hooks.delete()
+            zipp.delete()
+
+
+if __name__ == '__main__':
+    main()
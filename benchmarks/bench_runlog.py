@@ -0,0 +1,58 @@
+"""
+Cost of logging a fire to the execution log, and how fast the buffer is
+written out (COPY on PostgreSQL, multi-row inserts elsewhere).
+
+    python -m benchmarks.bench_runlog --fires 50000
+"""
+import argparse
+import time
+
+import benchmarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fires', type=int, default=50000)
+    args = parser.parse_args()
+
+    benchmarks.setup()
+    from django.test.utils import override_settings
+    import action.runlog as runlog
+    from action.models import ActionRun, ActionWebhook
+    from action.responses import Body
+    from zip.models import Zip
+
+    zipp = Zip.objects.create(title='Run log benchmark')
+    hook = ActionWebhook.objects.create(
+        zip=zipp, hook_type='post',
+        data={'url': 'http://127.0.0.1/', 'payloadType': 'json',
+              'data': [{'key': 'a', 'value': '1'}]})
+    body = Body(b'{"ok": true}', status_code=200)
+    plan = hook.get_request()
+    log = runlog.RunLog(background=False)
+
+    try:
+        with override_settings(ACTION_RUN_LOG_ENABLED=True,
+                               ACTION_RUN_LOG_MAX_BUFFER=args.fires):
+            started = time.perf_counter()
+            for _ in range(args.fires):
+                log.add(runlog.make_row(hook, runlog.start(), body,
+                                        plan=plan))
+            recorded = time.perf_counter() - started
+
+            started = time.perf_counter()
+            log.flush()
+            written = time.perf_counter() - started
+
+        print('record: {0:8.2f}us per fire'.format(
+            recorded / args.fires * 1e6))
+        print(' write: {0:8.0f} rows/s ({1} rows in {2:.2f}s)'.format(
+            args.fires / written, args.fires, written))
+    finally:
+        ActionRun.objects.filter(action=hook).delete()
+        hook.delete()
+        zipp.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Recursive vs iterative `search_dict`, over deep and wide synthetic
+documents.
+
+    python -m benchmarks.bench_search --width 100000 --depth 900
+"""
+import argparse
+import time
+
+from action.utils import find_first, search_dict
+
+
+def recursive_search_dict(input_key, input_dict):
+    # What action.utils.search_dict used to be, kept as the baseline.
+    if hasattr(input_dict, 'items'):
+        for key, value in input_dict.items():
+            if isinstance(input_key, str) and key == input_key:
+                yield key, value
+            elif isinstance(input_key, list) and key in input_key:
+                yield key, value
+            if isinstance(value, dict):
+                for result in recursive_search_dict(input_key, value):
+                    yield result
+            elif isinstance(value, list):
+                for item in value:
+                    for result in recursive_search_dict(input_key, item):
+                        yield result
+
+
+def wide(width):
+    return {
+        'url': 'http://127.0.0.1/',
+        'headers': [{'key': 'X-Id', 'value': '1'}],
+        'data': [{'key': 'key{0}'.format(n), 'value': {'nested': n}}
+                 for n in range(width)],
+    }
+
+
+def deep(depth):
+    document = current = {}
+    for _ in range(depth):
+        current['data'] = [{'value': {}}]
+        current = current['data'][0]['value']
+    current['headers'] = [{'key': 'X-Id', 'value': '1'}]
+    return document
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            function()
+        except RecursionError:
+            return None
+    return (time.perf_counter() - start) / repeat
+
+
+def show(name, seconds):
+    if seconds is None:
+        print('{0:>40}: RecursionError'.format(name))
+    else:
+        print('{0:>40}: {1:10.1f}us'.format(name, seconds * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=100000)
+    parser.add_argument('--depth', type=int, default=900)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, document in (('wide', wide(args.width)),
+                           ('deep', deep(args.depth))):
+        print('{0} document:'.format(name))
+        show('recursive, all matches', timed(
+            lambda: list(recursive_search_dict('headers', document)),
+            args.repeat))
+        show('iterative, all matches', timed(
+            lambda: list(search_dict('headers', document)), args.repeat))
+        show('iterative, first match', timed(
+            lambda: find_first('headers', document), args.repeat))
+        show('iterative, first match, max_depth=1', timed(
+            lambda: find_first('headers', document, max_depth=1),
+            args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+dicttoxml vs the streaming encoder in action.xmlstream on build_dict shaped
+payloads: throughput and peak traced memory.
+
+    python -m benchmarks.bench_xml --items 10000 100000
+"""
+import argparse
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import benchmarks
+
+
+def payload(items):
+    return OrderedDict(
+        ('key{0}'.format(n), 'value {0} & more'.format(n))
+        for n in range(items))
+
+
+def measure(encode):
+    start = time.perf_counter()
+    size = encode()
+    elapsed = time.perf_counter() - start
+
+    # Separate run: tracing allocations skews the timings a lot.
+    tracemalloc.start()
+    encode()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, nargs='+',
+                        default=[10000, 100000])
+    parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    benchmarks.setup()
+
+    from dicttoxml import dicttoxml
+
+    from action.xmlstream import iter_xml, to_xml
+
+    for items in args.items:
+        data = payload(items)
+        encoders = (
+            ('dicttoxml', lambda: len(dicttoxml(data))),
+            ('to_xml', lambda: len(to_xml(data))),
+            ('iter_xml', lambda: sum(
+                len(chunk) for chunk in iter_xml(data, args.chunk_size))),
+        )
+        for name, encode in encoders:
+            size, elapsed, peak = measure(encode)
+            print('{0:>7} items {1:>9}: {2:8.3f}s {3:8.1f} MB/s, '
+                  'peak {4:8.2f} MB'.format(
+                      items, name, elapsed, size / elapsed / 2 ** 20,
+                      peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+from http import HTTPStatus
+
+
+class StandInServer(object):
+    """
+    Tiny keep-alive HTTP/1.1 server standing in for a customer endpoint.
+
+    It runs on its own thread and event loop so thousands of connections can
+    be open at once, waits `latency` seconds before answering every request
+    and replies with `body` (or the request body itself when `echo` is set)
+    and the extra `headers`. With `etag` set, requests sending it back in
+    `If-None-Match` get a bodiless 304.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, status=200,
+                 body=b'{"ok": true}', content_type='application/json',
+                 echo=False, headers=None, etag=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.echo = echo
+        self.headers = headers or {}
+        self.etag = etag
+
+        self.requests = 0
+        self.bytes_received = 0
+        self.not_modified = 0
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._writers = set()
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}/'.format(self.host, self.port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(self._start())
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _start(self):
+        return await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def _shutdown(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+        # Let the handlers notice their connections are gone.
+        await asyncio.sleep(0.01)
+        self._loop.stop()
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await self._read_body(reader, headers)
+                self.requests += 1
+                self.bytes_received += len(body)
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                await self._respond(writer, headers, body)
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _read_body(self, reader, headers):
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Trailers, if any, end with an empty line.
+                    while (await reader.readline()) not in (b'\r\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+
+        length = int(headers.get('content-length') or 0)
+        return await reader.readexactly(length) if length else b''
+
+    async def _respond(self, writer, headers, body):
+        status = self.status
+        if self.echo:
+            content_type = headers.get('content-type',
+                                       'application/octet-stream')
+            response_body = body
+        else:
+            content_type = self.content_type
+            response_body = self.body
+
+        extra = dict(self.headers)
+        if self.etag:
+            extra['ETag'] = self.etag
+            if headers.get('if-none-match') == self.etag:
+                status = 304
+                response_body = b''
+                self.not_modified += 1
+
+        writer.write((
+            'HTTP/1.1 {0} {1}\r\n'
+            'Content-Type: {2}\r\n'
+            'Content-Length: {3}\r\n'
+            '{4}'
+            '\r\n').format(status, HTTPStatus(status).phrase,
+                           content_type, len(response_body),
+                           ''.join('{0}: {1}\r\n'.format(name, value)
+                                   for name, value in extra.items())
+                           ).encode('latin-1'))
+        writer.write(response_body)
+        await writer.drain()
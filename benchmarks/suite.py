@@ -0,0 +1,175 @@
+"""
+End-to-end dispatch benchmark: real `Zip`/`ActionWebhook` rows fired with
+`make_it_so` against a local stand-in server, for every hook and payload
+type at several concurrency levels.
+
+Run it with `./manage.py run_benchmarks`, which writes a JSON report that
+`--compare` reads back to diff two releases. The stand-in server runs in
+the same process, so its CPU time is part of the figures.
+"""
+import math
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+
+from benchmarks.server import StandInServer
+
+# (hook type, payload type) pairs, GETs have no payload.
+SCENARIOS = (
+    ('get', None),
+    ('post', 'form'),
+    ('post', 'json'),
+    ('post', 'xml'),
+    ('put', 'form'),
+    ('put', 'json'),
+    ('put', 'xml'),
+)
+
+
+def percentile(values, percent):
+    # Nearest rank of already sorted values.
+    if not values:
+        return None
+    rank = max(int(math.ceil(percent / 100.0 * len(values))), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+def peak_rss():
+    # Kilobytes on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def make_hooks(url, scenarios, items, title='Benchmark'):
+    """One active Zip with a hook per scenario, hooks keyed by scenario."""
+    from action.models import ActionWebhook
+    from zip.models import Zip
+
+    zipp = Zip.objects.create(title=title, active=True)
+    data = [{'key': 'key{0}'.format(n), 'value': 'value {0}'.format(n)}
+            for n in range(items)]
+    hooks = {}
+    for hook_type, payload_type in scenarios:
+        hook_data = {'url': url, 'data': data}
+        if payload_type:
+            hook_data['payloadType'] = payload_type
+        hook = ActionWebhook.objects.create(
+            zip=zipp, hook_type=hook_type, data=hook_data,
+            title='{0} {1}'.format(hook_type, payload_type or ''))
+        hooks[hook_type, payload_type] = hook
+
+    # Fired from worker threads: load the Zip now, not once per thread.
+    loaded = ActionWebhook.objects.select_related('zip').in_bulk(
+        [hook.pk for hook in hooks.values()])
+    return zipp, {key: loaded[hook.pk] for key, hook in hooks.items()}
+
+
+def fire(hook, fires, concurrency):
+    """Fire `hook` `fires` times, `concurrency` at a time."""
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            hook.make_it_so()
+        except Exception:
+            return time.perf_counter() - start, False
+        return time.perf_counter() - start, True
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(timed, range(fires)))
+
+
+def measure(hook, fires, concurrency, trace_memory=True):
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    timings = fire(hook, fires, concurrency)
+    cpu_time = time.process_time() - cpu_start
+    wall_time = time.perf_counter() - wall_start
+
+    latencies = sorted(latency for latency, _ in timings)
+    result = {
+        'fires': fires,
+        'concurrency': concurrency,
+        'failed': sum(1 for _, ok in timings if not ok),
+        'wall_time': wall_time,
+        'throughput': fires / wall_time if wall_time else None,
+        'latency': {
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+        },
+        'cpu_time': cpu_time,
+        'cpu_percent': 100 * cpu_time / wall_time if wall_time else None,
+        'peak_rss_kb': peak_rss(),
+        'peak_traced_kb': None,
+    }
+
+    if trace_memory:
+        # Separate run: tracing allocations skews the timings a lot.
+        tracemalloc.start()
+        fire(hook, fires, concurrency)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_traced_kb'] = peak // 1024
+    return result
+
+
+def run(fires=200, concurrency=(1, 10, 50), latency=0.01, items=10,
+        scenarios=SCENARIOS, trace_memory=True, progress=None):
+    """Run the suite, returns the report as a JSON-ready dict."""
+    from action.models import ActionWebhook
+
+    report = {
+        'meta': {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'json_codec': settings.ACTION_JSON_CODEC,
+            'fires': fires,
+            'concurrency': list(concurrency),
+            'latency': latency,
+            'items': items,
+        },
+        'results': [],
+    }
+
+    with StandInServer(latency=latency, echo=True) as server:
+        zipp, hooks = make_hooks(server.url, scenarios, items)
+        try:
+            for (hook_type, payload_type), hook in hooks.items():
+                for level in concurrency:
+                    result = measure(hook, fires, level, trace_memory)
+                    result['hook_type'] = hook_type
+                    result['payload_type'] = payload_type
+                    report['results'].append(result)
+                    if progress:
+                        progress(result)
+        finally:
+            ActionWebhook.objects.filter(zip=zipp).delete()
+            zipp.delete()
+    return report
+
+
+def key(result):
+    return (result['hook_type'], result['payload_type'],
+            result['concurrency'])
+
+
+def compare(old, new):
+    """
+    Pair up the scenarios of two reports: yields `(key, old result, new
+    result)` for every scenario in both.
+    """
+    old_results = dict((key(result), result) for result in old['results'])
+    for result in new['results']:
+        previous = old_results.get(key(result))
+        if previous is not None:
+            yield key(result), previous, result
@@ -4,7 +4,7 @@ from zip.models import Zip
 
 
 class ZipAdmin(admin.ModelAdmin):
-    fields = ('title', 'active')
+    fields = ('title', 'active', 'rate_limit')
     list_display = ('title', 'active')
 
 
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zip', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zip',
+            name='rate_limit',
+            field=models.FloatField(blank=True, help_text='Requests per second to any one host, across all workers.', null=True),
+        ),
+    ]
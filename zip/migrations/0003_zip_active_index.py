@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zip', '0002_zip_rate_limit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='zip',
+            name='active',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
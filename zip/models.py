@@ -1,11 +1,35 @@
+from django.apps import apps
 from django.db import models
 from model_utils.models import TimeStampedModel
 
+from action.executor import run_pipeline
+
 
 class Zip(TimeStampedModel):
     title = models.CharField(max_length=200)
     notes = models.TextField(blank=True, null=True)
-    active = models.BooleanField(default=False)
+    active = models.BooleanField(default=False, db_index=True)
+    rate_limit = models.FloatField(
+        blank=True, null=True,
+        help_text='Requests per second to any one host, across all workers.')
 
     def __str__(self):
         return self.title
+
+    def make_it_so(self, max_workers=None, input=None):
+        if not self.active:
+            return 'Nope'
+
+        # Actions run along their depends_on, first ones with `input`.
+        return run_pipeline(self.actionwebhook_set.filter(paused=False),
+                            max_workers=max_workers, input=input)
+
+    def enqueue(self):
+        if not self.active:
+            return 'Nope'
+
+        # action.models imports this module, hence the app registry lookup.
+        job_model = apps.get_model('action', 'DispatchJob')
+        return job_model.objects.bulk_create(
+            [job_model(action=action)
+             for action in self.actionwebhook_set.filter(paused=False)])
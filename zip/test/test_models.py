@@ -1,5 +1,6 @@
 from django.test import TestCase
 from model_mommy import mommy
+from unittest import mock
 
 
 class ActionWebhookTest(TestCase):
@@ -7,3 +8,34 @@ class ActionWebhookTest(TestCase):
     def test_str(self):
         zipp = mommy.make('zip.Zip', title='Zip title')
         self.assertEqual(str(zipp), u'Zip title')
+
+
+class ZipMakeItSoTest(TestCase):
+
+    def test_make_it_so_inactive(self):
+        zipp = mommy.make('zip.Zip', active=False)
+        self.assertEqual(zipp.make_it_so(), 'Nope')
+
+    @mock.patch('zip.models.run_pipeline')
+    def test_make_it_so(self, run_pipeline):
+        zipp = mommy.make('zip.Zip', active=True)
+        hooks = mommy.make('action.ActionWebhook', zip=zipp, _quantity=3)
+        mommy.make('action.ActionWebhook')
+
+        result = zipp.make_it_so(max_workers=5)
+
+        actions = run_pipeline.call_args[0][0]
+        self.assertEqual(sorted(actions, key=lambda a: a.pk), hooks)
+        self.assertEqual(run_pipeline.call_args[1],
+                         {'max_workers': 5, 'input': None})
+        self.assertEqual(result, run_pipeline.return_value)
+
+    @mock.patch('zip.models.run_pipeline')
+    def test_make_it_so_skips_paused(self, run_pipeline):
+        zipp = mommy.make('zip.Zip', active=True)
+        hook = mommy.make('action.ActionWebhook', zip=zipp)
+        mommy.make('action.ActionWebhook', zip=zipp, paused=True)
+
+        zipp.make_it_so()
+
+        self.assertEqual(list(run_pipeline.call_args[0][0]), [hook])
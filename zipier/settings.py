@@ -132,6 +132,112 @@ STATICFILES_FINDERS = (
     'django.contrib.staticfiles.finders.FileSystemFinder',
     'django.contrib.staticfiles.finders.AppDirectoriesFinder',)
 
+# Action dispatch
+# Outbound webhook requests reuse one keep-alive session per destination host.
+
+ACTION_HTTP_POOL_CONNECTIONS = 10
+ACTION_HTTP_POOL_MAXSIZE = 10
+ACTION_HTTP_POOL_BLOCK = False
+ACTION_HTTP_IDLE_TIMEOUT = 300
+ACTION_HTTP_MAX_HOSTS = 1000
+
+# Compiled request plans kept in memory, one per hook revision.
+ACTION_PLAN_CACHE_SIZE = 10000
+
+# JSON codec for payloads and responses, see action.jsoncodec.available().
+ACTION_JSON_CODEC = 'json'
+
+# Hooks with at least this many data items stream their request body in
+# chunks of ACTION_STREAM_CHUNK_SIZE bytes, unless their data says otherwise
+# with "streaming": true/false.
+ACTION_STREAM_THRESHOLD = 10000
+ACTION_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Response bodies over ACTION_RESPONSE_SPILL_SIZE bytes are kept in a
+# memory-mapped temporary file, bodies over ACTION_RESPONSE_MAX_SIZE fail the
+# fire. Errors carry the first ACTION_RESPONSE_ERROR_SIZE bytes of the body.
+ACTION_RESPONSE_MAX_SIZE = 10 * 1024 * 1024
+ACTION_RESPONSE_SPILL_SIZE = 1024 * 1024
+ACTION_RESPONSE_ERROR_SIZE = 1024
+
+# Retry policy of hooks that don't set their own "retry", see action.retry.
+ACTION_RETRY_ATTEMPTS = 1
+ACTION_RETRY_BACKOFF = 0.5
+ACTION_RETRY_MAX_BACKOFF = 30
+ACTION_RETRY_STATUSES = ('5xx', '429')
+
+# A host failing this many fires in a row is not fired at for
+# ACTION_CIRCUIT_RESET_TIMEOUT seconds.
+ACTION_CIRCUIT_FAILURES = 5
+ACTION_CIRCUIT_RESET_TIMEOUT = 30
+
+# Requests per second to a host, by host ("https://api.example.com"), e.g.
+# {"https://api.example.com": 10} or {"...": {"rate": 10, "burst": 50}}.
+# Zips can set their own limit on top, see Zip.rate_limit. "database" shares
+# the buckets between every worker, "local" between this process' threads.
+ACTION_RATE_LIMITS = {}
+ACTION_RATE_LIMIT_DEFAULT = None
+ACTION_RATE_LIMIT_BACKEND = 'database'
+# Seconds a process keeps the Zips' rate limits before reading them again.
+# Saving a Zip re-reads them in that process right away.
+ACTION_RATE_LIMIT_ZIP_TTL = 30
+
+# Defaults of hooks batching their fires with "batch": true. Wait is in
+# milliseconds.
+ACTION_BATCH_SIZE = 100
+ACTION_BATCH_WAIT = 50
+
+# Per-phase timings of fires, served at /metrics for Prometheus to staff
+# users and to the addresses in ACTION_METRICS_ALLOWED_IPS.
+ACTION_METRICS_ENABLED = False
+ACTION_METRICS_ALLOWED_IPS = ()
+
+# GET hooks with "cache": true keep responses in an LRU of at most
+# ACTION_HTTP_CACHE_SIZE bytes, and in ACTION_HTTP_CACHE_DIR (up to
+# ACTION_HTTP_CACHE_DISK_SIZE bytes) when set.
+ACTION_HTTP_CACHE_SIZE = 64 * 1024 * 1024
+ACTION_HTTP_CACHE_DIR = None
+ACTION_HTTP_CACHE_DISK_SIZE = 1024 * 1024 * 1024
+
+# Idempotency keys: every fire sends a hash of its request in the
+# ACTION_IDEMPOTENCY_HEADER header, and identical fires within
+# ACTION_IDEMPOTENCY_WINDOW seconds are only sent once. At most
+# ACTION_IDEMPOTENCY_MAX_KEYS recent keys are remembered.
+ACTION_IDEMPOTENCY_ENABLED = False
+ACTION_IDEMPOTENCY_HEADER = 'Idempotency-Key'
+ACTION_IDEMPOTENCY_WINDOW = 10
+ACTION_IDEMPOTENCY_MAX_KEYS = 100000
+
+# Execution log: an ActionRun row per fire, buffered and written every
+# ACTION_RUN_LOG_INTERVAL seconds or ACTION_RUN_LOG_BATCH_SIZE rows. Past
+# ACTION_RUN_LOG_MAX_BUFFER waiting rows, new ones are dropped.
+# prune_action_runs keeps ACTION_RUN_LOG_RETENTION_DAYS days.
+ACTION_RUN_LOG_ENABLED = False
+ACTION_RUN_LOG_BATCH_SIZE = 1000
+ACTION_RUN_LOG_INTERVAL = 1
+ACTION_RUN_LOG_MAX_BUFFER = 100000
+ACTION_RUN_LOG_RETENTION_DAYS = 30
+
+# Admin changelists count exactly up to this many rows, past it they show
+# PostgreSQL's estimate.
+ACTION_ADMIN_EXACT_COUNT = 10000
+
+# Upper bound of threads used to fire the actions of a Zip concurrently.
+ACTION_MAX_WORKERS = 10
+
+# In-flight requests (total and per host, 0 is unlimited) of the asyncio
+# runner.
+ACTION_ASYNC_LIMIT = 1000
+ACTION_ASYNC_LIMIT_PER_HOST = 0
+
+# `./manage.py run_dispatch_workers` defaults.
+ACTION_DISPATCH_WORKERS = 4
+ACTION_DISPATCH_BATCH_SIZE = 10
+ACTION_DISPATCH_POLL_INTERVAL = 1
+# Running jobs started longer ago than this are requeued. Keep it above the
+# longest a single fire can take, timeout times attempts plus backoff.
+ACTION_DISPATCH_STALE_AFTER = 300
+
 # Only import local settings if it's not tests.
 with suppress(ImportError):  # noqa
     from local_settings import * # noqa
@@ -13,9 +13,13 @@ Including another URLconf
     1. Import the include() function: from django.conf.urls import url, include
     2. Add a URL to urlpatterns:  url(r'^blog/', include('blog.urls'))
 """
-from django.conf.urls import url
+from django.conf.urls import include, url
 from django.contrib import admin
 
+from action.views import metrics_view
+
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
+    url(r'^action/', include('action.urls')),
+    url(r'^metrics$', metrics_view, name='metrics'),
 ]